@@ -6,9 +6,165 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env")
     
     REDIS_URL: str = ""
+    REDIS_MAX_CONNECTIONS: int = 50
+    # How long per-workflow completion records are kept (seconds)
+    RESULT_TTL_SECONDS: int = 3600
     CHECK_CUSTOMER_REGISTRATION_API_URL: HttpUrl
     FETCH_CUSTOMER_ORDERS_API_URL: HttpUrl
 
     ACCESS_TOKEN: str = ""
 
+    # Shared httpx connection pool used for the internal API calls
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    # Connections opened to each internal API when a process starts (app/services/warmup.py); 0 disables
+    WARM_CONNECTIONS_PER_API: int = 4
+
+    # Base port for Celery worker metrics exporters (each pool process adds its index); 0 disables
+    WORKER_METRICS_PORT: int = 0
+
+    # Celery message serializer: "fastjson" (orjson when installed, see app/utils/jsoncodec.py) or "json".
+    # Workers accept both, so the web and worker processes can be switched independently.
+    CELERY_SERIALIZER: str = "fastjson"
+
+    # Where /webhook sends workflows: "celery" (Redis broker + workers), "inprocess"
+    # (bounded asyncio queue served by worker tasks inside the web process; no broker)
+    # or "streams" (Redis Stream consumed by `python -m app.streams` workers)
+    EXECUTION_MODE: str = "celery"
+    INPROCESS_QUEUE_SIZE: int = 1000
+    INPROCESS_WORKERS: int = 50
+    # On shutdown, how long queued in-process workflows get to finish
+    INPROCESS_DRAIN_SECONDS: float = 30.0
+
+    # Celery mode: /webhook hands tasks to publisher threads through a bounded queue (full -> 503)
+    # instead of doing a blocking broker write on the event loop
+    PUBLISHER_THREADS: int = 4
+    PUBLISHER_QUEUE_SIZE: int = 10000
+    # Await the broker write before answering /webhook (a 202 then means the task is in Redis)
+    PUBLISHER_CONFIRM: bool = False
+
+    # POST /webhook/batch: max items per request; Celery mode publishes one batch task per chunk
+    WEBHOOK_BATCH_MAX_ITEMS: int = 1000
+    WEBHOOK_BATCH_CHUNK_SIZE: int = 50
+
+    # Celery mode: route workflows to workflow.high/normal/low by ingest-time intent (app/services/priority.py);
+    # workers pull from the queues in proportion to these weights
+    PRIORITY_ROUTING: bool = True
+    PRIORITY_QUEUE_WEIGHTS: str = "high=6,normal=3,low=1"
+    # event["customer_tier"] values that move a message up one priority class
+    PRIORITY_BOOST_TIERS: str = "vip,gold"
+
+    # Bulkheads per web route class (app/services/bulkhead.py): "sync" = the endpoints that run a workflow
+    # in the request, "query" = result and profile lookups. Beyond concurrency + queue, or after waiting
+    # MAX_WAIT seconds, requests get 503 so debug traffic cannot starve /webhook
+    BULKHEAD_SYNC_CONCURRENCY: int = 4
+    BULKHEAD_SYNC_QUEUE: int = 8
+    BULKHEAD_SYNC_MAX_WAIT_SECONDS: float = 5.0
+    BULKHEAD_QUERY_CONCURRENCY: int = 32
+    BULKHEAD_QUERY_QUEUE: int = 64
+    BULKHEAD_QUERY_MAX_WAIT_SECONDS: float = 1.0
+
+    # run_workflow_task retries transient errors only (app/services/retry.py), after full-jitter exponential
+    # backoff, and only while retries in the last window stay within max(MIN_RETRIES, RATIO * first attempts)
+    RETRY_BACKOFF_BASE_SECONDS: float = 1.0
+    RETRY_BACKOFF_MAX_SECONDS: float = 60.0
+    RETRY_BUDGET_RATIO: float = 0.1
+    RETRY_BUDGET_MIN_RETRIES: int = 10
+    RETRY_BUDGET_WINDOW_SECONDS: float = 60.0
+
+    # Redis Streams backend. MAXLEN is approximate: XADD trims older entries, the rest stay replayable
+    STREAMS_KEY: str = "workflow:stream"
+    STREAMS_GROUP: str = "workflow-workers"
+    STREAMS_MAXLEN: int = 100000
+    STREAMS_BATCH_SIZE: int = 32
+    # In-flight workflows per consumer process; keep below REDIS_MAX_CONNECTIONS
+    STREAMS_CONCURRENCY: int = 32
+    STREAMS_BLOCK_MS: int = 1000
+    # Entries pending this long on a consumer are reclaimed by another one
+    STREAMS_CLAIM_IDLE_MS: int = 60000
+    STREAMS_MAX_DELIVERIES: int = 5
+
+    # Adaptive (AIMD) limit on workflows in flight per process, driven by internal API latency and errors.
+    # Enforced by the inprocess and streams backends and the synchronous endpoints only: Celery prefork
+    # children run one task each, so there it just reports and --concurrency sets the pool size
+    ADAPTIVE_CONCURRENCY: bool = True
+    CONCURRENCY_INITIAL_LIMIT: int = 10
+    CONCURRENCY_MIN_LIMIT: int = 2
+    CONCURRENCY_MAX_LIMIT: int = 200
+    # Back off when windowed API latency exceeds baseline * tolerance, multiplying the limit by the ratio
+    CONCURRENCY_LATENCY_TOLERANCE: float = 2.0
+    CONCURRENCY_BACKOFF_RATIO: float = 0.75
+
+    # Tracing: exporter is "none", "file" (OTLP/JSON lines) or "otlp" (OTLP/HTTP collector)
+    TRACING_EXPORTER: str = "none"
+    TRACING_FILE_PATH: str = "traces/spans.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318"
+    TRACING_SERVICE_NAME: str = "customer-care-bot"
+    # Fraction of traces recorded, decided once per trace at its root
+    TRACE_SAMPLE_RATIO: float = 1.0
+
+    # Event-loop monitor (app/observability/loopmon.py): lag sampled every INTERVAL, and the blocking stack
+    # captured when the loop is stuck longer than STALL_THRESHOLD (GET /diagnostics/loop on the web process)
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 100.0
+    LOOP_STALL_THRESHOLD_MS: float = 100.0
+    LOOP_STALL_HISTORY: int = 20
+
+    # Cross-run analytics (app/observability/analytics.py, GET /stats): latency sketches and counts kept in
+    # BUCKET-second buckets over a rolling window of WINDOW_BUCKETS, written to Redis by a flusher thread
+    # every FLUSH seconds (and on shutdown)
+    STATS_BUCKET_SECONDS: int = 60
+    STATS_WINDOW_BUCKETS: int = 60
+    STATS_FLUSH_SECONDS: float = 5.0
+    # Relative error of reported latency quantiles
+    STATS_SKETCH_ACCURACY: float = 0.01
+
+    # Sampling profiler: 1-in-N worker runs are profiled (0 disables); /workflow/run honours an X-Profile header
+    PROFILE_SAMPLE_RATE: int = 0
+    PROFILE_INTERVAL_MS: float = 1.0
+    PROFILE_DIR: str = "profiles"
+
+    # Speculative prefetch: /webhook starts the step 3/5 lookups in the background and caches the answers
+    # (Redis, or memory without it) for the worker; set on web and workers (app/services/prefetch.py)
+    PREFETCH_ENABLED: bool = False
+    PREFETCH_CONCURRENCY: int = 20
+    PREFETCH_TTL_SECONDS: float = 30.0
+
+    # Callback delivery (app/delivery.py): queued workflows' outcomes are POSTed to CALLBACK_URL ("" disables)
+    # from a durable outbox, up to CALLBACK_BATCH_SIZE per request ({"results": [...]} when above 1)
+    CALLBACK_URL: str = ""
+    CALLBACK_BATCH_SIZE: int = 1
+    CALLBACK_CONCURRENCY: int = 8
+    CALLBACK_TIMEOUT_SECONDS: float = 10.0
+    # Failed deliveries are retried with full-jitter exponential backoff, then dead-lettered
+    CALLBACK_MAX_ATTEMPTS: int = 8
+    CALLBACK_RETRY_BASE_SECONDS: float = 1.0
+    CALLBACK_RETRY_MAX_SECONDS: float = 300.0
+    # Drain the outbox from the web process; turn off to run `python -m app.delivery` instead
+    CALLBACK_DELIVERY_IN_WEB: bool = True
+
+    # Time from /webhook ingest after which a reply is worthless: later tasks are dropped, and running
+    # workflows get what is left as their step and HTTP timeouts (app/utils/deadline.py); 0 disables
+    WORKFLOW_DEADLINE_SECONDS: float = 300.0
+
+    # What the workflow keeps of FETCH_CUSTOMER_ORDERS_API responses (app/utils/jsonstream.py): top-level
+    # fields ("*" = all but orders), per-order fields and the most recent N orders (by ORDERS_RECENT_BY)
+    ORDERS_RESPONSE_FIELDS: str = "*"
+    ORDERS_ORDER_FIELDS: str = "order_id,status,items,total,created_at"
+    ORDERS_MAX_ORDERS: int = 20
+    ORDERS_RECENT_BY: str = "created_at"
+    # Bodies larger than this are parsed incrementally as they stream in
+    ORDERS_STREAM_THRESHOLD_BYTES: int = 1_000_000
+
+    # Size caps on what a workflow logs (per entry and in total) and on the result Celery persists
+    LOG_ENTRY_MAX_CHARS: int = 20_000
+    WORKFLOW_LOG_MAX_CHARS: int = 200_000
+    RESULT_MAX_BYTES: int = 1_000_000
+
+    # Workflow definition (app/workflow/definitions/<name>.yaml) used when a request doesn't pick one
+    DEFAULT_WORKFLOW: str = "customer_care"
+    # Development: reload changed step modules and definitions between workflows (checked every N seconds)
+    WORKFLOW_HOT_RELOAD: bool = False
+    WORKFLOW_RELOAD_INTERVAL: float = 1.0
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,374 @@
+# app/delivery.py
+"""
+Callback delivery of workflow outcomes from a durable outbox.
+
+With ``CALLBACK_URL`` set, every queued workflow's outcome (status,
+final_status, agent output) is POSTed to that URL, so the chat platform does
+not have to poll /workflow/result. Delivery has two halves:
+
+* ``execute_and_record`` only appends the outcome to the outbox (one Redis
+  round trip). A slow or failing receiver never holds up a workflow worker.
+* ``CallbackDeliverer`` drains the outbox. It runs in the web process
+  (``CALLBACK_DELIVERY_IN_WEB``) or on its own with ``python -m app.delivery``.
+
+The outbox lives in Redis: a hash of entries keyed by workflow_id plus a
+sorted set of due times. Claiming an entry pushes its due time out by a
+lease, so entries held by a crashed deliverer come back on their own, and
+several deliverers can share one outbox. Without Redis the outbox is in
+memory, which only works in ``inprocess`` mode, where workflows and
+deliverer share the process.
+
+Up to ``CALLBACK_BATCH_SIZE`` outcomes for the same URL are sent in one
+POST as ``{"results": [...]}``; at 1, each outcome is POSTed on its own.
+Transport errors, timeouts, 429 and 5xx are retried with jittered
+exponential backoff. Other 4xx answers, and anything still failing after
+``CALLBACK_MAX_ATTEMPTS`` tries, go to a dead-letter list.
+
+Delivery is at least once. Receivers should dedupe on ``workflow_id``.
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import logging
+import signal
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+
+from app.config import settings
+from app.observability.metrics import (
+    CALLBACK_DELIVERIES, CALLBACK_DELIVERY_DURATION, CALLBACK_OUTBOX_PENDING, start_metrics_server,
+)
+from app.services.redis_client import close_redis, get_redis, redis_enabled
+from app.services.retry import backoff_delay
+from app.utils.jsoncodec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "callback:outbox"
+DEAD_LETTER_MAX = 10000
+
+# Claim up to ARGV[2] entries due by ARGV[1] and lease them until ARGV[3]
+_CLAIM_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #ids == 0 then return {} end
+for _, id in ipairs(ids) do redis.call('ZADD', KEYS[1], ARGV[3], id) end
+return {ids, redis.call('HMGET', KEYS[2], unpack(ids))}
+"""
+
+
+def outcome_payload(result: Dict[str, Any], summary: Dict[str, Any], customer_id: str) -> Dict[str, Any]:
+    """What the callback receiver gets for one finished workflow."""
+    return {
+        "workflow_id": summary["workflow_id"],
+        "workflow": summary.get("workflow"),
+        "customer_id": customer_id,
+        "status": summary.get("status"),
+        "final_status": summary.get("final_status"),
+        "reason": summary.get("reason"),
+        "agent_output": (result.get("globals") or {}).get("agent_output"),
+        "completed_at": summary.get("completed_at"),
+    }
+
+
+class Outbox(ABC):
+    """Interface for pending callback storage. Entries are dicts with ``id``, ``url``, ``payload`` and ``attempts``."""
+
+    @abstractmethod
+    async def add(self, entry_id: str, url: str, payload: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def claim(self, count: int, lease: float) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def ack(self, entry_ids: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def retry(self, entry: Dict[str, Any], delay: float) -> None:
+        ...
+
+    @abstractmethod
+    async def dead_letter(self, entry: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def pending(self) -> int:
+        ...
+
+    @staticmethod
+    def _entry(entry_id: str, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {"id": entry_id, "url": url, "payload": payload, "attempts": 0, "created_at": time.time()}
+
+
+class RedisOutbox(Outbox):
+    """Outbox shared by every process through Redis."""
+
+    def __init__(self, key: str = OUTBOX_KEY):
+        self.due_key = f"{key}:due"
+        self.entries_key = f"{key}:entries"
+        self.dead_key = f"{key}:dead"
+
+    async def add(self, entry_id: str, url: str, payload: Dict[str, Any]) -> None:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.hset(self.entries_key, entry_id, dumps(self._entry(entry_id, url, payload)))
+        pipe.zadd(self.due_key, {entry_id: time.time()})
+        await pipe.execute()
+
+    async def claim(self, count: int, lease: float) -> List[Dict[str, Any]]:
+        now = time.time()
+        reply = await get_redis().eval(_CLAIM_SCRIPT, 2, self.due_key, self.entries_key, now, count, now + lease)
+        if not reply:
+            return []
+        ids, raws = reply
+        orphans = [entry_id for entry_id, raw in zip(ids, raws) if raw is None]
+        if orphans:
+            await get_redis().zrem(self.due_key, *orphans)
+        return [loads(raw) for raw in raws if raw is not None]
+
+    async def ack(self, entry_ids: List[str]) -> None:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.zrem(self.due_key, *entry_ids)
+        pipe.hdel(self.entries_key, *entry_ids)
+        await pipe.execute()
+
+    async def retry(self, entry: Dict[str, Any], delay: float) -> None:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.hset(self.entries_key, entry["id"], dumps(entry))
+        pipe.zadd(self.due_key, {entry["id"]: time.time() + delay})
+        await pipe.execute()
+
+    async def dead_letter(self, entry: Dict[str, Any]) -> None:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.lpush(self.dead_key, dumps(entry))
+        pipe.ltrim(self.dead_key, 0, DEAD_LETTER_MAX - 1)
+        pipe.zrem(self.due_key, entry["id"])
+        pipe.hdel(self.entries_key, entry["id"])
+        await pipe.execute()
+
+    async def pending(self) -> int:
+        return await get_redis().zcard(self.due_key)
+
+
+class MemoryOutbox(Outbox):
+    """In-process outbox, used when no Redis is configured; lost on restart."""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._due: Dict[str, float] = {}
+        # (due, seq, id); stale items (due no longer matching _due) are skipped on claim
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self.dead: deque = deque(maxlen=DEAD_LETTER_MAX)
+
+    def _schedule(self, entry_id: str, due: float) -> None:
+        self._due[entry_id] = due
+        heapq.heappush(self._heap, (due, next(self._seq), entry_id))
+
+    async def add(self, entry_id: str, url: str, payload: Dict[str, Any]) -> None:
+        if entry_id not in self._entries and len(self._entries) >= self.max_entries:
+            raise RuntimeError(f"callback outbox full ({self.max_entries} entries)")
+        self._entries[entry_id] = self._entry(entry_id, url, payload)
+        self._schedule(entry_id, time.time())
+
+    async def claim(self, count: int, lease: float) -> List[Dict[str, Any]]:
+        now = time.time()
+        claimed = []
+        while self._heap and len(claimed) < count and self._heap[0][0] <= now:
+            due, _, entry_id = heapq.heappop(self._heap)
+            if self._due.get(entry_id) != due:
+                continue
+            claimed.append(dict(self._entries[entry_id]))
+        for entry in claimed:
+            self._schedule(entry["id"], now + lease)
+        return claimed
+
+    async def ack(self, entry_ids: List[str]) -> None:
+        for entry_id in entry_ids:
+            self._entries.pop(entry_id, None)
+            self._due.pop(entry_id, None)
+
+    async def retry(self, entry: Dict[str, Any], delay: float) -> None:
+        if entry["id"] in self._entries:
+            self._entries[entry["id"]] = entry
+            self._schedule(entry["id"], time.time() + delay)
+
+    async def dead_letter(self, entry: Dict[str, Any]) -> None:
+        self.dead.append(entry)
+        await self.ack([entry["id"]])
+
+    async def pending(self) -> int:
+        return len(self._entries)
+
+
+_outbox: Optional[Outbox] = None
+
+
+def get_outbox() -> Outbox:
+    """Return the process-wide outbox (Redis if configured, else memory)."""
+    global _outbox
+    if _outbox is None:
+        _outbox = RedisOutbox() if redis_enabled() else MemoryOutbox()
+    return _outbox
+
+
+async def enqueue_callback(result: Dict[str, Any], summary: Dict[str, Any], customer_id: str) -> None:
+    """Queue this workflow's outcome for delivery to ``CALLBACK_URL``; never raises."""
+    try:
+        await get_outbox().add(summary["workflow_id"], settings.CALLBACK_URL,
+                               outcome_payload(result, summary, customer_id))
+        CALLBACK_DELIVERIES.labels("queued").inc()
+    except Exception as e:
+        CALLBACK_DELIVERIES.labels("enqueue_failed").inc()
+        logger.error(f"Could not queue callback for workflow {summary.get('workflow_id')}: {e}")
+
+
+def retryable(exc: Optional[Exception], status: Optional[int]) -> bool:
+    """Transport errors, timeouts, 429 and 5xx are worth retrying; other 4xx are not."""
+    if exc is not None:
+        return isinstance(exc, httpx.TransportError)
+    return status == 429 or (status is not None and status >= 500)
+
+
+class CallbackDeliverer:
+    """Claims due outbox entries and POSTs them, batched per URL, with bounded concurrency."""
+
+    def __init__(self, outbox: Optional[Outbox] = None, batch_size: Optional[int] = None,
+                 concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                 max_attempts: Optional[int] = None, poll_interval: float = 0.2):
+        self.outbox = outbox
+        self.batch_size = max(1, batch_size or settings.CALLBACK_BATCH_SIZE)
+        self.concurrency = concurrency or settings.CALLBACK_CONCURRENCY
+        self.timeout = timeout or settings.CALLBACK_TIMEOUT_SECONDS
+        self.max_attempts = max_attempts or settings.CALLBACK_MAX_ATTEMPTS
+        self.poll_interval = poll_interval
+        # Claimed entries come back to the outbox if not settled within this
+        self.lease = self.timeout * 2 + 5
+        self.running = False
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Its own pool: slow receivers must not take connections from the internal API calls
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(
+                max_connections=self.concurrency, max_keepalive_connections=self.concurrency))
+        return self._client
+
+    async def _post(self, url: str, entries: List[Dict[str, Any]]) -> None:
+        payloads = [entry["payload"] for entry in entries]
+        body = payloads[0] if self.batch_size == 1 else {"results": payloads}
+        started = time.perf_counter()
+        exc, status = None, None
+        try:
+            resp = await self._get_client().post(url, content=dumps(body),
+                                                 headers={"Content-Type": "application/json"})
+            status = resp.status_code
+        except Exception as e:
+            exc = e
+        ok = exc is None and 200 <= status < 300
+        CALLBACK_DELIVERY_DURATION.labels("ok" if ok else "error").observe(time.perf_counter() - started)
+        if ok:
+            await self.outbox.ack([entry["id"] for entry in entries])
+            CALLBACK_DELIVERIES.labels("delivered").inc(len(entries))
+            return
+        error = str(exc) if exc is not None else f"HTTP {status}"
+        for entry in entries:
+            entry["attempts"] += 1
+            entry["last_error"] = error
+            if retryable(exc, status) and entry["attempts"] < self.max_attempts:
+                await self.outbox.retry(entry, backoff_delay(entry["attempts"], settings.CALLBACK_RETRY_BASE_SECONDS,
+                                                             settings.CALLBACK_RETRY_MAX_SECONDS))
+                CALLBACK_DELIVERIES.labels("retried").inc()
+            else:
+                await self.outbox.dead_letter(entry)
+                CALLBACK_DELIVERIES.labels("dead_lettered").inc()
+                logger.error(f"Callback for workflow {entry['id']} dead-lettered after "
+                             f"{entry['attempts']} attempts: {error}")
+
+    def _start(self, url: str, entries: List[Dict[str, Any]]) -> None:
+        task = asyncio.create_task(self._post(url, entries))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def deliver_due(self) -> int:
+        """Claim what fits in the free slots and start delivering it; returns the number of entries claimed."""
+        capacity = self.concurrency - len(self._inflight)
+        if capacity <= 0:
+            return 0
+        entries = await self.outbox.claim(capacity * self.batch_size, self.lease)
+        by_url: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in entries:
+            by_url.setdefault(entry["url"], []).append(entry)
+        for url, url_entries in by_url.items():
+            for start in range(0, len(url_entries), self.batch_size):
+                self._start(url, url_entries[start:start + self.batch_size])
+        return len(entries)
+
+    async def run(self) -> None:
+        self.outbox = self.outbox or get_outbox()
+        self.running = True
+        logger.info(f"Callback deliverer started: batch size {self.batch_size}, concurrency {self.concurrency}")
+        while self.running:
+            try:
+                claimed = await self.deliver_due()
+                CALLBACK_OUTBOX_PENDING.set(await self.outbox.pending())
+            except Exception as e:
+                logger.warning(f"Callback outbox poll failed: {e}")
+                claimed = 0
+            if len(self._inflight) >= self.concurrency:
+                await asyncio.wait(self._inflight, return_when=asyncio.FIRST_COMPLETED)
+            elif not claimed:
+                await asyncio.sleep(self.poll_interval)
+        # Let started deliveries settle; unsettled ones return to the outbox when their lease ends
+        if self._inflight:
+            await asyncio.wait(self._inflight, timeout=self.timeout)
+        if self._client is not None:
+            await self._client.aclose()
+
+    def start(self) -> None:
+        """Run in the background on the current event loop (web process)."""
+        self._task = asyncio.create_task(self.run(), name="callback-deliverer")
+
+    async def stop(self) -> None:
+        self.running = False
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+DELIVERER = CallbackDeliverer()
+
+
+# --- CLI -----------------------------------------------------------------------------
+
+async def _deliver() -> None:
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: setattr(DELIVERER, "running", False))
+    try:
+        await DELIVERER.run()
+    finally:
+        await close_redis()
+
+
+def main() -> None:
+    argparse.ArgumentParser(description="Deliver queued workflow outcomes to CALLBACK_URL.").parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if not redis_enabled():
+        raise SystemExit("REDIS_URL is required: a separate deliverer can only read a Redis outbox")
+    if settings.WORKER_METRICS_PORT:
+        start_metrics_server(settings.WORKER_METRICS_PORT)
+    asyncio.run(_deliver())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# app/inprocess.py
+"""
+Broker-less execution: the web process runs queued workflows itself.
+
+With ``EXECUTION_MODE=inprocess`` /webhook puts jobs on a bounded
+``asyncio.Queue`` that ``INPROCESS_WORKERS`` worker tasks drain on the web
+server's event loop. No Redis round trip and no process hop. Concurrency
+is still governed by the adaptive limiter in ``run_workflow_instance``.
+
+* Backpressure: a full queue rejects new jobs at once (/webhook answers 503
+  with Retry-After) instead of growing without bound.
+* Graceful drain: on shutdown new jobs are rejected, and queued and running
+  jobs get up to ``INPROCESS_DRAIN_SECONDS`` to finish.
+* Jobs go through ``execute_and_record``, so completion records, metrics and
+  traces match the Celery path.
+
+Jobs only live in memory. Whatever is still queued when the drain timeout
+expires, or when the process dies, is lost.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.observability.metrics import INPROCESS_QUEUE_DEPTH, INPROCESS_JOBS
+from app.workflow.runner import execute_and_record
+
+logger = logging.getLogger(__name__)
+
+
+class QueueRejected(Exception):
+    """Raised by ``submit`` when the queue is full or draining."""
+
+
+class InProcessExecutor:
+    """Bounded asyncio queue plus a fixed pool of worker tasks."""
+
+    def __init__(self, max_queue: int, workers: int, drain_timeout: float):
+        self.max_queue = max_queue
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.accepting = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_settings(cls) -> "InProcessExecutor":
+        return cls(settings.INPROCESS_QUEUE_SIZE, settings.INPROCESS_WORKERS, settings.INPROCESS_DRAIN_SECONDS)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        """Create the queue and worker tasks on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"inprocess-worker-{i}")
+                       for i in range(self.workers)]
+        self.accepting = True
+        logger.info(f"In-process executor started: {self.workers} workers, queue size {self.max_queue}")
+
+    def submit(self, job: Dict[str, Any]) -> None:
+        """Queue ``execute_and_record`` keyword arguments, or raise ``QueueRejected``."""
+        if not self.accepting:
+            INPROCESS_JOBS.labels("rejected").inc()
+            raise QueueRejected("executor is shutting down")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            INPROCESS_JOBS.labels("rejected").inc()
+            raise QueueRejected(f"queue full ({self.max_queue} workflows waiting)")
+        INPROCESS_JOBS.labels("accepted").inc()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await execute_and_record(**job, source="inprocess")
+                INPROCESS_JOBS.labels("completed").inc()
+            except Exception:
+                INPROCESS_JOBS.labels("failed").inc()
+                logger.exception(f"In-process workflow {job.get('workflow_id')} failed")
+            finally:
+                self._queue.task_done()
+
+    async def drain(self) -> None:
+        """Stop accepting jobs, wait for queued ones to finish, then stop the workers."""
+        if self._queue is None:
+            return
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"In-process drain timed out after {self.drain_timeout:g}s; "
+                           f"abandoning {self.depth} queued workflow(s)")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+EXECUTOR = InProcessExecutor.from_settings()
+INPROCESS_QUEUE_DEPTH.set_function(lambda: EXECUTOR.depth)
@@ -1,29 +1,286 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, PlainTextResponse
-from app.models import WebhookRequest
-from app.tasks import run_workflow_task
+from fastapi import Depends, FastAPI, HTTPException, Request
+from pydantic import ValidationError
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
+from fastapi.routing import APIRoute
+from app.models import WebhookRequest, WorkflowResultsRequest
+from app.config import settings
+from app.tasks import run_workflow_batch_task, run_workflow_task
+from app.inprocess import EXECUTOR, QueueRejected
+from app import streams
+from app.delivery import DELIVERER
+from app.services.bulkhead import BULKHEADS, Bulkhead, BulkheadFull
+from app.services.results import get_result_store
+from app.services.limiter import WORKFLOW_LIMITER
+from app.services.prefetch import PREFETCHER
+from app.services.priority import classify, queue_name
+from app.services.publisher import PUBLISHER, PublishRejected
+from app.services.warmup import warm_up
+from app.observability.metrics import REGISTRY, CONTENT_TYPE, WEBHOOK_ENQUEUE_DURATION, WEBHOOK_REQUESTS
+from app.observability.analytics import ANALYTICS
+from app.observability.loopmon import LOOP_MONITOR
+from app.observability.profiling import PROFILE_HEADER, aggregate_profile
+from app.observability.tracing import TRACER, SpanContext
 from app.workflow.workflow_manager import run_workflow_instance
+from app.workflow.plan import WorkflowDefinitionError, available_workflows, get_plan
+from app.utils.jsoncodec import dumps, loads
+from contextlib import asynccontextmanager
+import asyncio
+import time
 import uuid
+from typing import Any, Dict, List, Optional
 
-app = FastAPI(title="Customer Care Bot")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.LOOP_MONITOR_ENABLED:
+        LOOP_MONITOR.start()
+    # Compile every workflow definition and open API connections before serving traffic
+    await warm_up()
+    if settings.EXECUTION_MODE == "inprocess":
+        await EXECUTOR.start()
+    if settings.CALLBACK_URL and settings.CALLBACK_DELIVERY_IN_WEB:
+        DELIVERER.start()
+    ANALYTICS.start()
+    yield
+    if settings.EXECUTION_MODE == "inprocess":
+        await EXECUTOR.drain()
+    if settings.CALLBACK_URL and settings.CALLBACK_DELIVERY_IN_WEB:
+        await DELIVERER.stop()
+    await PREFETCHER.stop()
+    await asyncio.to_thread(PUBLISHER.stop)
+    await asyncio.to_thread(ANALYTICS.stop)
+    LOOP_MONITOR.stop()
 
-@app.post("/webhook")
-async def webhook(payload: WebhookRequest):
-    """Queue workflow execution asynchronously via Celery."""
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the shared codec (orjson when installed)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+class FastJSONRequest(Request):
+    """Request whose JSON body is decoded with the shared codec."""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+class FastJSONRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
+
+app = FastAPI(title="Customer Care Bot", lifespan=lifespan, default_response_class=FastJSONResponse)
+app.router.route_class = FastJSONRoute
+
+def _bulkhead(bulkhead: Bulkhead):
+    """Route dependency holding a slot of ``bulkhead`` for the request; 503 when it is saturated."""
+    async def hold_slot():
+        try:
+            await bulkhead.acquire()
+        except BulkheadFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        try:
+            yield
+        finally:
+            bulkhead.release()
+    return Depends(hold_slot)
+
+# Workflow-running debug endpoints and read-only lookups each get a capped share of the web process
+SYNC_ROUTE = [_bulkhead(BULKHEADS["sync"])]
+QUERY_ROUTE = [_bulkhead(BULKHEADS["query"])]
+
+def _resolve_workflow(name):
+    """Validate the requested workflow name, raising 422 for unknown workflows."""
     try:
-        # .delay() is a Celery method to queue the task asynchronously for execution by a worker
-        run_workflow_task.delay(payload.customer_id, payload.customer_phone_number, payload.event)
-        return {"status": "accepted", "message": "workflow queued"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return get_plan(name)
+    except WorkflowDefinitionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def _job(payload: WebhookRequest, workflow: str, workflow_id: str, priority: Optional[str] = None) -> Dict[str, Any]:
+    """Keyword arguments for execute_and_record, carrying the current trace; the one job shape for every backend."""
+    now = time.time()
+    return {
+        "workflow_id": workflow_id,
+        "customer_id": payload.customer_id,
+        "customer_phone_number": payload.customer_phone_number,
+        "event": payload.event,
+        "workflow": workflow,
+        "enqueued_at": now,
+        "traceparent": TRACER.inject({}).get("traceparent"),
+        "priority": priority or classify(payload.event),
+        "deadline": _deadline(now),
+    }
 
-@app.post("/workflow/run")
-async def run_workflow_sync(payload: WebhookRequest):
+def _deadline(now: float) -> Optional[float]:
+    """Epoch time after which the reply is worthless (WORKFLOW_DEADLINE_SECONDS after ``now``)."""
+    return now + settings.WORKFLOW_DEADLINE_SECONDS if settings.WORKFLOW_DEADLINE_SECONDS > 0 else None
+
+def _queue_options(priority: str) -> Dict[str, Any]:
+    """apply_async options routing a task to its priority queue (PRIORITY_ROUTING)."""
+    return {"queue": queue_name(priority)} if settings.PRIORITY_ROUTING else {}
+
+# run_workflow_task keyword arguments taken from a job (the rest go positionally or as headers)
+TASK_KWARGS = ("workflow", "workflow_id", "enqueued_at", "priority", "deadline")
+
+async def _enqueue(job: Dict[str, Any]) -> None:
+    """Hand one job (built by ``_job``) to the configured execution backend."""
+    if settings.EXECUTION_MODE == "inprocess":
+        EXECUTOR.submit(job)
+        return
+    if settings.EXECUTION_MODE == "streams":
+        await streams.publish(job)
+        return
+    # apply_async() runs on the publisher threads so a slow broker never blocks the event loop;
+    # the traceparent header carries the trace across
+    published = PUBLISHER.submit(
+        run_workflow_task,
+        args=(job["customer_id"], job["customer_phone_number"], job["event"]),
+        kwargs={name: job[name] for name in TASK_KWARGS},
+        headers={"traceparent": job["traceparent"]} if job["traceparent"] else {},
+        **_queue_options(job["priority"])
+    )
+    if settings.PUBLISHER_CONFIRM:
+        await asyncio.wrap_future(published)
+
+@app.post("/webhook")
+async def webhook(payload: WebhookRequest, request: Request):
+    """Queue workflow execution asynchronously (Celery, the in-process queue or a Redis Stream)."""
+    plan = _resolve_workflow(payload.workflow)
+    workflow_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    priority = classify(payload.event)
+    parent = SpanContext.from_traceparent(request.headers.get("traceparent"))
+    with TRACER.span("webhook.ingest", parent=parent, kind="server",
+                     attributes={"workflow.id": workflow_id, "workflow.name": plan.name,
+                                 "workflow.priority": priority}) as span:
+        try:
+            await _enqueue(_job(payload, plan.name, workflow_id, priority))
+            if settings.PREFETCH_ENABLED:
+                PREFETCHER.schedule(payload.customer_phone_number)
+            WEBHOOK_ENQUEUE_DURATION.observe(time.perf_counter() - started)
+            WEBHOOK_REQUESTS.labels("accepted").inc()
+            return {"status": "accepted", "message": "workflow queued", "workflow_id": workflow_id}
+        except (QueueRejected, PublishRejected) as e:
+            # Backpressure: the in-process or publish queue is full or draining
+            WEBHOOK_REQUESTS.labels("rejected").inc()
+            span.record_error(e)
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except Exception as e:
+            WEBHOOK_REQUESTS.labels("error").inc()
+            span.record_error(e)
+            raise HTTPException(status_code=500, detail=str(e))
+
+async def _enqueue_many(jobs: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """Hand many jobs to the execution backend in few round trips; returns a rejection reason per job."""
+    errors: List[Optional[str]] = [None] * len(jobs)
+    if settings.EXECUTION_MODE == "inprocess":
+        for i, job in enumerate(jobs):
+            try:
+                EXECUTOR.submit(job)
+            except QueueRejected as e:
+                errors[i] = str(e)
+    elif settings.EXECUTION_MODE == "streams":
+        if jobs:
+            await streams.publish_many(jobs)
+    else:
+        # One batch task per chunk: 1,000 items become 20 broker writes, spread over the publisher threads.
+        # Chunks are cut per priority class so each lands on its class's queue.
+        size = settings.WEBHOOK_BATCH_CHUNK_SIZE
+        by_priority: Dict[str, List[int]] = {}
+        for i, job in enumerate(jobs):
+            by_priority.setdefault(job["priority"], []).append(i)
+        published = []
+        for priority, indices in by_priority.items():
+            for start in range(0, len(indices), size):
+                chunk = indices[start:start + size]
+                try:
+                    published.append((chunk, PUBLISHER.submit(run_workflow_batch_task,
+                                                               args=([jobs[i] for i in chunk],),
+                                                               **_queue_options(priority))))
+                except PublishRejected as e:
+                    for i in chunk:
+                        errors[i] = str(e)
+        if settings.PUBLISHER_CONFIRM and published:
+            # Other chunks are already in Redis when one fails: reject only the failed chunk's items,
+            # so a client retrying the rejected ones does not run the rest twice
+            outcomes = await asyncio.gather(*(asyncio.wrap_future(future) for _, future in published),
+                                            return_exceptions=True)
+            for (chunk, _), outcome in zip(published, outcomes):
+                if isinstance(outcome, Exception):
+                    for i in chunk:
+                        errors[i] = f"publish failed: {outcome}"
+    return errors
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors())
+
+@app.post("/webhook/batch")
+async def webhook_batch(items: List[Any], request: Request):
+    """
+    Queue many workflows in one request. Items are validated individually;
+    the response has one result per item, in request order.
+    """
+    if len(items) > settings.WEBHOOK_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"at most {settings.WEBHOOK_BATCH_MAX_ITEMS} items per batch")
+    started = time.perf_counter()
+    parent = SpanContext.from_traceparent(request.headers.get("traceparent"))
+    with TRACER.span("webhook.batch_ingest", parent=parent, kind="server",
+                     attributes={"batch.size": len(items)}) as span:
+        results: List[Dict[str, Any]] = []
+        jobs: List[Dict[str, Any]] = []
+        job_results: List[Dict[str, Any]] = []
+        for index, raw in enumerate(items):
+            try:
+                payload = WebhookRequest.model_validate(raw)
+                plan = get_plan(payload.workflow)
+            except ValidationError as e:
+                results.append({"index": index, "status": "invalid", "error": _validation_message(e)})
+                continue
+            except WorkflowDefinitionError as e:
+                results.append({"index": index, "status": "invalid", "error": str(e)})
+                continue
+            workflow_id = str(uuid.uuid4())
+            jobs.append(_job(payload, plan.name, workflow_id))
+            result = {"index": index, "status": "accepted", "workflow_id": workflow_id}
+            job_results.append(result)
+            results.append(result)
+
+        try:
+            errors = await _enqueue_many(jobs)
+        except Exception as e:
+            WEBHOOK_REQUESTS.labels("error").inc(len(jobs))
+            span.record_error(e)
+            raise HTTPException(status_code=500, detail=str(e))
+        for job, result, error in zip(jobs, job_results, errors):
+            if error is not None:
+                result.update(status="rejected", error=error)
+                del result["workflow_id"]
+            elif settings.PREFETCH_ENABLED:
+                PREFETCHER.schedule(job["customer_phone_number"])
+
+        counts = {"accepted": 0, "rejected": 0, "invalid": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        for status in ("accepted", "rejected", "invalid"):
+            if counts[status]:
+                WEBHOOK_REQUESTS.labels(status).inc(counts[status])
+        WEBHOOK_ENQUEUE_DURATION.observe(time.perf_counter() - started)
+        span.set_attribute("batch.accepted", counts["accepted"])
+        return {**counts, "results": results}
+
+@app.post("/workflow/run", dependencies=SYNC_ROUTE)
+async def run_workflow_sync(payload: WebhookRequest, request: Request):
     """
     Run workflow synchronously and return full result with visualization.
-    Useful for testing and debugging.
+    Useful for testing and debugging. Send an ``X-Profile: 1`` header to
+    stack-sample the run; the response then includes the saved profile path.
     """
+    _resolve_workflow(payload.workflow)
     try:
         workflow_id = str(uuid.uuid4())
         result = await run_workflow_instance(
@@ -31,17 +288,21 @@ async def run_workflow_sync(payload: WebhookRequest):
             customer_id=payload.customer_id,
             customer_phone_number=payload.customer_phone_number,
             event=payload.event,
-            enable_visualization=True
+            enable_visualization=True,
+            workflow=payload.workflow,
+            profile=request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes")
         )
-        return result
+        # The result is plain JSON data: skip jsonable_encoder's walk of the whole tree
+        return FastJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/workflow/visualize", response_class=PlainTextResponse)
+@app.post("/workflow/visualize", response_class=PlainTextResponse, dependencies=SYNC_ROUTE)
 async def visualize_workflow(payload: WebhookRequest):
     """
     Run workflow and return ASCII tree visualization.
     """
+    _resolve_workflow(payload.workflow)
     try:
         workflow_id = str(uuid.uuid4())
         result = await run_workflow_instance(
@@ -49,7 +310,8 @@ async def visualize_workflow(payload: WebhookRequest):
             customer_id=payload.customer_id,
             customer_phone_number=payload.customer_phone_number,
             event=payload.event,
-            enable_visualization=True
+            enable_visualization=True,
+            workflow=payload.workflow
         )
         
         if "visualization" in result:
@@ -59,12 +321,13 @@ async def visualize_workflow(payload: WebhookRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/workflow/diagram", response_class=PlainTextResponse)
+@app.post("/workflow/diagram", response_class=PlainTextResponse, dependencies=SYNC_ROUTE)
 async def get_workflow_diagram(payload: WebhookRequest):
     """
     Run workflow and return Mermaid diagram syntax.
     Copy this to https://mermaid.live to visualize.
     """
+    _resolve_workflow(payload.workflow)
     try:
         workflow_id = str(uuid.uuid4())
         result = await run_workflow_instance(
@@ -72,7 +335,8 @@ async def get_workflow_diagram(payload: WebhookRequest):
             customer_id=payload.customer_id,
             customer_phone_number=payload.customer_phone_number,
             event=payload.event,
-            enable_visualization=True
+            enable_visualization=True,
+            workflow=payload.workflow
         )
         
         if "visualization" in result:
@@ -82,11 +346,12 @@ async def get_workflow_diagram(payload: WebhookRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/workflow/beautified", response_class=PlainTextResponse)
+@app.post("/workflow/beautified", response_class=PlainTextResponse, dependencies=SYNC_ROUTE)
 async def get_beautified_workflow(payload: WebhookRequest):
     """
     Run workflow and return beautified output with colors and emojis.
     """
+    _resolve_workflow(payload.workflow)
     try:
         workflow_id = str(uuid.uuid4())
         result = await run_workflow_instance(
@@ -94,7 +359,8 @@ async def get_beautified_workflow(payload: WebhookRequest):
             customer_id=payload.customer_id,
             customer_phone_number=payload.customer_phone_number,
             event=payload.event,
-            enable_visualization=True
+            enable_visualization=True,
+            workflow=payload.workflow
         )
         
         if "beautified_output" in result:
@@ -104,11 +370,12 @@ async def get_beautified_workflow(payload: WebhookRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/workflow/logs", response_class=PlainTextResponse)
+@app.post("/workflow/logs", response_class=PlainTextResponse, dependencies=SYNC_ROUTE)
 async def get_complete_logs(payload: WebhookRequest):
     """
     Run workflow and return complete beautified logs with all API responses.
     """
+    _resolve_workflow(payload.workflow)
     try:
         workflow_id = str(uuid.uuid4())
         result = await run_workflow_instance(
@@ -116,7 +383,8 @@ async def get_complete_logs(payload: WebhookRequest):
             customer_id=payload.customer_id,
             customer_phone_number=payload.customer_phone_number,
             event=payload.event,
-            enable_visualization=True
+            enable_visualization=True,
+            workflow=payload.workflow
         )
         
         if "beautified_output" in result:
@@ -126,11 +394,12 @@ async def get_complete_logs(payload: WebhookRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/workflow/complete", response_class=PlainTextResponse)
+@app.post("/workflow/complete", response_class=PlainTextResponse, dependencies=SYNC_ROUTE)
 async def get_complete_output(payload: WebhookRequest):
     """
     Run workflow and return complete beautified output (tree + logs).
     """
+    _resolve_workflow(payload.workflow)
     try:
         workflow_id = str(uuid.uuid4())
         result = await run_workflow_instance(
@@ -138,7 +407,8 @@ async def get_complete_output(payload: WebhookRequest):
             customer_id=payload.customer_id,
             customer_phone_number=payload.customer_phone_number,
             event=payload.event,
-            enable_visualization=True
+            enable_visualization=True,
+            workflow=payload.workflow
         )
         
         if "beautified_output" in result:
@@ -150,6 +420,73 @@ async def get_complete_output(payload: WebhookRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/workflow/result/{workflow_id}", dependencies=QUERY_ROUTE)
+async def get_workflow_result(workflow_id: str):
+    """Completion record (status, branch, timestamps) of a queued workflow."""
+    summary = await get_result_store().get(workflow_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="workflow not completed or unknown")
+    return summary
+
+@app.post("/workflow/results", dependencies=QUERY_ROUTE)
+async def get_workflow_results(payload: WorkflowResultsRequest):
+    """Completion records for many workflows in one lookup; pending ones are null."""
+    summaries = await get_result_store().get_many(payload.workflow_ids)
+    return FastJSONResponse({"results": dict(zip(payload.workflow_ids, summaries))})
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this web process."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/limiter")
+async def limiter_status():
+    """Adaptive concurrency limiter state of this web process: current limit, in-flight, waiting, API latency vs baseline."""
+    return WORKFLOW_LIMITER.snapshot()
+
+@app.get("/bulkheads")
+async def bulkhead_status():
+    """Occupancy of each route-class bulkhead: running, waiting and rejected requests."""
+    return {name: bulkhead.snapshot() for name, bulkhead in BULKHEADS.items()}
+
+@app.get("/diagnostics/loop")
+async def loop_diagnostics():
+    """Event-loop lag percentiles and the most recent stalls with the stack that blocked the loop."""
+    return LOOP_MONITOR.snapshot()
+
+@app.get("/stats", dependencies=QUERY_ROUTE)
+async def stats(window: float = 300.0):
+    """Latency quantiles, branches and failures per workflow and step, and API error rates, over ``window`` seconds."""
+    if window <= 0:
+        raise HTTPException(status_code=422, detail="window must be positive")
+    return await ANALYTICS.snapshot(window)
+
+@app.get("/profiles/aggregate", response_class=PlainTextResponse, dependencies=QUERY_ROUTE)
+async def profiles_aggregate():
+    """Folded stacks of every workflow profiled by this process (flamegraph input)."""
+    return aggregate_profile()
+
+@app.get("/workflows")
+async def list_workflows():
+    """List compiled workflow plans and their step order."""
+    return {
+        name: {
+            "version": plan.version,
+            "steps": [
+                {
+                    "number": spec.number,
+                    "id": spec.id,
+                    "name": spec.name,
+                    "depends_on": [plan.steps[dep].id for dep in spec.depends_on],
+                    "when": {c.key: list(c.values) for c in spec.when},
+                    "timeout": spec.timeout
+                }
+                for spec in plan.steps
+            ]
+        }
+        for name, plan in ((name, get_plan(name)) for name in available_workflows())
+    }
+
 @app.get("/")
 async def root():
     """API information."""
@@ -157,11 +494,21 @@ async def root():
         "service": "Customer Care Bot",
         "endpoints": {
             "POST /webhook": "Queue workflow asynchronously",
+            "POST /webhook/batch": "Queue a list of webhook payloads; per-item results",
             "POST /workflow/run": "Run workflow synchronously with full visualization",
             "POST /workflow/visualize": "Get ASCII tree visualization",
             "POST /workflow/diagram": "Get Mermaid diagram (paste at mermaid.live)",
             "POST /workflow/beautified": "Get beautified tree output with colors and emojis",
             "POST /workflow/logs": "Get complete beautified logs with all API responses",
-            "POST /workflow/complete": "Get complete beautified output (tree + logs)"
+            "POST /workflow/complete": "Get complete beautified output (tree + logs)",
+            "GET /workflow/result/{workflow_id}": "Completion record of a queued workflow",
+            "POST /workflow/results": "Completion records for a list of workflow ids",
+            "GET /workflows": "List available workflow definitions",
+            "GET /metrics": "Prometheus metrics",
+            "GET /limiter": "Adaptive concurrency limit, in-flight workflows and API latency",
+            "GET /stats": "Cross-run latency quantiles, branches, step failures and API error rates (?window=seconds)",
+            "GET /diagnostics/loop": "Event-loop lag and recent stalls with their blocking stacks",
+            "GET /bulkheads": "Occupancy of the per-route-class bulkheads (sync workflow runs, lookups)",
+            "GET /profiles/aggregate": "Aggregated folded stacks of profiled runs (X-Profile header on /workflow/run)"
         }
     }
\ No newline at end of file
@@ -1,13 +1,22 @@
 # app/models.py
+from dataclasses import dataclass
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 class WebhookRequest(BaseModel):
     customer_id: str
     customer_phone_number: str
     event: Dict[str, Any]
+    workflow: Optional[str] = None
 
-class StepResult(BaseModel):
+class WorkflowResultsRequest(BaseModel):
+    workflow_ids: List[str]
+
+@dataclass(slots=True)
+class StepResult:
+    """Result of an internal API or agent call (plain slotted class, no validation overhead)."""
     success: bool
     data: Optional[Dict[str, Any]] = None
-    error: Optional[str] = None
\ No newline at end of file
+    error: Optional[str] = None
+    # The call failed transiently (transport error, 429/5xx) and may succeed if the run is retried
+    retryable: bool = False
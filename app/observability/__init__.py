@@ -0,0 +1 @@
+# app/observability/__init__.py
@@ -0,0 +1,397 @@
+# app/observability/analytics.py
+"""
+Cross-run workflow analytics from mergeable quantile sketches.
+
+Every finished step and run, and every internal API call, is folded into
+the current time bucket (``STATS_BUCKET_SECONDS``) of this process's
+``WorkflowAnalytics``. A bucket holds:
+
+* a DDSketch of end-to-end latency per workflow, with run counts by status
+  and branch (``final_status``, set by the routing step);
+* a DDSketch of latency per step, with failure counts by reason;
+* call and error counts per internal API endpoint.
+
+DDSketch (Masson et al., VLDB 2019) stores counts in logarithmic bins, so
+any quantile is within ``STATS_SKETCH_ACCURACY`` relative error. Two
+sketches merge by adding their bins, so merging is exact. A sketch is
+capped at ``MAX_BINS`` bins, and only the last ``STATS_WINDOW_BUCKETS``
+buckets are kept. Memory therefore stays constant however many runs are
+recorded.
+
+With Redis, a flusher thread (``start``/``stop``) writes the process's
+changed buckets every ``STATS_FLUSH_SECONDS`` to ``stats:<bucket>``, one
+hash field per process. It uses its own synchronous client, so it also
+runs while a Celery child's loop is idle between tasks, and ``stop`` writes
+the last buckets on shutdown. /stats merges the buckets of every process
+over the requested window. Without Redis, /stats covers this process only.
+"""
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from app.config import settings
+from app.services.redis_client import get_redis, redis_enabled
+from app.utils.jsoncodec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY_PREFIX = "stats:"
+MAX_BINS = 1024
+# Values at or below this (seconds) are counted as zero
+MIN_VALUE = 1e-9
+QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+
+
+class DDSketch:
+    """Relative-error quantile sketch with logarithmic bins; mergeable by adding bins."""
+
+    __slots__ = ("accuracy", "_gamma_ln", "bins", "zero", "count", "sum", "min", "max")
+
+    def __init__(self, accuracy: float = 0.01):
+        self.accuracy = accuracy
+        self._gamma_ln = math.log((1 + accuracy) / (1 - accuracy))
+        self.bins: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= MIN_VALUE:
+            self.zero += 1
+            return
+        key = math.ceil(math.log(value) / self._gamma_ln)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > MAX_BINS:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        # Fold the lowest bins together: only the smallest values lose accuracy
+        keys = sorted(self.bins)
+        target = keys[len(keys) - MAX_BINS]
+        for key in keys[:len(keys) - MAX_BINS]:
+            self.bins[target] += self.bins.pop(key)
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.accuracy != self.accuracy:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > MAX_BINS:
+            self._collapse()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Bin midpoint in relative terms, clamped to what was actually seen
+                value = 2 * math.exp(key * self._gamma_ln) / (1 + math.exp(self._gamma_ln))
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary_ms(self) -> Dict[str, Any]:
+        """Count, mean, quantiles and max in milliseconds."""
+        if not self.count:
+            return {"count": 0}
+        summary = {"count": self.count, "mean": round(self.sum / self.count * 1000, 3)}
+        for name, q in QUANTILES:
+            summary[name] = round(self.quantile(q) * 1000, 3)
+        summary["max"] = round(self.max * 1000, 3)
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"accuracy": self.accuracy, "bins": {str(key): count for key, count in self.bins.items()},
+                "zero": self.zero, "count": self.count, "sum": self.sum,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DDSketch":
+        sketch = cls(data["accuracy"])
+        sketch.bins = {int(key): count for key, count in data["bins"].items()}
+        sketch.zero, sketch.count, sketch.sum = data["zero"], data["count"], data["sum"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+def _add_count(counts: Dict[str, Dict[str, int]], key: str, label: str, amount: int = 1) -> None:
+    inner = counts.setdefault(key, {})
+    inner[label] = inner.get(label, 0) + amount
+
+
+class StatsBucket:
+    """Everything recorded in one time bucket; mergeable with buckets of other processes."""
+
+    __slots__ = ("accuracy", "runs", "run_status", "branches", "steps", "step_failures", "api")
+
+    def __init__(self, accuracy: float):
+        self.accuracy = accuracy
+        self.runs: Dict[str, DDSketch] = {}
+        self.run_status: Dict[str, Dict[str, int]] = {}
+        self.branches: Dict[str, Dict[str, int]] = {}
+        # Keyed by "<workflow>/<step>"
+        self.steps: Dict[str, DDSketch] = {}
+        self.step_failures: Dict[str, Dict[str, int]] = {}
+        # Endpoint -> [calls, errors]
+        self.api: Dict[str, List[int]] = {}
+
+    def _sketch(self, sketches: Dict[str, DDSketch], key: str) -> DDSketch:
+        sketch = sketches.get(key)
+        if sketch is None:
+            sketch = sketches[key] = DDSketch(self.accuracy)
+        return sketch
+
+    def merge(self, other: "StatsBucket") -> None:
+        for mine, theirs in ((self.runs, other.runs), (self.steps, other.steps)):
+            for key, sketch in theirs.items():
+                self._sketch(mine, key).merge(sketch)
+        for mine, theirs in ((self.run_status, other.run_status), (self.branches, other.branches),
+                             (self.step_failures, other.step_failures)):
+            for key, counts in theirs.items():
+                for label, count in counts.items():
+                    _add_count(mine, key, label, count)
+        for endpoint, (calls, errors) in other.api.items():
+            totals = self.api.setdefault(endpoint, [0, 0])
+            totals[0] += calls
+            totals[1] += errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "accuracy": self.accuracy,
+            "runs": {key: sketch.to_dict() for key, sketch in self.runs.items()},
+            "run_status": self.run_status,
+            "branches": self.branches,
+            "steps": {key: sketch.to_dict() for key, sketch in self.steps.items()},
+            "step_failures": self.step_failures,
+            "api": self.api,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StatsBucket":
+        bucket = cls(data["accuracy"])
+        bucket.runs = {key: DDSketch.from_dict(sketch) for key, sketch in data["runs"].items()}
+        bucket.steps = {key: DDSketch.from_dict(sketch) for key, sketch in data["steps"].items()}
+        bucket.run_status = data["run_status"]
+        bucket.branches = data["branches"]
+        bucket.step_failures = data["step_failures"]
+        bucket.api = data["api"]
+        return bucket
+
+    def render(self) -> Dict[str, Any]:
+        """The /stats view: per workflow, its runs, branches and steps; per endpoint, its error rate."""
+        workflows: Dict[str, Any] = {}
+        for workflow in sorted(set(self.runs) | set(self.run_status) | set(self.branches)):
+            workflows[workflow] = {
+                "runs": self.run_status.get(workflow, {}),
+                "latency_ms": self.runs[workflow].summary_ms() if workflow in self.runs else {"count": 0},
+                "branches": self.branches.get(workflow, {}),
+                "steps": {},
+            }
+        for key in sorted(set(self.steps) | set(self.step_failures)):
+            workflow, step = key.split("/", 1)
+            entry = workflows.setdefault(workflow, {"runs": {}, "latency_ms": {"count": 0}, "branches": {},
+                                                    "steps": {}})
+            entry["steps"][step] = {
+                "latency_ms": self.steps[key].summary_ms() if key in self.steps else {"count": 0},
+                "failures": self.step_failures.get(key, {}),
+            }
+        api = {endpoint: {"calls": calls, "errors": errors, "error_rate": round(errors / calls, 4) if calls else 0.0}
+               for endpoint, (calls, errors) in sorted(self.api.items())}
+        return {"workflows": workflows, "api": api}
+
+
+class WorkflowAnalytics:
+    """This process's rolling window of stats buckets, flushed to and merged through Redis."""
+
+    def __init__(self, bucket_seconds: int, window_buckets: int, flush_seconds: float, accuracy: float):
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.flush_seconds = flush_seconds
+        self.accuracy = accuracy
+        self._buckets: Dict[int, StatsBucket] = {}
+        self._dirty: set = set()
+        # Recording happens on the event loop thread, flushing on the flusher thread
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._client: Optional[redis.Redis] = None
+
+    @classmethod
+    def from_settings(cls) -> "WorkflowAnalytics":
+        return cls(settings.STATS_BUCKET_SECONDS, settings.STATS_WINDOW_BUCKETS, settings.STATS_FLUSH_SECONDS,
+                   settings.STATS_SKETCH_ACCURACY)
+
+    def _current(self) -> StatsBucket:
+        index = int(time.time() // self.bucket_seconds)
+        bucket = self._buckets.get(index)
+        if bucket is None:
+            bucket = self._buckets[index] = StatsBucket(self.accuracy)
+            for old in [i for i in self._buckets if i <= index - self.window_buckets]:
+                del self._buckets[old]
+                self._dirty.discard(old)
+        self._dirty.add(index)
+        return bucket
+
+    # --- recording (hot path: dict updates and one log per sample) ---------------------
+
+    def record_step(self, workflow: str, step: str, seconds: float, failure: Optional[str] = None) -> None:
+        key = f"{workflow}/{step}"
+        with self._lock:
+            bucket = self._current()
+            bucket._sketch(bucket.steps, key).add(seconds)
+            if failure is not None:
+                _add_count(bucket.step_failures, key, failure)
+
+    def record_run(self, workflow: str, status: str, seconds: float, final_status: Optional[str] = None) -> None:
+        with self._lock:
+            bucket = self._current()
+            bucket._sketch(bucket.runs, workflow).add(seconds)
+            _add_count(bucket.run_status, workflow, status)
+            if final_status is not None:
+                _add_count(bucket.branches, workflow, final_status)
+
+    def record_api(self, endpoint: str, error: bool) -> None:
+        with self._lock:
+            totals = self._current().api.setdefault(endpoint, [0, 0])
+            totals[0] += 1
+            if error:
+                totals[1] += 1
+
+    # --- sharing through Redis ---------------------------------------------------------
+
+    @staticmethod
+    def _process_id() -> str:
+        # Resolved per call: Celery pool children fork from the parent after import
+        return f"{socket.gethostname()}-{os.getpid()}"
+
+    def _key(self, index: int) -> str:
+        return f"{STATS_KEY_PREFIX}{index}"
+
+    def _take_dirty(self) -> Dict[int, bytes]:
+        """Serialize the buckets changed since the last flush and mark them clean."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return {index: dumps(self._buckets[index].to_dict()) for index in dirty if index in self._buckets}
+
+    def _queue_writes(self, pipe: Any, payloads: Dict[int, bytes]) -> None:
+        # Each write overwrites this process's previous copy of the bucket
+        ttl = self.bucket_seconds * (self.window_buckets + 1)
+        process = self._process_id()
+        for index, payload in payloads.items():
+            pipe.hset(self._key(index), process, payload)
+            pipe.expire(self._key(index), ttl)
+
+    def _flush_failed(self, payloads: Dict[int, bytes], error: Exception) -> None:
+        with self._lock:
+            self._dirty |= set(payloads) & set(self._buckets)
+        logger.warning(f"Could not flush workflow stats: {error}")
+
+    async def flush(self) -> None:
+        """Write this process's changed buckets to Redis from the event loop."""
+        if not redis_enabled():
+            return
+        payloads = self._take_dirty()
+        if not payloads:
+            return
+        pipe = get_redis().pipeline(transaction=False)
+        self._queue_writes(pipe, payloads)
+        try:
+            await pipe.execute()
+        except Exception as e:
+            self._flush_failed(payloads, e)
+
+    def flush_sync(self) -> None:
+        """Write this process's changed buckets to Redis from any thread (the flusher, shutdown hooks)."""
+        if not redis_enabled():
+            return
+        payloads = self._take_dirty()
+        if not payloads:
+            return
+        try:
+            if self._client is None:
+                self._client = redis.Redis.from_url(settings.REDIS_URL)
+            pipe = self._client.pipeline(transaction=False)
+            self._queue_writes(pipe, payloads)
+            pipe.execute()
+        except Exception as e:
+            self._flush_failed(payloads, e)
+
+    def _run_flusher(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            self.flush_sync()
+
+    def start(self) -> None:
+        """Start the flusher thread (no-op without Redis); call in the process that records, after any fork."""
+        if not redis_enabled() or (self._flusher is not None and self._flusher.is_alive()):
+            return
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._run_flusher, name="stats-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write what it has not written yet."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(self.flush_seconds + 5)
+            self._flusher = None
+        self.flush_sync()
+
+    async def snapshot(self, window_seconds: float) -> Dict[str, Any]:
+        """Merged stats of the last ``window_seconds`` (whole buckets), across processes when Redis is configured."""
+        buckets = max(1, min(self.window_buckets, math.ceil(window_seconds / self.bucket_seconds)))
+        current = int(time.time() // self.bucket_seconds)
+        indices = range(current - buckets + 1, current + 1)
+        merged = StatsBucket(self.accuracy)
+        processes = 1
+        if redis_enabled():
+            await self.flush()
+            pipe = get_redis().pipeline(transaction=False)
+            for index in indices:
+                pipe.hgetall(self._key(index))
+            seen = set()
+            for fields in await pipe.execute():
+                for process, raw in fields.items():
+                    seen.add(process)
+                    # Merged one at a time: memory stays at one bucket however many processes report
+                    merged.merge(StatsBucket.from_dict(loads(raw)))
+            processes = len(seen)
+        else:
+            for index in indices:
+                if index in self._buckets:
+                    merged.merge(self._buckets[index])
+        return {
+            "window_seconds": buckets * self.bucket_seconds,
+            "source": "redis" if redis_enabled() else "local",
+            "processes": processes,
+            "sketch_accuracy": self.accuracy,
+            **merged.render(),
+        }
+
+
+ANALYTICS = WorkflowAnalytics.from_settings()
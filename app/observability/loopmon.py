@@ -0,0 +1,166 @@
+# app/observability/loopmon.py
+"""
+Event-loop lag sampler and stall (slow callback) detector.
+
+Blocking calls in async code, such as a synchronous broker write, a large
+``print`` or a big ``json.dumps``, delay everything else on the loop.
+``LoopMonitor`` makes that visible at low cost:
+
+* a task on the loop sleeps ``LOOP_MONITOR_INTERVAL_MS`` and records how
+  late it woke up as ``event_loop_lag_seconds``. The lag is how long a
+  ready callback waited for the loop;
+* a daemon watchdog thread checks on that task. When its timer has been
+  overdue for ``LOOP_STALL_THRESHOLD_MS`` while the loop runs, the watchdog
+  takes the loop thread's stack with ``sys._current_frames()``. At that
+  moment the stack *is* the blocking code. The stall is counted, logged,
+  and kept with its final duration among the last ``LOOP_STALL_HISTORY``
+  stalls.
+
+The cost is one timer callback per interval on the loop plus one thread
+wake-up per half threshold. There is no per-callback instrumentation, unlike
+asyncio debug mode, so it can stay on in production. In Celery workers the
+loop only runs inside a task. Time between tasks is not loop time: a
+sample whose sleep spans a pause is dropped, not recorded as lag, and the
+watchdog ignores it too. Pauses are seen by the watchdog (the loop
+stopped) and marked exactly by ``resume()``, which workers call before
+each task.
+
+The web process serves its recent lag and stalls at /diagnostics/loop.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config import settings
+from app.observability.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+# Innermost frames kept per stall stack
+STACK_LIMIT = 30
+
+
+class LoopMonitor:
+    """Lag sampler task plus stall watchdog thread for one event loop."""
+
+    def __init__(self, interval: float, stall_threshold: float, history: int = 20, lag_window: int = 600):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=history)
+        # Recent lag samples (seconds), for /diagnostics/loop percentiles
+        self.lags: Deque[float] = deque(maxlen=lag_window)
+        self.stall_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        # When the sampler's timer is due, and when it last woke (time.monotonic())
+        self._due = self._resumed = time.monotonic()
+        # Bumped whenever the loop pauses; a sample whose sleep spans a change is dropped
+        self._epoch = 0
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_settings(cls) -> "LoopMonitor":
+        return cls(settings.LOOP_MONITOR_INTERVAL_MS / 1000, settings.LOOP_STALL_THRESHOLD_MS / 1000,
+                   settings.LOOP_STALL_HISTORY)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Monitor ``loop`` (default: the running one), which must belong to the calling thread."""
+        if self.running:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._due = time.monotonic() + self.interval
+        self._task = self._loop.create_task(self._sample(), name="loop-monitor")
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def resume(self) -> None:
+        """Mark that the loop runs again after a pause (e.g. between Celery tasks): the pause is not lag."""
+        self._epoch += 1
+        self._due = time.monotonic() + self.interval
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            epoch = self._epoch
+            expected = loop.time() + self.interval
+            self._due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self._resumed = time.monotonic()
+            if self._epoch != epoch:
+                continue
+            lag = max(0.0, loop.time() - expected)
+            self.lags.append(lag)
+            EVENT_LOOP_LAG.observe(lag)
+
+    def _watch(self) -> None:
+        stall: Optional[Dict[str, Any]] = None
+        was_running = False
+        while not self._stop.wait(self.stall_threshold / 2):
+            now = time.monotonic()
+            running = self._loop is not None and self._loop.is_running()
+            if running and not was_running:
+                # The loop just (re)started, e.g. a worker's next task: idle time is not a stall
+                self._due = now + self.interval
+            elif was_running and not running:
+                self._epoch += 1
+            was_running = running
+            overdue = now - self._due
+            if stall is not None and (overdue < self.stall_threshold or not running):
+                self._close_stall(stall)
+                stall = None
+            elif stall is None and running and overdue >= self.stall_threshold:
+                stall = self._open_stall(self._due)
+
+    def _open_stall(self, started: float) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.format_stack(frame, limit=STACK_LIMIT) if frame is not None else []
+        stall = {"at": time.time() - (time.monotonic() - started), "blocked_ms": None,
+                 "stack": [line.rstrip() for line in stack], "_started": started}
+        self.stall_count += 1
+        EVENT_LOOP_STALLS.inc()
+        self.stalls.append(stall)
+        return stall
+
+    def _close_stall(self, stall: Dict[str, Any]) -> None:
+        # Blocked from when the sampler's timer was due until the loop got back to it
+        stall["blocked_ms"] = round(max(0.0, self._resumed - stall["_started"]) * 1000, 1)
+        logger.warning(f"Event loop blocked for ~{stall['blocked_ms']:.0f}ms; blocking stack:\n"
+                       + "\n".join(stall["stack"][-8:]))
+
+    def snapshot(self) -> Dict[str, Any]:
+        lags: List[float] = sorted(self.lags)
+
+        def pct(p: float) -> Optional[float]:
+            return round(lags[min(len(lags) - 1, int(p * len(lags)))] * 1000, 3) if lags else None
+
+        return {
+            "enabled": self.running,
+            "interval_ms": self.interval * 1000,
+            "stall_threshold_ms": self.stall_threshold * 1000,
+            "lag_ms": {"p50": pct(0.5), "p99": pct(0.99), "max": pct(1.0), "samples": len(lags)},
+            "stalls_total": self.stall_count,
+            "recent_stalls": [{k: v for k, v in stall.items() if not k.startswith("_")}
+                              for stall in reversed(self.stalls)],
+        }
+
+
+LOOP_MONITOR = LoopMonitor.from_settings()
@@ -0,0 +1,315 @@
+# app/observability/metrics.py
+"""
+Minimal Prometheus-compatible metrics registry.
+
+Recording is a dict lookup for the label set plus an integer/float update,
+so it stays on for every workflow. Label children are cached per label
+tuple; updates are not locked (the web event loop and each Celery worker
+process record from a single thread), only child creation is.
+"""
+import bisect
+import math
+import threading
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from sub-millisecond steps to the 10s API timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["MetricsRegistry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+        if not self.labelnames:
+            # Unlabelled metrics are exported as zero before the first update
+            self.labels()
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    def labels(self, *values: str):
+        """Return the child for this label set, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _samples(self) -> Iterable[Tuple[str, str, float]]:
+        ...
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples())
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, values), child.value
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from ``function`` at scrape time instead."""
+        self.function = function
+
+    def get(self) -> float:
+        return float(self.function()) if self.function else self.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, values), child.get()
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["MetricsRegistry"] = None):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), child.counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, values, ("le", _format_value(float(bound)))), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, child.count
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a daemon thread (used by Celery worker processes)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name=f"metrics-{port}", daemon=True).start()
+    return server
+
+
+# --- Application metrics -----------------------------------------------------
+
+WORKFLOW_STEP_DURATION = Histogram(
+    "workflow_step_duration_seconds", "Duration of each workflow step", ("workflow", "step", "status"))
+WORKFLOW_DURATION = Histogram(
+    "workflow_duration_seconds", "End-to-end run_workflow_instance duration", ("workflow", "status"))
+WORKFLOW_RUNS = Counter(
+    "workflow_runs_total", "Finished workflow runs", ("workflow", "status", "reason"))
+WORKFLOW_FINAL_STATUS = Counter(
+    "workflow_final_status_total", "Branch taken by completed workflows", ("workflow", "final_status"))
+WORKFLOW_QUEUE_WAIT = Histogram(
+    "workflow_queue_wait_seconds", "Time from /webhook enqueue to worker start", ("priority",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0))
+WORKFLOW_DEADLINE_EXPIRED = Counter(
+    "workflow_deadline_expired_total", "Workflows abandoned at their deadline, by the step reached "
+    "(\"queued\" = expired before starting)", ("workflow", "step"))
+WORKFLOW_PLAN_RELOADS = Counter(
+    "workflow_plan_reloads_total", "Hot reloads of step modules and definitions", ("outcome",))
+WORKFLOW_TASK_RETRIES = Counter(
+    "workflow_task_retries_total", "Retries scheduled by run_workflow_task")
+WORKFLOW_TASK_FAILURES = Counter(
+    "workflow_task_failures_total", "Failed workflow tasks not retried, by reason (permanent, max_retries, "
+    "deadline, budget_exhausted)", ("reason",))
+API_REQUEST_DURATION = Histogram(
+    "api_request_duration_seconds", "Outbound internal API call latency", ("endpoint", "outcome"))
+API_REQUEST_ERRORS = Counter(
+    "api_request_errors_total", "Failed outbound internal API calls", ("endpoint", "kind"))
+WEBHOOK_ENQUEUE_DURATION = Histogram(
+    "webhook_enqueue_seconds", "Time /webhook spends handing a message to the execution backend")
+WEBHOOK_REQUESTS = Counter(
+    "webhook_requests_total", "Handled /webhook requests", ("status",))
+WORKFLOW_CONCURRENCY_LIMIT = Gauge(
+    "workflow_concurrency_limit", "Current adaptive limit on in-flight workflows")
+WORKFLOW_INFLIGHT = Gauge(
+    "workflow_inflight", "Workflows currently running in this process")
+WORKFLOW_LIMITER_WAITING = Gauge(
+    "workflow_limiter_waiting", "Workflows waiting for a concurrency slot")
+WORKFLOW_LIMITER_WAIT = Histogram(
+    "workflow_limiter_wait_seconds", "Time spent waiting for a concurrency slot")
+API_LATENCY_WINDOW = Gauge(
+    "api_latency_window_seconds", "Mean internal API latency over the limiter's last window")
+API_LATENCY_BASELINE = Gauge(
+    "api_latency_baseline_seconds", "Limiter's baseline (best window) internal API latency")
+INPROCESS_QUEUE_DEPTH = Gauge(
+    "inprocess_queue_depth", "Workflows waiting in the in-process queue")
+INPROCESS_JOBS = Counter(
+    "inprocess_jobs_total", "In-process queue jobs by outcome", ("outcome",))
+STREAM_MESSAGES = Counter(
+    "stream_messages_total", "Redis Streams entries handled by this consumer", ("outcome",))
+PUBLISHER_QUEUE_DEPTH = Gauge(
+    "publisher_queue_depth", "Celery tasks handed off by /webhook and not yet published")
+WEBHOOK_PUBLISH_DURATION = Histogram(
+    "webhook_publish_seconds", "Broker write time of a /webhook task on the publisher threads")
+WEBHOOK_PUBLISH_ERRORS = Counter(
+    "webhook_publish_errors_total", "Tasks the publisher threads failed to write to the broker")
+PREFETCH_REQUESTS = Counter(
+    "prefetch_requests_total", "Ingest-time prefetches by outcome (started, deduplicated, dropped, stored, failed)",
+    ("outcome",))
+PREFETCH_LOOKUPS = Counter(
+    "prefetch_cache_lookups_total", "API lookups served from the prefetch cache (hit) or not (miss)",
+    ("kind", "outcome"))
+PREFETCH_INFLIGHT = Gauge(
+    "prefetch_inflight", "Prefetches running in this web process")
+BULKHEAD_LIMIT = Gauge(
+    "bulkhead_limit", "Concurrent requests allowed per route-class bulkhead", ("bulkhead",))
+BULKHEAD_ACTIVE = Gauge(
+    "bulkhead_active", "Requests running inside each route-class bulkhead", ("bulkhead",))
+BULKHEAD_WAITING = Gauge(
+    "bulkhead_waiting", "Requests queued for a bulkhead slot", ("bulkhead",))
+BULKHEAD_WAIT = Histogram(
+    "bulkhead_wait_seconds", "Time requests waited for a bulkhead slot", ("bulkhead",))
+BULKHEAD_REJECTIONS = Counter(
+    "bulkhead_rejections_total", "Requests rejected by a bulkhead (queue_full, timeout)", ("bulkhead", "reason"))
+CALLBACK_DELIVERIES = Counter(
+    "callback_deliveries_total", "Workflow outcome callbacks by outcome (queued, enqueue_failed, delivered, "
+    "retried, dead_lettered)", ("outcome",))
+CALLBACK_DELIVERY_DURATION = Histogram(
+    "callback_delivery_seconds", "Duration of each callback POST", ("outcome",))
+CALLBACK_OUTBOX_PENDING = Gauge(
+    "callback_outbox_pending", "Outcomes in the callback outbox not yet delivered or dead-lettered")
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the loop monitor's timer fired (time ready callbacks wait for the loop)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls_total", "Times the event loop was blocked longer than LOOP_STALL_THRESHOLD_MS")
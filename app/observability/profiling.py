@@ -0,0 +1,187 @@
+# app/observability/profiling.py
+"""
+Opt-in sampling profiler for workflow runs.
+
+A profiled run gets a daemon thread that snapshots the running thread's
+Python stack every ``PROFILE_INTERVAL_MS`` via ``sys._current_frames()``.
+Nothing is traced per call, so the overhead stays low enough to use on
+real traffic. The samples are saved in collapsed-stack ("folded") format
+as ``<PROFILE_DIR>/<workflow_id>.folded``, rooted at ``workflow:<name>``,
+which flamegraph.pl, speedscope and inferno all read directly.
+
+Runs are profiled on request (``X-Profile`` header on ``/workflow/run``) or
+by 1-in-``PROFILE_SAMPLE_RATE`` sampling in workers. Each process keeps an
+in-memory aggregate of its profiled runs. To aggregate across processes and
+runs, sum the files on disk::
+
+    python -m app.observability.profiling --workflow customer_care --top 15 -o all.folded
+
+In the web process the event loop is shared, so samples also include other
+requests that ran concurrently with the profiled one.
+"""
+import argparse
+import random
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from types import CodeType
+from typing import Any, Dict, Iterable, Optional
+
+from app.config import settings
+
+PROFILE_HEADER = "X-Profile"
+
+# Per-process aggregate of every profiled run, keyed by folded stack
+_AGGREGATE: Counter = Counter()
+_aggregate_lock = threading.Lock()
+
+_labels: Dict[CodeType, str] = {}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{frame.f_globals.get('__name__', '?')}:{code.co_name}"
+    return label
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval from a daemon thread."""
+
+    def __init__(self, thread_id: int, interval: float, root: str):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root = root
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(self.root)
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class WorkflowProfile:
+    """Context manager that stack-samples the calling thread for one workflow run."""
+
+    def __init__(self, workflow_id: str, workflow: str):
+        self.workflow_id = workflow_id
+        self.workflow = workflow
+        self.path: Optional[Path] = None
+        self.samples = 0
+        self._sampler: Optional[StackSampler] = None
+
+    def __enter__(self) -> "WorkflowProfile":
+        self._sampler = StackSampler(
+            threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000, f"workflow:{self.workflow}"
+        ).start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        stacks = self._sampler.stop()
+        self.samples = sum(stacks.values())
+        with _aggregate_lock:
+            _AGGREGATE.update(stacks)
+        self.path = save_profile(self.workflow_id, stacks)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"path": str(self.path), "samples": self.samples,
+                "interval_ms": settings.PROFILE_INTERVAL_MS}
+
+
+def should_profile() -> bool:
+    """1-in-``PROFILE_SAMPLE_RATE`` sampling decision for worker runs."""
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() * rate < 1
+
+
+def format_folded(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def parse_folded(text: str) -> Counter:
+    stacks: Counter = Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            stacks[stack] += int(count)
+    return stacks
+
+
+def save_profile(workflow_id: str, stacks: Counter) -> Path:
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{workflow_id}.folded"
+    path.write_text(format_folded(stacks), encoding="utf-8")
+    return path
+
+
+def aggregate_profile() -> str:
+    """Folded stacks of every run profiled in this process so far."""
+    with _aggregate_lock:
+        return format_folded(_AGGREGATE)
+
+
+def aggregate_files(paths: Iterable[Path], workflow: Optional[str] = None) -> Counter:
+    """Sum folded profiles from disk, optionally keeping only one workflow's stacks."""
+    root = f"workflow:{workflow};" if workflow else ""
+    total: Counter = Counter()
+    for path in paths:
+        for stack, count in parse_folded(path.read_text(encoding="utf-8")).items():
+            if stack.startswith(root):
+                total[stack] += count
+    return total
+
+
+def hottest_frames(stacks: Counter, limit: int) -> Iterable[tuple]:
+    """(frame, self samples, total samples) for the frames with the most self time."""
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aggregate sampled workflow profiles (folded stacks).")
+    parser.add_argument("--dir", default=settings.PROFILE_DIR, help="Directory holding <workflow_id>.folded files")
+    parser.add_argument("--workflow", help="Only include runs of this workflow")
+    parser.add_argument("--top", type=int, default=20, help="Print the N frames with the most self samples")
+    parser.add_argument("-o", "--output", help="Write the aggregated folded stacks here (flamegraph input)")
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.dir).glob("*.folded"))
+    stacks = aggregate_files(paths, args.workflow)
+    samples = sum(stacks.values())
+    print(f"{len(paths)} profile(s), {samples} samples")
+    if samples:
+        for frame, own, total in hottest_frames(stacks, args.top):
+            print(f"{own / samples:7.1%} self {total / samples:7.1%} total  {frame}")
+    if args.output:
+        Path(args.output).write_text(format_folded(stacks), encoding="utf-8")
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
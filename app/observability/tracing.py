@@ -0,0 +1,351 @@
+# app/observability/tracing.py
+"""
+Lightweight distributed tracing with W3C trace-context propagation.
+
+Spans cover /webhook ingest, the Celery queue wait, the workflow run, each
+step and each outbound internal API call. The ``traceparent`` header links
+them across the web process, the broker message and the worker. Finished
+spans are batched on a background thread and handed to a pluggable
+exporter: OTLP/JSON lines in a local file (works offline, loadable by
+OTLP-compatible tooling), OTLP over HTTP, or nothing.
+
+Sampling is decided once per trace from the trace id (ratio based, so every
+process agrees) and inherited by child spans; unsampled spans are shared
+no-op objects, which keeps tracing cheap enough to leave on in production.
+"""
+import contextvars
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from app.config import settings
+from app.utils.jsoncodec import dumps
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+
+class SpanContext:
+    """Identity of a span as carried across process boundaries."""
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        """Parse a W3C ``traceparent`` header; returns None when absent or malformed."""
+        if not header:
+            return None
+        parts = header.strip().split("-")
+        if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            flags = int(parts[3][:2], 16)
+            int(parts[1], 16), int(parts[2], 16)
+        except ValueError:
+            return None
+        if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+            return None
+        return cls(parts[1], parts[2], bool(flags & 1))
+
+
+class Span:
+    """A recorded (sampled) span."""
+    __slots__ = ("context", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "error")
+
+    recording = True
+
+    def __init__(self, context: SpanContext, parent_id: Optional[str], name: str, kind: str,
+                 start_ns: int, attributes: Optional[Dict[str, Any]] = None):
+        self.context = context
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.status = "unset"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: Any) -> None:
+        self.status = "error"
+        self.error = str(error)
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            TRACER.processor.on_end(self)
+
+
+class NonRecordingSpan:
+    """Placeholder for unsampled spans: carries the context, records nothing."""
+    __slots__ = ("context",)
+
+    recording = False
+
+    def __init__(self, context: SpanContext):
+        self.context = context
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: Any) -> None:
+        pass
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        pass
+
+
+# --- Exporters -------------------------------------------------------------------
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_json(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """Encode spans as an OTLP/JSON ``ExportTraceServiceRequest``."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "customer-care-bot"},
+            "spans": [{
+                "traceId": span.context.trace_id,
+                "spanId": span.context.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": SPAN_KINDS.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 0},
+            } for span in spans],
+        }],
+    }]}
+
+
+class SpanExporter(ABC):
+    """Receives batches of finished spans on the processor's background thread."""
+
+    @abstractmethod
+    def export(self, spans: List[Span], service_name: str) -> None:
+        ...
+
+    def shutdown(self) -> None:
+        pass
+
+
+class FileSpanExporter(SpanExporter):
+    """Append one OTLP/JSON export request per batch to a local ``.jsonl`` file."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: List[Span], service_name: str) -> None:
+        with self.path.open("ab") as fh:
+            fh.write(dumps(to_otlp_json(spans, service_name)) + b"\n")
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """POST OTLP/JSON to a collector's ``/v1/traces`` endpoint."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.client = httpx.Client(timeout=timeout)
+
+    def export(self, spans: List[Span], service_name: str) -> None:
+        self.client.post(self.url, content=dumps(to_otlp_json(spans, service_name)),
+                         headers={"Content-Type": "application/json"})
+
+    def shutdown(self) -> None:
+        self.client.close()
+
+
+class BatchSpanProcessor:
+    """Buffers finished spans and exports them from a daemon thread."""
+
+    def __init__(self, exporter: Optional[SpanExporter], max_queue: int = 10000,
+                 batch_size: int = 256, interval: float = 1.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self) -> None:
+        # Celery forks pool processes after import; start the thread lazily per process
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def on_end(self, span: Span) -> None:
+        if self.exporter is None:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, limit: int) -> List[Span]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[Span]) -> None:
+        try:
+            self.exporter.export(batch, TRACER.service_name)
+        except Exception as e:
+            logger.warning(f"Span export failed ({len(batch)} spans dropped): {e}")
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            self._export([first] + self._drain(self.batch_size - 1))
+
+    def flush(self) -> None:
+        """Export everything queued so far on the calling thread."""
+        if self.exporter is None:
+            return
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._export(batch)
+
+
+def build_exporter(kind: str) -> Optional[SpanExporter]:
+    if kind == "file":
+        return FileSpanExporter(settings.TRACING_FILE_PATH)
+    if kind == "otlp":
+        return OTLPHttpSpanExporter(settings.TRACING_OTLP_ENDPOINT)
+    if kind in ("", "none"):
+        return None
+    raise ValueError(f"Unknown TRACING_EXPORTER '{kind}' (expected none, file or otlp)")
+
+
+# --- Tracer ------------------------------------------------------------------------
+
+class Tracer:
+    def __init__(self, processor: BatchSpanProcessor, sample_ratio: float, service_name: str):
+        self.processor = processor
+        self.sample_ratio = sample_ratio
+        self.service_name = service_name
+        # Trace ids below this bound are sampled (ratio-based on the id, like OTel's TraceIdRatioBased)
+        self._bound = int(max(0.0, min(1.0, sample_ratio)) * (1 << 64))
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor.exporter is not None
+
+    def _should_sample(self, trace_id: str) -> bool:
+        return int(trace_id[16:], 16) < self._bound
+
+    def start_span(self, name: str, parent: Optional[SpanContext] = None, kind: str = "internal",
+                   attributes: Optional[Dict[str, Any]] = None, start_ns: Optional[int] = None):
+        """Start a span under ``parent`` (default: the current span). Call ``end()`` on it."""
+        if not self.enabled:
+            return _DISABLED
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+        if parent is not None:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        else:
+            trace_id = secrets.token_hex(16)
+            parent_id = None
+            sampled = self._should_sample(trace_id)
+        context = SpanContext(trace_id, secrets.token_hex(8), sampled)
+        if not sampled:
+            return NonRecordingSpan(context)
+        return Span(context, parent_id, name, kind, start_ns or time.time_ns(), attributes)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[SpanContext] = None, kind: str = "internal",
+             attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+        """Context manager: start a span, make it current, record exceptions, end it."""
+        span = self.start_span(name, parent, kind, attributes)
+        if span is _DISABLED:
+            yield span
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def record_span(self, name: str, start_ns: int, end_ns: int, parent: Optional[SpanContext] = None,
+                    kind: str = "internal", attributes: Optional[Dict[str, Any]] = None) -> None:
+        """Record a span after the fact (e.g. the queue wait measured from timestamps)."""
+        span = self.start_span(name, parent, kind, attributes, start_ns=start_ns)
+        span.end(end_ns)
+
+    def inject(self, carrier: Dict[str, str]) -> Dict[str, str]:
+        """Add the current span's ``traceparent`` to ``carrier`` (headers dict)."""
+        current = _current_span.get()
+        if current is not None:
+            carrier["traceparent"] = current.context.to_traceparent()
+        return carrier
+
+
+_DISABLED = NonRecordingSpan(SpanContext("0" * 32, "0" * 16, False))
+
+TRACER = Tracer(
+    BatchSpanProcessor(build_exporter(settings.TRACING_EXPORTER)),
+    sample_ratio=settings.TRACE_SAMPLE_RATIO,
+    service_name=settings.TRACING_SERVICE_NAME,
+)
+
+
+def current_span():
+    """The active span in this task/context, if any."""
+    return _current_span.get()
+
+
+def set_service_name(name: str) -> None:
+    TRACER.service_name = name
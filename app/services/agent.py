@@ -1,17 +1,22 @@
 # app/services/agent.py
-from typing import Dict, Any
+from typing import Any, Dict
 from app.models import StepResult
 
-def hardcoded_agentic_response(customer_message: str, globals_: Dict[str, Any]) -> StepResult:
+def classify_intent(customer_message: str) -> Dict[str, Any]:
     """
-    Simulated agentic response for Step 7 (hardcoded).
-    Returns a simple dict used by Step 8 condition handling.
+    Keyword intent rules shared by Step 7 and /webhook priority routing.
+    Cheap enough to run at ingest.
     """
     msg = (customer_message or "").lower()
     if "refund" in msg or "return" in msg:
-        body = {"intent": "refund_request", "confidence": 0.98, "action": "route_to_refunds"}
-    elif "status" in msg or "where is my order" in msg:
-        body = {"intent": "order_status", "confidence": 0.95, "action": "fetch_status"}
-    else:
-        body = {"intent": "general_query", "confidence": 0.6, "action": "respond_with_info"}
-    return StepResult(success=True, data=body)
\ No newline at end of file
+        return {"intent": "refund_request", "confidence": 0.98, "action": "route_to_refunds"}
+    if "status" in msg or "where is my order" in msg:
+        return {"intent": "order_status", "confidence": 0.95, "action": "fetch_status"}
+    return {"intent": "general_query", "confidence": 0.6, "action": "respond_with_info"}
+
+def hardcoded_agentic_response(customer_message: str, context: Any = None) -> StepResult:
+    """
+    Simulated agentic response for Step 7 (hardcoded).
+    Returns a simple dict used by Step 8 condition handling.
+    """
+    return StepResult(success=True, data=classify_intent(customer_message))
\ No newline at end of file
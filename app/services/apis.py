@@ -1,27 +1,177 @@
 # app/services/apis.py
+import asyncio
+import time
+from typing import Any, Optional
 import httpx
 from app.config import settings
 from app.models import StepResult
+from app.observability.analytics import ANALYTICS
+from app.observability.metrics import API_REQUEST_DURATION, API_REQUEST_ERRORS
+from app.observability.tracing import TRACER, current_span
+from app.services.limiter import WORKFLOW_LIMITER
+from app.services.retry import is_retryable
+from app.utils.deadline import expired, time_budget
+from app.services.prefetch import PREFETCH_CACHE
+from app.utils.jsoncodec import dumps, loads
+from app.utils.jsonstream import OrdersProjection, StreamingProjector
 
-async def check_customer_registration_api(customer_phone_number: str) -> StepResult:
-    async with httpx.AsyncClient() as client:
+# Per-call timeout; shorter when the workflow deadline leaves less
+API_TIMEOUT = 10.0
+# Fields of the orders response the workflow keeps (ORDERS_* settings)
+ORDERS_PROJECTION = OrdersProjection.from_settings()
+
+# check_customer_registration_api's answer for a number the registration API does not know
+NOT_REGISTERED = {"message": "Customer not registered"}
+
+# One pooled client per process (and event loop) instead of a new client,
+# connection pool and TLS handshake for every call
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client for the running event loop, creating it if needed."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        ))
+        _client_loop = loop
+    return _client
+
+def set_http_client(client: httpx.AsyncClient) -> None:
+    """Install ``client`` as the shared client for the running event loop (used by benchmarks)."""
+    global _client, _client_loop
+    _client = client
+    _client_loop = asyncio.get_running_loop()
+
+async def close_http_client() -> None:
+    """Close the shared client, if any."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+def _error_kind(exc: Exception) -> str:
+    """Coarse error class for the api_request_errors_total metric."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"http_{exc.response.status_code // 100}xx"
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, httpx.TransportError):
+        return "transport"
+    return "other"
+
+def _record_call(endpoint: str, started: float, exc: Optional[Exception] = None) -> None:
+    elapsed = time.perf_counter() - started
+    kind = _error_kind(exc) if exc is not None else None
+    if exc is not None:
+        span = current_span()
+        if span is not None:
+            span.record_error(exc)
+    API_REQUEST_DURATION.labels(endpoint, "error" if exc else "ok").observe(elapsed)
+    if kind is not None:
+        API_REQUEST_ERRORS.labels(endpoint, kind).inc()
+    ANALYTICS.record_api(endpoint, kind is not None)
+    # A timeout forced by the workflow deadline says nothing about the API's health
+    if not (kind == "timeout" and expired()):
+        WORKFLOW_LIMITER.on_sample(elapsed, kind)
+
+async def _get_registration(customer_phone_number: str) -> StepResult:
+    """The registration lookup itself; ``success`` is False when the call failed."""
+    client = get_http_client()
+    # Raises DeadlineExceeded (failing the step) rather than calling with no time left
+    timeout = time_budget(API_TIMEOUT)
+    started = time.perf_counter()
+    with TRACER.span("GET check_customer_registration", kind="client") as span:
         try:
             resp = await client.get(f'{settings.CHECK_CUSTOMER_REGISTRATION_API_URL}/{customer_phone_number}', 
-            timeout=10.0, 
-            headers={"Authorization": f'{settings.ACCESS_TOKEN}'})
+            timeout=timeout, 
+            headers=TRACER.inject({"Authorization": f'{settings.ACCESS_TOKEN}'}))
+            span.set_attribute("http.status_code", resp.status_code)
             resp.raise_for_status()
-            return StepResult(success=True, data=resp.json())
+            data = loads(resp.content)
+            _record_call("check_customer_registration", started)
+            return StepResult(success=True, data=data)
         except Exception as e:
-            return StepResult(success=True, data={"message": "Customer not registered"})
+            _record_call("check_customer_registration", started, e)
+            return StepResult(success=False, error=str(e), retryable=is_retryable(e))
 
-async def fetch_customer_orders_api(payload: dict) -> StepResult:
-    async with httpx.AsyncClient() as client:
+async def _read_orders(resp: httpx.Response, span: Any) -> Any:
+    """Parse and project an orders body; large ones are parsed incrementally as they stream in."""
+    threshold = settings.ORDERS_STREAM_THRESHOLD_BYTES
+    length = resp.headers.get("content-length")
+    if length is not None and int(length) <= threshold:
+        return ORDERS_PROJECTION.project(loads(await resp.aread()))
+    buffered, size, projector = [], 0, None
+    async for chunk in resp.aiter_bytes():
+        size += len(chunk)
+        if projector is None:
+            buffered.append(chunk)
+            if size <= threshold:
+                continue
+            projector = StreamingProjector(ORDERS_PROJECTION)
+            chunk = b"".join(buffered)
+        projector.feed(chunk)
+    span.set_attribute("http.response_bytes", size)
+    if projector is None:
+        return ORDERS_PROJECTION.project(loads(b"".join(buffered)))
+    return projector.close()
+
+async def _post_orders(payload: dict) -> StepResult:
+    client = get_http_client()
+    timeout = time_budget(API_TIMEOUT)
+    started = time.perf_counter()
+    with TRACER.span("POST fetch_customer_orders", kind="client") as span:
         try:
-            resp = await client.post(f'{settings.FETCH_CUSTOMER_ORDERS_API_URL}', 
+            async with client.stream("POST", f'{settings.FETCH_CUSTOMER_ORDERS_API_URL}', 
             json=payload, 
-            timeout=10.0, 
-            headers={"Authorization": f'{settings.ACCESS_TOKEN}'})
-            resp.raise_for_status()
-            return StepResult(success=True, data=resp.json())
+            timeout=timeout, 
+            headers=TRACER.inject({"Authorization": f'{settings.ACCESS_TOKEN}'})) as resp:
+                span.set_attribute("http.status_code", resp.status_code)
+                resp.raise_for_status()
+                data = await _read_orders(resp, span)
+            _record_call("fetch_customer_orders", started)
+            return StepResult(success=True, data=data)
         except Exception as e:
-            return StepResult(success=False, error=str(e))
\ No newline at end of file
+            _record_call("fetch_customer_orders", started, e)
+            return StepResult(success=False, error=str(e), retryable=is_retryable(e))
+
+def _orders_key(payload: dict) -> str:
+    return dumps(payload).decode()
+
+async def check_customer_registration_api(customer_phone_number: str) -> StepResult:
+    if settings.PREFETCH_ENABLED:
+        cached = await PREFETCH_CACHE.lookup("registration", customer_phone_number)
+        if cached is not None:
+            return StepResult(success=True, data=cached)
+    result = await _get_registration(customer_phone_number)
+    if result.retryable:
+        # An outage says nothing about the customer: fail the step so the run can be retried
+        return result
+    if not result.success:
+        return StepResult(success=True, data=dict(NOT_REGISTERED))
+    return result
+
+async def fetch_customer_orders_api(payload: dict) -> StepResult:
+    if settings.PREFETCH_ENABLED:
+        cached = await PREFETCH_CACHE.lookup("orders", _orders_key(payload))
+        if cached is not None:
+            return StepResult(success=True, data=cached)
+    return await _post_orders(payload)
+
+async def prefetch_customer_data(customer_phone_number: str) -> bool:
+    """
+    Make the lookups steps 3 and 5 will make for this number (same arguments)
+    and cache the successful answers; True if anything was cached.
+    """
+    registration_key = customer_phone_number.replace('+92', '0')
+    orders_payload = {"store_number": customer_phone_number}
+    registration, orders = await asyncio.gather(_get_registration(registration_key), _post_orders(orders_payload))
+    if registration.success:
+        await PREFETCH_CACHE.put("registration", registration_key, registration.data)
+    if orders.success:
+        await PREFETCH_CACHE.put("orders", _orders_key(orders_payload), orders.data)
+    return registration.success or orders.success
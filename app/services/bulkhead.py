@@ -0,0 +1,121 @@
+# app/services/bulkhead.py
+"""
+Bulkheads: hard concurrency caps per class of web routes.
+
+The synchronous workflow endpoints (``/workflow/run``, ``/visualize``,
+``/diagram``, ``/beautified``, ``/logs`` and ``/complete``) run a whole
+workflow on the event loop that also serves /webhook, so a burst of debug
+or dashboard traffic can starve ingest. Each route class gets its own
+bulkhead:
+
+* at most ``max_concurrent`` requests run at once;
+* up to ``max_waiting`` more wait, in FIFO order, at most ``max_wait``
+  seconds each;
+* anything beyond that is rejected at once with ``BulkheadFull``. The
+  routes answer it with 503 and Retry-After.
+
+Classes (``BULKHEAD_*`` settings): ``sync`` covers the workflow-running
+endpoints, and ``query`` the result and profile lookups. /webhook has no
+bulkhead: its cost per request is a bounded enqueue, and the executor and
+publisher queues already reject at capacity.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+from app.config import settings
+from app.observability.metrics import (
+    BULKHEAD_ACTIVE, BULKHEAD_LIMIT, BULKHEAD_REJECTIONS, BULKHEAD_WAIT, BULKHEAD_WAITING,
+)
+
+
+class BulkheadFull(Exception):
+    """Raised by ``acquire`` when the bulkhead's wait queue is full or the wait timed out."""
+
+
+class Bulkhead:
+    """Concurrency cap with a bounded FIFO wait queue and fast rejection."""
+
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.active = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _reject(self, reason: str, message: str) -> BulkheadFull:
+        self.rejected += 1
+        BULKHEAD_REJECTIONS.labels(self.name, reason).inc()
+        return BulkheadFull(f"{self.name} bulkhead {message}")
+
+    async def acquire(self) -> None:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            BULKHEAD_WAIT.labels(self.name).observe(0.0)
+            return
+        if len(self._waiters) >= self.max_waiting:
+            raise self._reject("queue_full", f"full ({self.active} running, {self.waiting} waiting)")
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as the wait ended: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject("timeout", f"wait exceeded {self.max_wait:g}s")
+        BULKHEAD_WAIT.labels(self.name).observe(time.perf_counter() - started)
+
+    def release(self) -> None:
+        self.active -= 1
+        while self._waiters and self.active < self.max_concurrent:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    async def __aenter__(self) -> "Bulkhead":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "max_waiting": self.max_waiting,
+            "waiting": self.waiting,
+            "max_wait_seconds": self.max_wait,
+            "rejected": self.rejected,
+        }
+
+
+BULKHEADS: Dict[str, Bulkhead] = {
+    "sync": Bulkhead("sync", settings.BULKHEAD_SYNC_CONCURRENCY, settings.BULKHEAD_SYNC_QUEUE,
+                     settings.BULKHEAD_SYNC_MAX_WAIT_SECONDS),
+    "query": Bulkhead("query", settings.BULKHEAD_QUERY_CONCURRENCY, settings.BULKHEAD_QUERY_QUEUE,
+                      settings.BULKHEAD_QUERY_MAX_WAIT_SECONDS),
+}
+
+for _name, _bulkhead in BULKHEADS.items():
+    BULKHEAD_LIMIT.labels(_name).set(_bulkhead.max_concurrent)
+    BULKHEAD_ACTIVE.labels(_name).set_function(lambda b=_bulkhead: b.active)
+    BULKHEAD_WAITING.labels(_name).set_function(lambda b=_bulkhead: b.waiting)
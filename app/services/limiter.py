@@ -0,0 +1,172 @@
+# app/services/limiter.py
+"""
+Adaptive (AIMD) concurrency limit for workflows in flight in one process.
+
+Latency and errors of the internal API calls (``app/services/apis.py``) are
+the congestion signal, as in TCP congestion control and Netflix's
+concurrency-limits. Samples are collected in short windows. At the end of a
+window the limit moves:
+
+* the window had a timeout, transport error or 5xx, or its mean latency was
+  above ``baseline * tolerance``: multiply the limit by ``backoff``;
+* otherwise, if the window used at least half of the limit: add 1.
+
+The baseline is the best window mean seen so far. It drifts up slowly, so a
+permanent change in API speed is relearned instead of throttling forever.
+Callers over the limit wait in FIFO order.
+
+Scope: the limit only bounds concurrency where many workflows share one
+event loop, i.e. the ``inprocess`` and ``streams`` execution backends and
+the web process's synchronous endpoints. A Celery prefork child runs one
+task at a time, so on the Celery backend the limiter only measures and
+reports; the pool size there is still ``--concurrency``.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.config import settings
+from app.observability.metrics import (
+    API_LATENCY_BASELINE, API_LATENCY_WINDOW, WORKFLOW_CONCURRENCY_LIMIT, WORKFLOW_INFLIGHT, WORKFLOW_LIMITER_WAITING,
+)
+
+# Congestion signals among the error kinds reported by app.services.apis
+CONGESTION_ERRORS = frozenset({"timeout", "transport", "http_5xx"})
+
+# Per-window upward drift of the latency baseline
+BASELINE_DRIFT = 0.01
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent workflow runs, driven by API latency and errors."""
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int, tolerance: float = 2.0,
+                 backoff: float = 0.75, window_samples: int = 20, window_seconds: float = 1.0,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window_samples = window_samples
+        self.window_seconds = window_seconds
+
+        self.inflight = 0
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._reset_window()
+
+    @classmethod
+    def from_settings(cls) -> "AdaptiveLimiter":
+        return cls(
+            initial_limit=settings.CONCURRENCY_INITIAL_LIMIT,
+            min_limit=settings.CONCURRENCY_MIN_LIMIT,
+            max_limit=settings.CONCURRENCY_MAX_LIMIT,
+            tolerance=settings.CONCURRENCY_LATENCY_TOLERANCE,
+            backoff=settings.CONCURRENCY_BACKOFF_RATIO,
+            enabled=settings.ADAPTIVE_CONCURRENCY,
+        )
+
+    def _reset_window(self) -> None:
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._window_sum = 0.0
+        self._window_errors = 0
+        self._window_peak = self.inflight
+
+    # --- admission -------------------------------------------------------------
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _admit(self) -> None:
+        self.inflight += 1
+        if self.inflight > self._window_peak:
+            self._window_peak = self.inflight
+
+    def _wake(self) -> None:
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._admit()
+                waiter.set_result(None)
+
+    async def acquire(self) -> None:
+        if not self.enabled or (self.inflight < int(self.limit) and not self._waiters):
+            self._admit()
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            else:
+                # A slot was handed over just before cancellation: pass it on
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.inflight -= 1
+        self._wake()
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.release()
+
+    # --- feedback --------------------------------------------------------------
+
+    def on_sample(self, latency: float, error_kind: Optional[str] = None) -> None:
+        """Feed one API call's latency (seconds) and error kind, if it failed."""
+        self._window_count += 1
+        self._window_sum += latency
+        if error_kind in CONGESTION_ERRORS:
+            self._window_errors += 1
+        if self._window_count < self.window_samples and time.monotonic() - self._window_start < self.window_seconds:
+            return
+
+        mean = self._window_sum / self._window_count
+        self.latency = mean
+        if self.baseline is None or mean < self.baseline:
+            self.baseline = mean
+        else:
+            self.baseline *= 1 + BASELINE_DRIFT
+
+        if self._window_errors or mean > self.baseline * self.tolerance:
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        elif self._window_peak * 2 >= self.limit:
+            self.limit = min(float(self.max_limit), self.limit + 1)
+            self._wake()
+        self._reset_window()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "latency_ms": self.latency * 1000 if self.latency is not None else None,
+            "baseline_ms": self.baseline * 1000 if self.baseline is not None else None,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+        }
+
+
+WORKFLOW_LIMITER = AdaptiveLimiter.from_settings()
+
+WORKFLOW_CONCURRENCY_LIMIT.set_function(lambda: int(WORKFLOW_LIMITER.limit))
+WORKFLOW_INFLIGHT.set_function(lambda: WORKFLOW_LIMITER.inflight)
+WORKFLOW_LIMITER_WAITING.set_function(lambda: WORKFLOW_LIMITER.waiting)
+API_LATENCY_WINDOW.set_function(lambda: WORKFLOW_LIMITER.latency or 0.0)
+API_LATENCY_BASELINE.set_function(lambda: WORKFLOW_LIMITER.baseline or 0.0)
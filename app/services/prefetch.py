@@ -0,0 +1,140 @@
+# app/services/prefetch.py
+"""
+Speculative prefetch of the internal API lookups at ingest.
+
+Between /webhook accepting a message and a worker reaching step 3, the
+customer's data could already be on its way. With ``PREFETCH_ENABLED``:
+
+* /webhook calls ``PREFETCHER.schedule(phone)``. This starts a background
+  task on the web loop and does not wait for it. The task issues the exact
+  lookups steps 3 and 5 will make and stores the successful answers in a
+  shared cache for ``PREFETCH_TTL_SECONDS``. The cache lives in Redis, or
+  in memory when no Redis is configured.
+* ``check_customer_registration_api`` and ``fetch_customer_orders_api``
+  read that cache before calling out. Lookups are counted as hits or
+  misses in ``prefetch_cache_lookups_total``, so the hit rate shows
+  whether the speculation pays off.
+
+At most ``PREFETCH_CONCURRENCY`` prefetches run at once, and extra ones are
+dropped rather than queued. A phone number with a prefetch in flight, or
+one finished within the TTL, is not fetched again. Errors are never cached:
+a failed prefetch only means the step makes the call itself.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+from app.config import settings
+from app.observability.metrics import PREFETCH_INFLIGHT, PREFETCH_LOOKUPS, PREFETCH_REQUESTS
+from app.services.redis_client import get_redis, redis_enabled
+from app.utils.jsoncodec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "prefetch:"
+
+
+class PrefetchCache:
+    """Short-lived API answers keyed by ``(kind, request key)``; Redis when configured, else memory."""
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @staticmethod
+    def _key(kind: str, key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}{kind}:{key}"
+
+    async def put(self, kind: str, key: str, data: Dict[str, Any]) -> None:
+        if redis_enabled():
+            await get_redis().set(self._key(kind, key), dumps(data), ex=max(int(self.ttl), 1))
+            return
+        self._memory[self._key(kind, key)] = (time.monotonic() + self.ttl, data)
+        self._memory.move_to_end(self._key(kind, key))
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def _get(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        if redis_enabled():
+            raw = await get_redis().get(self._key(kind, key))
+            return loads(raw) if raw else None
+        entry = self._memory.get(self._key(kind, key))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    async def lookup(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """Cached answer or None, counted as a hit or miss. Cache errors count as misses."""
+        try:
+            data = await self._get(kind, key)
+        except Exception as e:
+            logger.warning(f"Prefetch cache lookup failed: {e}")
+            data = None
+        PREFETCH_LOOKUPS.labels(kind, "hit" if data is not None else "miss").inc()
+        return data
+
+
+class Prefetcher:
+    """Fire-and-forget prefetches with a concurrency cap and per-phone deduplication."""
+
+    def __init__(self, concurrency: int, ttl: float, max_recent: int = 10000):
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.max_recent = max_recent
+        self._inflight: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._recent: "OrderedDict[str, float]" = OrderedDict()
+
+    @classmethod
+    def from_settings(cls) -> "Prefetcher":
+        return cls(settings.PREFETCH_CONCURRENCY, settings.PREFETCH_TTL_SECONDS)
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def schedule(self, customer_phone_number: str) -> bool:
+        """Start prefetching for this number unless deduplicated or at the cap; never blocks."""
+        if customer_phone_number in self._inflight or \
+                self._recent.get(customer_phone_number, 0.0) > time.monotonic():
+            PREFETCH_REQUESTS.labels("deduplicated").inc()
+            return False
+        if len(self._inflight) >= self.concurrency:
+            PREFETCH_REQUESTS.labels("dropped").inc()
+            return False
+        self._inflight.add(customer_phone_number)
+        task = asyncio.create_task(self._prefetch(customer_phone_number))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        PREFETCH_REQUESTS.labels("started").inc()
+        return True
+
+    async def _prefetch(self, customer_phone_number: str) -> None:
+        # Imported here: apis reads PREFETCH_CACHE from this module
+        from app.services.apis import prefetch_customer_data
+        try:
+            stored = await prefetch_customer_data(customer_phone_number)
+            PREFETCH_REQUESTS.labels("stored" if stored else "failed").inc()
+        except Exception as e:
+            PREFETCH_REQUESTS.labels("failed").inc()
+            logger.warning(f"Prefetch for {customer_phone_number} failed: {e}")
+        finally:
+            self._inflight.discard(customer_phone_number)
+            self._recent[customer_phone_number] = time.monotonic() + self.ttl
+            self._recent.move_to_end(customer_phone_number)
+            while len(self._recent) > self.max_recent:
+                self._recent.popitem(last=False)
+
+    async def stop(self) -> None:
+        """Cancel prefetches still running (shutdown)."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+PREFETCH_CACHE = PrefetchCache(settings.PREFETCH_TTL_SECONDS)
+PREFETCHER = Prefetcher.from_settings()
+PREFETCH_INFLIGHT.set_function(lambda: PREFETCHER.inflight)
@@ -0,0 +1,99 @@
+# app/services/priority.py
+"""
+Priority classes for queued workflows, chosen at ingest.
+
+/webhook runs ``classify`` on each message. It uses the keyword rules Step 7
+uses (``classify_intent``) plus the optional ``event["customer_tier"]``:
+
+* refund requests are ``high``, order-status questions are ``normal`` and
+  everything else is ``low``;
+* a tier listed in ``PRIORITY_BOOST_TIERS`` moves the message up one class.
+
+With ``PRIORITY_ROUTING`` on, each class has its own Celery queue
+(``workflow.<class>``). Workers consume all of them and use
+``WeightedQueueCycle`` to decide which queue to pull from next. That is a
+smooth weighted round robin over the queues that have work, using the
+``PRIORITY_QUEUE_WEIGHTS`` shares. Under a backlog, refunds get most of the
+worker slots but low-priority work still gets its share and is never starved.
+"""
+from typing import Any, Dict, List, Optional
+
+from kombu.utils.scheduling import round_robin_cycle
+
+from app.config import settings
+from app.services.agent import classify_intent
+
+PRIORITIES = ("high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+QUEUE_PREFIX = "workflow."
+
+INTENT_PRIORITY = {
+    "refund_request": "high",
+    "order_status": "normal",
+    "general_query": "low",
+}
+
+
+def _csv(value: str) -> List[str]:
+    return [part.strip().lower() for part in value.split(",") if part.strip()]
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse ``"high=6,normal=3,low=1"``; classes left out get weight 1."""
+    weights = {priority: 1.0 for priority in PRIORITIES}
+    for part in _csv(spec):
+        name, _, value = part.partition("=")
+        if name not in weights or not value:
+            raise ValueError(f"Bad PRIORITY_QUEUE_WEIGHTS entry '{part}'")
+        weights[name] = max(float(value), 0.0)
+    return weights
+
+
+def classify(event: Dict[str, Any]) -> str:
+    """Priority class for a webhook event."""
+    priority = INTENT_PRIORITY.get(classify_intent(str(event.get("message", "")))["intent"], DEFAULT_PRIORITY)
+    tier = str(event.get("customer_tier") or "").lower()
+    if tier and tier in _csv(settings.PRIORITY_BOOST_TIERS):
+        priority = PRIORITIES[max(PRIORITIES.index(priority) - 1, 0)]
+    return priority
+
+
+def queue_name(priority: Optional[str]) -> str:
+    return f"{QUEUE_PREFIX}{priority or DEFAULT_PRIORITY}"
+
+
+def worker_queues() -> List[str]:
+    """Queues a worker consumes: one per class, plus the legacy default queue."""
+    return [queue_name(priority) for priority in PRIORITIES] + ["celery"]
+
+
+class WeightedQueueCycle(round_robin_cycle):
+    """
+    kombu queue-order strategy: smooth weighted round robin.
+
+    kombu's Redis transport issues BRPOP over the queues in the order
+    ``consume`` returns, so it pops from the first non-empty queue, and then
+    calls ``rotate`` with that queue. Each pop credits every queue with its
+    weight and debits the winner by the total. Ordering by credit therefore
+    serves backlogged queues in proportion to their weights. Credit is
+    bounded, so a queue that sat empty for a while cannot bank a long burst.
+    """
+
+    def __init__(self, it=None):
+        super().__init__(it)
+        self.weights = parse_weights(settings.PRIORITY_QUEUE_WEIGHTS)
+        self.credit: Dict[str, float] = {}
+
+    def _weight(self, queue: str) -> float:
+        priority = queue[len(QUEUE_PREFIX):] if queue.startswith(QUEUE_PREFIX) else DEFAULT_PRIORITY
+        return self.weights.get(priority, self.weights[DEFAULT_PRIORITY])
+
+    def consume(self, n):
+        return sorted(self.items[:n], key=lambda queue: -self.credit.get(queue, 0.0))
+
+    def rotate(self, last_used):
+        total = sum(self._weight(queue) for queue in self.items)
+        for queue in self.items:
+            credit = self.credit.get(queue, 0.0) + self._weight(queue) - (total if queue == last_used else 0.0)
+            self.credit[queue] = min(max(credit, -total), total)
+        return last_used
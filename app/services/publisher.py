@@ -0,0 +1,149 @@
+# app/services/publisher.py
+"""
+Non-blocking Celery publishing for the async /webhook handler.
+
+``apply_async`` writes to Redis over a blocking socket. Called from an
+``async def`` handler it stalls the event loop for one broker round trip,
+and every concurrent request waits behind it. Instead, the handler hands the
+task to ``PUBLISHER_THREADS`` publisher threads through a bounded queue and
+returns.
+
+* A full queue raises ``PublishRejected`` (503 from /webhook), so a slow
+  broker gives backpressure and not unbounded memory.
+* With ``PUBLISHER_CONFIRM`` the handler awaits the broker write off the
+  loop, so a 202 means the task is in Redis. Without it, a task that still
+  fails after kombu's publish retries gets a failed completion record
+  (``reason: enqueue_failed``) in the result store.
+* ``stop()`` drains the queue on shutdown.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.observability.metrics import PUBLISHER_QUEUE_DEPTH, WEBHOOK_PUBLISH_DURATION, WEBHOOK_PUBLISH_ERRORS
+from app.services.results import ResultStore, get_result_store, summarize_result
+
+logger = logging.getLogger(__name__)
+
+
+class PublishRejected(Exception):
+    """Raised by ``submit`` when the handoff queue is full or the publisher is stopping."""
+
+
+class TaskPublisher:
+    """Publishes Celery tasks from dedicated threads fed by a bounded queue."""
+
+    def __init__(self, threads: int, max_pending: int):
+        self.threads = threads
+        self._queue: "queue.Queue[Optional[Tuple[Any, Dict[str, Any], Future]]]" = queue.Queue(maxsize=max_pending)
+        self._workers: List[threading.Thread] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    @classmethod
+    def from_settings(cls) -> "TaskPublisher":
+        return cls(settings.PUBLISHER_THREADS, settings.PUBLISHER_QUEUE_SIZE)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self) -> None:
+        if self._workers:
+            return
+        with self._lock:
+            if not self._workers:
+                self._loop = asyncio.get_running_loop()
+                self._workers = [threading.Thread(target=self._run, name=f"task-publisher-{i}", daemon=True)
+                                 for i in range(self.threads)]
+                for worker in self._workers:
+                    worker.start()
+
+    def submit(self, task: Any, **options: Any) -> Future:
+        """Queue ``task.apply_async(**options)``; the returned future resolves once Redis has it."""
+        if self._stopping:
+            raise PublishRejected("publisher is shutting down")
+        self._ensure_started()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((task, options, future))
+        except queue.Full:
+            raise PublishRejected(f"publish queue full ({self._queue.maxsize} tasks pending)")
+        return future
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            task, options, future = item
+            started = time.perf_counter()
+            try:
+                task.apply_async(**options)
+                WEBHOOK_PUBLISH_DURATION.observe(time.perf_counter() - started)
+                future.set_result(None)
+            except Exception as e:
+                WEBHOOK_PUBLISH_ERRORS.inc()
+                logger.error(f"Publishing {task.name} failed: {e}")
+                future.set_exception(e)
+                self._record_failure(_published_jobs(options))
+
+    def _record_failure(self, jobs: List[Dict[str, Any]]) -> None:
+        """Leave failed completion records so pollers don't wait for tasks that never reached Redis."""
+        if not jobs or self._loop is None or self._loop.is_closed():
+            return
+        completed_at = time.time()
+        summaries = [
+            summarize_result(
+                {"workflow_id": job["workflow_id"], "workflow": job.get("workflow"),
+                 "status": "failed", "reason": "enqueue_failed"},
+                job.get("enqueued_at"), completed_at,
+            )
+            for job in jobs
+        ]
+        store = get_result_store()
+        asyncio.run_coroutine_threadsafe(_save_all(store, summaries), self._loop)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Publish what is queued (up to ``timeout``), then stop the threads."""
+        if not self._workers:
+            return
+        self._stopping = True
+        deadline = time.monotonic() + timeout
+        for _ in self._workers:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        if self.depth:
+            logger.warning(f"Publisher stopped with {self.depth} task(s) not published")
+        self._workers = []
+        # Allow a restart (e.g. a new lifespan in the same process)
+        self._stopping = False
+
+
+def _published_jobs(options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The workflow jobs carried by a publish: run_workflow_task's kwargs, or run_workflow_batch_task's job list."""
+    kwargs = options.get("kwargs") or {}
+    if kwargs.get("workflow_id"):
+        return [kwargs]
+    args = options.get("args") or ()
+    if args and isinstance(args[0], list):
+        return [job for job in args[0] if isinstance(job, dict) and job.get("workflow_id")]
+    return []
+
+
+async def _save_all(store: ResultStore, summaries: List[Dict[str, Any]]) -> None:
+    await asyncio.gather(*(store.save(summary) for summary in summaries))
+
+
+PUBLISHER = TaskPublisher.from_settings()
+PUBLISHER_QUEUE_DEPTH.set_function(lambda: PUBLISHER.depth)
@@ -0,0 +1,31 @@
+# app/services/redis_client.py
+import asyncio
+from typing import Optional
+import redis.asyncio as redis
+from app.config import settings
+
+# Like the httpx client, the asyncio Redis pool is bound to the event loop
+# that created it, so keep one per process and loop
+_redis: Optional[redis.Redis] = None
+_redis_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def redis_enabled() -> bool:
+    """Whether a Redis URL is configured."""
+    return bool(settings.REDIS_URL)
+
+def get_redis() -> redis.Redis:
+    """Return the shared asyncio Redis client for the running event loop."""
+    global _redis, _redis_loop
+    loop = asyncio.get_running_loop()
+    if _redis is None or _redis_loop is not loop:
+        _redis = redis.Redis.from_url(settings.REDIS_URL, max_connections=settings.REDIS_MAX_CONNECTIONS)
+        _redis_loop = loop
+    return _redis
+
+async def close_redis() -> None:
+    """Close the shared Redis client, if any."""
+    global _redis, _redis_loop
+    if _redis is not None:
+        await _redis.aclose()
+    _redis = None
+    _redis_loop = None
@@ -0,0 +1,109 @@
+# app/services/results.py
+"""
+Compact per-workflow completion records.
+
+The full workflow result (logs, visualizations) stays in the Celery result
+backend; this store keeps a small summary keyed by workflow_id with the
+ingest/start/completion timestamps, so callers and load generators can
+correlate a /webhook submission with its outcome.
+"""
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+from app.config import settings
+from app.services.redis_client import get_redis, redis_enabled
+from app.utils.jsoncodec import dumps, loads
+
+RESULT_KEY_PREFIX = "workflow:result:"
+
+def summarize_result(result: Dict[str, Any], enqueued_at: Optional[float], started_at: float,
+                     completed_at: Optional[float] = None) -> Dict[str, Any]:
+    """Build the completion record for a finished workflow."""
+    completed_at = completed_at or time.time()
+    return {
+        "workflow_id": result.get("workflow_id"),
+        "workflow": result.get("workflow"),
+        "status": result.get("status"),
+        "final_status": result.get("final_status"),
+        "reason": result.get("reason"),
+        "enqueued_at": enqueued_at,
+        "started_at": started_at,
+        "completed_at": completed_at,
+        "queue_wait_ms": (started_at - enqueued_at) * 1000 if enqueued_at else None,
+        "duration_ms": (completed_at - started_at) * 1000,
+    }
+
+# Dropped first to last when a result is over the persisted size cap
+CAPPABLE_RESULT_KEYS = ("visualization", "beautified_output", "globals", "logs")
+
+def cap_result(result: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+    """
+    Shrink a workflow result to about ``max_bytes`` of JSON before it is persisted
+    (Celery result backend), replacing its bulkiest parts with size markers.
+    """
+    size = len(dumps(result))
+    if not max_bytes or size <= max_bytes:
+        return result
+    capped = {**result, "truncated_from_bytes": size}
+    for key in CAPPABLE_RESULT_KEYS:
+        if key in capped:
+            capped[key] = {"truncated": True, "bytes": len(dumps(capped[key]))}
+            if len(dumps(capped)) <= max_bytes:
+                break
+    return capped
+
+class ResultStore(ABC):
+    """Interface for completion record storage."""
+
+    @abstractmethod
+    async def save(self, summary: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def get_many(self, workflow_ids: Iterable[str]) -> List[Optional[Dict[str, Any]]]:
+        ...
+
+    async def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        return (await self.get_many([workflow_id]))[0]
+
+class RedisResultStore(ResultStore):
+    """Completion records in Redis with a TTL; shared by web and workers."""
+
+    async def save(self, summary: Dict[str, Any]) -> None:
+        await get_redis().set(
+            RESULT_KEY_PREFIX + summary["workflow_id"],
+            dumps(summary),
+            ex=settings.RESULT_TTL_SECONDS,
+        )
+
+    async def get_many(self, workflow_ids: Iterable[str]) -> List[Optional[Dict[str, Any]]]:
+        keys = [RESULT_KEY_PREFIX + workflow_id for workflow_id in workflow_ids]
+        if not keys:
+            return []
+        return [loads(raw) if raw else None for raw in await get_redis().mget(keys)]
+
+class MemoryResultStore(ResultStore):
+    """Bounded in-process store, used when no Redis is configured."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def save(self, summary: Dict[str, Any]) -> None:
+        self._records[summary["workflow_id"]] = summary
+        self._records.move_to_end(summary["workflow_id"])
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    async def get_many(self, workflow_ids: Iterable[str]) -> List[Optional[Dict[str, Any]]]:
+        return [self._records.get(workflow_id) for workflow_id in workflow_ids]
+
+_store: Optional[ResultStore] = None
+
+def get_result_store() -> ResultStore:
+    """Return the process-wide result store (Redis if configured, else memory)."""
+    global _store
+    if _store is None:
+        _store = RedisResultStore() if redis_enabled() else MemoryResultStore()
+    return _store
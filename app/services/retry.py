@@ -0,0 +1,158 @@
+# app/services/retry.py
+"""
+Retry policy for workflow tasks: error classification, jittered backoff and
+a global retry budget.
+
+* ``is_retryable``: only failures that can succeed on a second try are
+  retried. These are connection and timeout errors (Redis, the broker,
+  HTTP transport) and 429/5xx HTTP answers. Anything else (unknown
+  workflow, bad payload, a bug in a step) fails the same way every time
+  and is treated as permanent. The API layer catches its errors, so a run
+  that failed on a transient API error is flagged ``retryable`` and raised
+  by the runner as ``TransientWorkflowFailure``.
+* ``backoff_delay``: full-jitter exponential backoff. Tasks that failed
+  together in one dependency blip come back spread out instead of in
+  lockstep waves.
+* ``RetryBudget``: retries in the last ``RETRY_BUDGET_WINDOW_SECONDS`` may
+  not exceed ``RETRY_BUDGET_RATIO`` of the first attempts in that window
+  (or ``RETRY_BUDGET_MIN_RETRIES``, whichever is higher). During an
+  incident, retry volume stays a bounded fraction of real traffic. Counts
+  are kept in 10-second Redis buckets shared by every worker, or per
+  process without Redis. Budget bookkeeping never fails a task: if Redis
+  is unreachable, the retry is allowed.
+"""
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from app.config import settings
+from app.services.redis_client import get_redis, redis_enabled
+
+logger = logging.getLogger(__name__)
+
+BUDGET_KEY_PREFIX = "retry_budget:"
+BUCKET_SECONDS = 10
+
+# Transport failures only: other OSErrors (FileNotFoundError, PermissionError, ...) fail the same way every time
+RETRYABLE_ERRORS = (
+    ConnectionError, TimeoutError, asyncio.TimeoutError,
+    RedisConnectionError, RedisTimeoutError, httpx.TransportError, httpx.TimeoutException,
+)
+
+# Grant up to ARGV[3] retries if the window's retries stay within max(ARGV[2], ARGV[1] * attempts).
+# KEYS: the window's attempt buckets, then its retry buckets (current bucket last); ARGV[4]: bucket TTL
+_SPEND_SCRIPT = """
+local n = #KEYS / 2
+local attempts, retries = 0, 0
+for i = 1, n do
+    attempts = attempts + tonumber(redis.call('GET', KEYS[i]) or '0')
+    retries = retries + tonumber(redis.call('GET', KEYS[n + i]) or '0')
+end
+local allowed = math.max(tonumber(ARGV[2]), math.floor(tonumber(ARGV[1]) * attempts)) - retries
+local grant = math.max(0, math.min(tonumber(ARGV[3]), allowed))
+if grant > 0 then
+    redis.call('INCRBY', KEYS[#KEYS], grant)
+    redis.call('EXPIRE', KEYS[#KEYS], ARGV[4])
+end
+return grant
+"""
+
+
+class TransientWorkflowFailure(Exception):
+    """
+    A workflow run that failed on a transient error, raised (instead of being
+    recorded) so a task can retry it. ``record()`` stores the failed result
+    once no retry follows.
+    """
+
+    def __init__(self, result: Dict[str, Any], record: Callable[[], Awaitable[None]]):
+        super().__init__(f"{result.get('reason')}: {result.get('error')}")
+        self.result = result
+        self.record = record
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether ``exc`` is a transient failure worth retrying."""
+    if isinstance(exc, TransientWorkflowFailure):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, RETRYABLE_ERRORS)
+
+
+def backoff_delay(attempts: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff after ``attempts`` failed tries."""
+    return random.uniform(0, min(cap, base * 2 ** max(0, attempts - 1)))
+
+
+class RetryBudget:
+    """Retries capped at a fraction of recent first attempts, counted in time buckets."""
+
+    def __init__(self, ratio: float, min_retries: int, window_seconds: float):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.buckets = max(1, math.ceil(window_seconds / BUCKET_SECONDS))
+        # Per-process fallback: bucket -> [attempts, retries]
+        self._local: Dict[int, List[int]] = {}
+
+    @classmethod
+    def from_settings(cls) -> "RetryBudget":
+        return cls(settings.RETRY_BUDGET_RATIO, settings.RETRY_BUDGET_MIN_RETRIES,
+                   settings.RETRY_BUDGET_WINDOW_SECONDS)
+
+    def _window(self) -> range:
+        current = int(time.time() // BUCKET_SECONDS)
+        return range(current - self.buckets + 1, current + 1)
+
+    def _keys(self, kind: str) -> List[str]:
+        return [f"{BUDGET_KEY_PREFIX}{kind}:{bucket}" for bucket in self._window()]
+
+    @property
+    def _ttl(self) -> int:
+        return (self.buckets + 1) * BUCKET_SECONDS
+
+    def _local_counts(self) -> Tuple[int, int]:
+        window = self._window()
+        for bucket in [b for b in self._local if b < window.start]:
+            del self._local[bucket]
+        counts = [self._local.get(bucket, (0, 0)) for bucket in window]
+        return sum(c[0] for c in counts), sum(c[1] for c in counts)
+
+    async def record_attempts(self, count: int = 1) -> None:
+        """Count first attempts (new tasks), which earn retry allowance."""
+        if not redis_enabled():
+            self._local.setdefault(self._window()[-1], [0, 0])[0] += count
+            return
+        try:
+            key = self._keys("attempts")[-1]
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.incrby(key, count)
+            pipe.expire(key, self._ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Retry budget: could not record attempts: {e}")
+
+    async def acquire(self, count: int = 1) -> int:
+        """Spend up to ``count`` retries from the budget; returns how many were granted."""
+        if not redis_enabled():
+            attempts, retries = self._local_counts()
+            grant = max(0, min(count, max(self.min_retries, math.floor(self.ratio * attempts)) - retries))
+            self._local.setdefault(self._window()[-1], [0, 0])[1] += grant
+            return grant
+        try:
+            keys = self._keys("attempts") + self._keys("retries")
+            return int(await get_redis().eval(_SPEND_SCRIPT, len(keys), *keys, self.ratio, self.min_retries,
+                                              count, self._ttl))
+        except Exception as e:
+            logger.warning(f"Retry budget unavailable, allowing retry: {e}")
+            return count
+
+
+RETRY_BUDGET = RetryBudget.from_settings()
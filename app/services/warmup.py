@@ -0,0 +1,78 @@
+# app/services/warmup.py
+"""
+Process warm-up, so a fresh worker's first tasks run at steady-state speed.
+
+A cold process pays for plan compilation (handler imports included), for
+building the httpx and Redis pools, and for TCP/TLS connection setup on its
+first API calls. ``warm_up`` does all of that before the process accepts
+work. It compiles every workflow plan, builds the shared clients on the
+running event loop and opens ``WARM_CONNECTIONS_PER_API`` pooled
+connections to each internal API. The connections are opened with
+concurrent HEAD requests whose status is ignored: only the kept-alive
+connection matters.
+
+Failures are logged and never fatal. A worker whose APIs are still coming
+up starts cold, as before.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict
+
+from app.config import settings
+from app.services.apis import get_http_client
+from app.services.redis_client import get_redis, redis_enabled
+from app.workflow.plan import compile_all
+
+logger = logging.getLogger(__name__)
+
+WARM_REQUEST_TIMEOUT = 2.0
+
+
+def precompile() -> float:
+    """Compile every workflow plan; returns seconds taken. Safe to call before forking."""
+    started = time.perf_counter()
+    compile_all()
+    return time.perf_counter() - started
+
+
+async def warm_connections(per_api: int) -> Dict[str, int]:
+    """Open up to ``per_api`` pooled connections to each internal API; returns how many responded."""
+    client = get_http_client()
+    targets = {
+        "check_customer_registration": str(settings.CHECK_CUSTOMER_REGISTRATION_API_URL),
+        "fetch_customer_orders": str(settings.FETCH_CUSTOMER_ORDERS_API_URL),
+    }
+    # All at once: Celery gives worker_process_init only a few seconds
+    replies = await asyncio.gather(
+        *(client.head(url, timeout=WARM_REQUEST_TIMEOUT) for url in targets.values() for _ in range(per_api)),
+        return_exceptions=True,
+    )
+    opened = {}
+    for i, name in enumerate(targets):
+        batch = replies[i * per_api:(i + 1) * per_api]
+        opened[name] = sum(1 for reply in batch if not isinstance(reply, Exception))
+        if opened[name] < per_api:
+            errors = {type(reply).__name__ for reply in batch if isinstance(reply, Exception)}
+            logger.warning(f"Warm-up: {name} connections opened {opened[name]}/{per_api} ({', '.join(errors)})")
+    return opened
+
+
+async def warm_up(per_api: int = None) -> Dict[str, float]:
+    """Compile plans and warm the HTTP and Redis pools on the running loop; returns step timings."""
+    per_api = settings.WARM_CONNECTIONS_PER_API if per_api is None else per_api
+    timings = {"compile_s": precompile()}
+
+    started = time.perf_counter()
+    if per_api > 0:
+        await warm_connections(per_api)
+    timings["http_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if redis_enabled():
+        try:
+            await get_redis().ping()
+        except Exception as e:
+            logger.warning(f"Warm-up: Redis ping failed: {e}")
+    timings["redis_s"] = time.perf_counter() - started
+    return timings
@@ -0,0 +1,286 @@
+# app/streams.py
+"""
+Redis Streams ingestion backend (``EXECUTION_MODE=streams``).
+
+/webhook appends each job to the ``STREAMS_KEY`` stream with XADD. The
+``MAXLEN ~`` option trims the stream on write, so it holds the most recent
+``STREAMS_MAXLEN`` messages for replay. Consumers run as their own
+processes::
+
+    python -m app.streams                       # consume (one consumer per process)
+    python -m app.streams tail --count 20       # show recent traffic
+    python -m app.streams replay --start 1717000000000 --count 100
+
+Each consumer reads through the ``STREAMS_GROUP`` consumer group with
+XREADGROUP. Each read asks for up to ``STREAMS_BATCH_SIZE`` entries, limited
+by the free in-flight slots. Workflows run concurrently on the consumer's
+event loop, so the adaptive limiter applies here.
+
+Finished entries are acknowledged in batches: one XACK per loop iteration.
+Entries a crashed consumer left pending longer than
+``STREAMS_CLAIM_IDLE_MS`` are taken over with XAUTOCLAIM. Entries delivered
+more than ``STREAMS_MAX_DELIVERIES`` times go to ``<STREAMS_KEY>:dead`` and
+are not retried again. So do entries whose job cannot be decoded, as soon as
+they are read.
+
+Delivery is at least once: a workflow may run twice if its consumer dies
+after running it but before the batched XACK.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from redis.exceptions import ResponseError
+
+from app.config import settings
+from app.observability.analytics import ANALYTICS
+from app.observability.loopmon import LOOP_MONITOR
+from app.observability.metrics import STREAM_MESSAGES, start_metrics_server
+from app.observability.tracing import set_service_name
+from app.services.limiter import WORKFLOW_LIMITER
+from app.services.redis_client import close_redis, get_redis
+from app.services.warmup import warm_up
+from app.utils.jsoncodec import dumps, loads
+from app.workflow.runner import execute_and_record
+
+logger = logging.getLogger(__name__)
+
+JOB_FIELD = "job"
+
+
+def dead_letter_key() -> str:
+    return f"{settings.STREAMS_KEY}:dead"
+
+
+# --- producer ------------------------------------------------------------------------
+
+async def publish(job: Dict[str, Any]) -> str:
+    """Append one job (``execute_and_record`` keyword arguments) to the stream."""
+    entry_id = await get_redis().xadd(
+        settings.STREAMS_KEY, {JOB_FIELD: dumps(job)}, maxlen=settings.STREAMS_MAXLEN, approximate=True
+    )
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+async def publish_many(jobs: Iterable[Dict[str, Any]]) -> List[str]:
+    """Append many jobs in one pipelined round trip."""
+    pipe = get_redis().pipeline(transaction=False)
+    for job in jobs:
+        pipe.xadd(settings.STREAMS_KEY, {JOB_FIELD: dumps(job)}, maxlen=settings.STREAMS_MAXLEN, approximate=True)
+    return [entry_id.decode() if isinstance(entry_id, bytes) else entry_id for entry_id in await pipe.execute()]
+
+
+# --- consumer ------------------------------------------------------------------------
+
+class StreamConsumer:
+    """One consumer of the workflow stream's consumer group."""
+
+    def __init__(self, name: Optional[str] = None):
+        self.key = settings.STREAMS_KEY
+        self.group = settings.STREAMS_GROUP
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = settings.STREAMS_BATCH_SIZE
+        self.concurrency = settings.STREAMS_CONCURRENCY
+        self.block_ms = settings.STREAMS_BLOCK_MS
+        self.claim_idle_ms = settings.STREAMS_CLAIM_IDLE_MS
+        self.max_deliveries = settings.STREAMS_MAX_DELIVERIES
+        self.running = False
+        self._inflight: Set[asyncio.Task] = set()
+        self._acks: List[str] = []
+        self._last_reclaim = 0.0
+
+    async def ensure_group(self) -> None:
+        try:
+            await get_redis().xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _capacity(self) -> int:
+        limit = self.concurrency
+        if WORKFLOW_LIMITER.enabled:
+            limit = min(limit, int(WORKFLOW_LIMITER.limit))
+        return min(self.batch_size, limit - len(self._inflight))
+
+    async def _start(self, entry_id: Any, fields: Optional[Dict[bytes, bytes]]) -> None:
+        entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        if not fields:
+            # Trimmed while pending: nothing to run, just clear it from the pending list
+            self._acks.append(entry_id)
+            return
+        try:
+            job = loads(fields[JOB_FIELD.encode()])
+            if not isinstance(job, dict):
+                raise ValueError(f"job is a {type(job).__name__}, not an object")
+        except Exception as e:
+            # Malformed or foreign entry: it can never run, so park it instead of stopping the consumer
+            await self._dead_letter(entry_id, fields, f"malformed: {e!r}")
+            return
+        task = asyncio.create_task(self._run(entry_id, job))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _dead_letter(self, entry_id: str, fields: Dict[bytes, bytes], reason: str) -> None:
+        """Copy the entry to the dead-letter stream and acknowledge it."""
+        await get_redis().xadd(dead_letter_key(), {**fields, b"source_id": entry_id, b"reason": reason},
+                               maxlen=settings.STREAMS_MAXLEN, approximate=True)
+        self._acks.append(entry_id)
+        STREAM_MESSAGES.labels("dead_lettered").inc()
+        logger.error(f"Stream entry {entry_id} dead-lettered: {reason}")
+
+    async def _run(self, entry_id: str, job: Dict[str, Any]) -> None:
+        try:
+            await execute_and_record(**job, source="stream")
+        except Exception:
+            # Left pending on purpose: another consumer reclaims it after STREAMS_CLAIM_IDLE_MS
+            STREAM_MESSAGES.labels("failed").inc()
+            logger.exception(f"Stream entry {entry_id} (workflow {job.get('workflow_id')}) failed")
+            return
+        self._acks.append(entry_id)
+
+    async def flush_acks(self) -> None:
+        if self._acks:
+            acks, self._acks = self._acks, []
+            await get_redis().xack(self.key, self.group, *acks)
+            STREAM_MESSAGES.labels("acked").inc(len(acks))
+
+    async def reclaim(self) -> None:
+        """Take over entries other consumers left pending too long; dead-letter repeat offenders."""
+        redis = get_redis()
+        start = "0-0"
+        while True:
+            capacity = self._capacity()
+            if capacity <= 0:
+                return
+            reply = await redis.xautoclaim(self.key, self.group, self.name, self.claim_idle_ms,
+                                           start_id=start, count=capacity)
+            start, entries = reply[0], reply[1]
+            if entries:
+                await self._dispatch_claimed(entries)
+            if not entries or start in (b"0-0", "0-0"):
+                return
+
+    async def _dispatch_claimed(self, entries: List[Tuple[Any, Any]]) -> None:
+        entries = [entry for entry in entries if entry[0] is not None]
+        if not entries:
+            return
+        redis = get_redis()
+        ids = [entry_id for entry_id, _ in entries]
+        pending = await redis.xpending_range(self.key, self.group, min=ids[0], max=ids[-1], count=len(ids) * 2)
+        deliveries = {p["message_id"]: p["times_delivered"] for p in pending}
+        for entry_id, fields in entries:
+            delivered = deliveries.get(entry_id, 0)
+            if delivered > self.max_deliveries and fields:
+                entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+                await self._dead_letter(entry_id, fields, f"delivered {delivered} times")
+                continue
+            STREAM_MESSAGES.labels("reclaimed").inc()
+            await self._start(entry_id, fields)
+
+    async def run(self) -> None:
+        await self.ensure_group()
+        self.running = True
+        logger.info(f"Stream consumer {self.name} reading {self.key} as group {self.group}")
+        while self.running:
+            await self.flush_acks()
+            if time.monotonic() - self._last_reclaim >= self.claim_idle_ms / 1000:
+                self._last_reclaim = time.monotonic()
+                await self.reclaim()
+
+            capacity = self._capacity()
+            if capacity <= 0 and self._inflight:
+                await asyncio.wait(self._inflight, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            reply = await get_redis().xreadgroup(self.group, self.name, {self.key: ">"},
+                                                 count=capacity, block=self.block_ms)
+            for _, entries in reply or ():
+                STREAM_MESSAGES.labels("read").inc(len(entries))
+                for entry_id, fields in entries:
+                    await self._start(entry_id, fields)
+
+        # Graceful stop: let in-flight workflows finish and acknowledge them
+        if self._inflight:
+            await asyncio.wait(self._inflight)
+        await self.flush_acks()
+
+    def stop(self) -> None:
+        self.running = False
+
+
+# --- CLI -----------------------------------------------------------------------------
+
+async def _consume() -> None:
+    consumer = StreamConsumer()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, consumer.stop)
+    if settings.LOOP_MONITOR_ENABLED:
+        LOOP_MONITOR.start()
+    ANALYTICS.start()
+    try:
+        await warm_up()
+        await consumer.run()
+    finally:
+        await asyncio.to_thread(ANALYTICS.stop)
+        LOOP_MONITOR.stop()
+        await close_redis()
+
+
+async def _tail(count: int) -> None:
+    for entry_id, fields in await get_redis().xrevrange(settings.STREAMS_KEY, count=count):
+        print(entry_id.decode(), fields.get(JOB_FIELD.encode(), b"<no job field>").decode(errors="replace"))
+    await close_redis()
+
+
+async def _replay(start: str, count: int) -> None:
+    """Re-enqueue ``count`` entries from ``start`` (an entry id or a millisecond timestamp)."""
+    entries = await get_redis().xrange(settings.STREAMS_KEY, min=start, count=count)
+    jobs = []
+    for entry_id, fields in entries:
+        try:
+            job = loads(fields[JOB_FIELD.encode()])
+        except Exception as e:
+            print(f"{entry_id.decode()} skipped: malformed job ({e!r})")
+            continue
+        now = time.time()
+        # A fresh deadline too: the original one has usually passed and the run would be shed
+        deadline = now + settings.WORKFLOW_DEADLINE_SECONDS if settings.WORKFLOW_DEADLINE_SECONDS > 0 else None
+        job.update(workflow_id=str(uuid.uuid4()), enqueued_at=now, deadline=deadline, traceparent=None)
+        jobs.append(job)
+        print(f"{entry_id.decode()} -> {job['workflow_id']}")
+    if jobs:
+        await publish_many(jobs)
+    await close_redis()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Redis Streams workflow consumer and tools.")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("consume", help="Consume the workflow stream (default)")
+    tail = sub.add_parser("tail", help="Print the most recent stream entries")
+    tail.add_argument("--count", type=int, default=20)
+    replay = sub.add_parser("replay", help="Re-enqueue past entries under new workflow ids")
+    replay.add_argument("--start", required=True, help="Entry id or millisecond timestamp to start from")
+    replay.add_argument("--count", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "tail":
+        asyncio.run(_tail(args.count))
+    elif args.command == "replay":
+        asyncio.run(_replay(args.start, args.count))
+    else:
+        set_service_name(f"{settings.TRACING_SERVICE_NAME}-stream-worker")
+        if settings.WORKER_METRICS_PORT:
+            start_metrics_server(settings.WORKER_METRICS_PORT)
+        asyncio.run(_consume())
+
+
+if __name__ == "__main__":
+    main()
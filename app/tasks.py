@@ -1,10 +1,24 @@
 # app/tasks.py
 from celery import Celery
+from celery.signals import task_prerun, worker_init, worker_process_init, worker_process_shutdown
+from kombu import Queue
+from billiard.process import current_process
 from app.config import settings
 import asyncio
+import time
 import uuid
 import logging
-from app.workflow.workflow_manager import run_workflow_instance
+from typing import Optional
+from app.observability.analytics import ANALYTICS
+from app.observability.loopmon import LOOP_MONITOR
+from app.observability.metrics import WORKFLOW_TASK_FAILURES, WORKFLOW_TASK_RETRIES, start_metrics_server
+from app.observability.tracing import set_service_name
+from app.services.results import cap_result
+from app.services.priority import WeightedQueueCycle, queue_name, worker_queues
+from app.services.retry import RETRY_BUDGET, TransientWorkflowFailure, backoff_delay, is_retryable
+from app.services.warmup import precompile, warm_up
+from app.workflow.runner import execute_and_record
+from app.utils.jsoncodec import CELERY_SERIALIZER, register_celery_serializer
 
 # Set up logging for Celery
 logger = logging.getLogger(__name__)
@@ -13,13 +27,100 @@ celery = Celery("worker", broker=settings.REDIS_URL, backend=settings.REDIS_URL)
 celery.conf.task_acks_late = True
 celery.conf.worker_prefetch_multiplier = 1
 
+register_celery_serializer()
+celery.conf.task_serializer = settings.CELERY_SERIALIZER
+celery.conf.result_serializer = settings.CELERY_SERIALIZER
+celery.conf.accept_content = ["json", CELERY_SERIALIZER]
+celery.conf.result_accept_content = ["json", CELERY_SERIALIZER]
+
+# Priority queues (app/services/priority.py): a worker started without -Q consumes all of them,
+# in weighted order rather than kombu's plain round robin
+if settings.PRIORITY_ROUTING:
+    celery.conf.task_default_queue = queue_name(None)
+    celery.conf.task_queues = [Queue(name) for name in worker_queues()]
+    celery.conf.broker_transport_options = {
+        "queue_order_strategy": f"{WeightedQueueCycle.__module__}:{WeightedQueueCycle.__name__}",
+    }
+
+@worker_init.connect
+def precompile_workflow_plans(**kwargs):
+    """Compile every plan (importing its step handlers) in the parent, so pool children inherit them on fork."""
+    logger.info(f"Compiled workflow plans in {precompile() * 1000:.1f}ms")
+
+@worker_process_init.connect
+def warm_worker_process(**kwargs):
+    """Open this child's API and Redis connections on the loop its tasks run on, before it takes a task."""
+    try:
+        timings = asyncio.get_event_loop().run_until_complete(warm_up())
+        logger.info("Worker warm-up: " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in timings.items()))
+    except Exception as e:
+        logger.warning(f"Worker warm-up failed, starting cold: {e}")
+
+@worker_process_init.connect
+def start_loop_monitor(**kwargs):
+    """Watch this child's event loop for lag and blocking calls while tasks run it."""
+    if settings.LOOP_MONITOR_ENABLED:
+        LOOP_MONITOR.start(asyncio.get_event_loop())
+
+@worker_process_init.connect
+def start_stats_flusher(**kwargs):
+    """Publish this child's run analytics to Redis periodically, also while it sits idle between tasks."""
+    ANALYTICS.start()
+
+@worker_process_shutdown.connect
+def flush_stats(**kwargs):
+    """Write the analytics the flusher has not published yet before the child exits."""
+    ANALYTICS.stop()
+
+@task_prerun.connect
+def resume_loop_monitor(**kwargs):
+    """The loop was stopped between tasks: tell the monitor, so the idle gap is not sampled as lag."""
+    LOOP_MONITOR.resume()
+
+@worker_process_init.connect
+def start_worker_metrics_exporter(**kwargs):
+    """Expose this worker process's metrics on WORKER_METRICS_PORT + its pool index."""
+    set_service_name(f"{settings.TRACING_SERVICE_NAME}-worker")
+    if settings.WORKER_METRICS_PORT:
+        port = settings.WORKER_METRICS_PORT + (current_process().index or 0)
+        try:
+            start_metrics_server(port)
+            logger.info(f"Worker metrics exporter listening on :{port}")
+        except OSError as e:
+            logger.warning(f"Worker metrics exporter could not bind :{port}: {e}")
+
+def _retry_countdown(task, deadline: Optional[float] = None) -> float:
+    """Jittered backoff for the task's next retry, or -1 if it would only start after ``deadline``."""
+    countdown = backoff_delay(task.request.retries + 1, settings.RETRY_BACKOFF_BASE_SECONDS,
+                              settings.RETRY_BACKOFF_MAX_SECONDS)
+    if deadline is not None and time.time() + countdown >= deadline:
+        # A retry would only start after the reply stopped mattering
+        return -1
+    return countdown
+
+def _refuse_retry(task, exc: Exception) -> Optional[str]:
+    """Why ``exc`` must not be retried (permanent error, retries used up), or None."""
+    if not is_retryable(exc):
+        return "permanent"
+    if task.request.retries >= task.max_retries:
+        return "max_retries"
+    return None
+
 @celery.task(bind=True, acks_late=True, max_retries=3)
-def run_workflow_task(self, customer_id: str, customer_phone_number: str, event: dict):
-    workflow_id = str(uuid.uuid4())
+def run_workflow_task(self, customer_id: str, customer_phone_number: str, event: dict, workflow: str = None,
+                      workflow_id: str = None, enqueued_at: float = None, priority: str = None,
+                      deadline: float = None):
+    workflow_id = workflow_id or str(uuid.uuid4())
+    loop = asyncio.get_event_loop()
+    if not self.request.retries:
+        # First attempts are what the retry budget is a fraction of
+        loop.run_until_complete(RETRY_BUDGET.record_attempts())
     try:
         # Run the workflow
-        result = asyncio.get_event_loop().run_until_complete(
-            run_workflow_instance(workflow_id, customer_id, customer_phone_number, event, enable_visualization=True)
+        result = loop.run_until_complete(
+            execute_and_record(workflow_id, customer_id, customer_phone_number, event, workflow, enqueued_at,
+                               self.request.get("traceparent"), priority=priority, deadline=deadline,
+                               raise_transient=True)
         )
         
         # Print complete logs to terminal
@@ -51,9 +152,77 @@ def run_workflow_task(self, customer_id: str, customer_phone_number: str, event:
         print("✅ WORKFLOW EXECUTION FINISHED")
         print("="*80 + "\n")
         
-        return result
+        # The return value is persisted in the result backend: keep it under RESULT_MAX_BYTES
+        return cap_result(result, settings.RESULT_MAX_BYTES)
         
     except Exception as exc:
         print(f"\n❌ WORKFLOW EXECUTION FAILED: {str(exc)}")
         print("="*80 + "\n")
-        raise self.retry(exc=exc, countdown=2 ** self.request.retries)
\ No newline at end of file
+        reason = _refuse_retry(self, exc)
+        countdown = _retry_countdown(self, deadline) if reason is None else -1
+        if reason is None and countdown < 0:
+            reason = "deadline"
+        if reason is None and not loop.run_until_complete(RETRY_BUDGET.acquire()):
+            reason = "budget_exhausted"
+        if reason is not None:
+            WORKFLOW_TASK_FAILURES.labels(reason).inc()
+            if isinstance(exc, TransientWorkflowFailure):
+                # No retry left: the failed run is the outcome
+                loop.run_until_complete(exc.record())
+                return cap_result(exc.result, settings.RESULT_MAX_BYTES)
+            raise
+        WORKFLOW_TASK_RETRIES.inc()
+        raise self.retry(exc=exc, countdown=countdown)
+
+@celery.task(bind=True, acks_late=True, max_retries=3)
+def run_workflow_batch_task(self, jobs: list):
+    """Run a chunk of /webhook/batch jobs concurrently on this worker's event loop; retry only the failures."""
+    loop = asyncio.get_event_loop()
+    if not self.request.retries:
+        loop.run_until_complete(RETRY_BUDGET.record_attempts(len(jobs)))
+    results = loop.run_until_complete(
+        asyncio.gather(*(execute_and_record(**job, raise_transient=True) for job in jobs), return_exceptions=True)
+    )
+    counts = {"completed": 0, "failed": 0, "dropped": 0}
+    given_up = []
+
+    def give_up(result: Exception, reason: str) -> None:
+        # Permanent errors and spent retries are failures; deadline and budget refusals drop retryable work
+        WORKFLOW_TASK_FAILURES.labels(reason).inc()
+        counts["failed" if reason in ("permanent", "max_retries") else "dropped"] += 1
+        given_up.append(result)
+
+    retry = []
+    for job, result in zip(jobs, results):
+        if not isinstance(result, Exception):
+            counts["completed"] += 1
+            continue
+        logger.error(f"Batched workflow {job.get('workflow_id')} failed: {result}")
+        reason = _refuse_retry(self, result)
+        if reason is None and job.get("deadline") and time.time() >= job["deadline"]:
+            reason = "deadline"
+        if reason is None:
+            retry.append((job, result))
+        else:
+            give_up(result, reason)
+    if retry:
+        # One countdown for the chunk, computed once expired jobs are out; then drop jobs it would outlive
+        countdown = _retry_countdown(self)
+        in_time = []
+        for job, result in retry:
+            if job.get("deadline") and time.time() + countdown >= job["deadline"]:
+                give_up(result, "deadline")
+            else:
+                in_time.append((job, result))
+        granted = loop.run_until_complete(RETRY_BUDGET.acquire(len(in_time))) if in_time else 0
+        for _, result in in_time[granted:]:
+            give_up(result, "budget_exhausted")
+        retry = in_time[:granted]
+    # Runs that failed transiently and will not be retried get their completion record now
+    records = [exc.record() for exc in given_up if isinstance(exc, TransientWorkflowFailure)]
+    if records:
+        loop.run_until_complete(asyncio.gather(*records, return_exceptions=True))
+    if retry:
+        WORKFLOW_TASK_RETRIES.inc(len(retry))
+        raise self.retry(args=([job for job, _ in retry],), countdown=countdown)
+    return counts
@@ -3,12 +3,12 @@
 Beautification utilities for workflow steps and API responses.
 Provides enhanced formatting with colors, emojis, and structured output.
 """
-import json
 import time
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 from enum import Enum
+from app.utils.jsoncodec import dumps_pretty
 
 class StepStatus(Enum):
     SUCCESS = "success"
@@ -122,7 +122,7 @@ class WorkflowBeautifier:
     def _format_value(self, value: Any) -> str:
         """Format a value for display with appropriate styling."""
         if isinstance(value, dict):
-            return f"{self.COLORS['blue']}{json.dumps(value, indent=2, default=str)}{self.COLORS['reset']}"
+            return f"{self.COLORS['blue']}{dumps_pretty(value)}{self.COLORS['reset']}"
         elif isinstance(value, list):
             if len(value) > 3:
                 return f"{self.COLORS['cyan']}[{len(value)} items]{self.COLORS['reset']}"
@@ -197,7 +197,7 @@ class WorkflowBeautifier:
     def _format_json_response(self, data: Dict[str, Any], indent: int = 4) -> str:
         """Format JSON response with proper indentation and colors."""
         try:
-            json_str = json.dumps(data, indent=2, default=str, ensure_ascii=False)
+            json_str = dumps_pretty(data)
             # Add color to JSON keys and values
             lines = []
             for line in json_str.split('\n'):
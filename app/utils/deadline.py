@@ -0,0 +1,56 @@
+# app/utils/deadline.py
+"""
+Per-workflow deadlines carried through a context variable.
+
+/webhook stamps each job with ``deadline = now + WORKFLOW_DEADLINE_SECONDS``,
+as epoch seconds so it survives the hop to another process. The runner
+opens ``deadline_scope(deadline)`` around the run. Everything below it asks
+``time_budget(default)`` for its timeout: the orchestrator for each step,
+the API client for each HTTP call. A slow step then eats into the budget of
+the steps after it instead of overrunning the SLA.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("workflow_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised by ``time_budget`` once the current deadline has passed."""
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """Make ``deadline`` (epoch seconds, or None for no deadline) current for the enclosed code."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline; None when there is none."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def time_budget(default: Optional[float]) -> Optional[float]:
+    """``default`` capped by the time left; raises ``DeadlineExceeded`` when none is left."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("workflow deadline exceeded")
+    return left if default is None else min(default, left)
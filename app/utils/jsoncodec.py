@@ -0,0 +1,53 @@
+# app/utils/jsoncodec.py
+"""
+One JSON codec for every hot path: webhook bodies, HTTP responses, Celery
+messages, API response decoding, the result store and the renderers.
+
+orjson is used when it is installed (``pip install orjson``). Without it,
+stdlib ``json`` is used with the same settings. Both backends write compact
+UTF-8 and fall back to ``str()`` for values JSON cannot represent.
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# Name and content type the codec is registered under with kombu/Celery
+CELERY_SERIALIZER = "fastjson"
+CELERY_CONTENT_TYPE = "application/x-fastjson"
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize ``obj`` to compact UTF-8 JSON bytes."""
+        return orjson.dumps(obj, default=str, option=_OPTIONS)
+
+    def dumps_pretty(obj: Any) -> str:
+        """Serialize ``obj`` indented by two spaces, for human-readable output."""
+        return orjson.dumps(obj, default=str, option=_OPTIONS | orjson.OPT_INDENT_2).decode("utf-8")
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        """Serialize ``obj`` to compact UTF-8 JSON bytes."""
+        return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps_pretty(obj: Any) -> str:
+        """Serialize ``obj`` indented by two spaces, for human-readable output."""
+        return json.dumps(obj, indent=2, default=str, ensure_ascii=False)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+def register_celery_serializer() -> None:
+    """Register the codec with kombu as ``fastjson`` (bodies travel as raw bytes)."""
+    from kombu.serialization import register
+
+    register(CELERY_SERIALIZER, dumps, loads, content_type=CELERY_CONTENT_TYPE, content_encoding="binary")
@@ -0,0 +1,221 @@
+# app/utils/jsonstream.py
+"""
+Field projection for orders API responses, with incremental parsing for large bodies.
+
+High-volume merchants get order histories of many MB back from
+FETCH_CUSTOMER_ORDERS_API, but the workflow only uses a few fields of the
+latest orders. ``OrdersProjection`` declares what to keep:
+
+* ``fields``: top-level response fields (``("*",)`` keeps all except ``orders``);
+* ``order_fields``: the fields kept on each order;
+* ``max_orders``: how many of the most recent orders to keep. Recency is
+  the ``recent_by`` field when orders carry it; otherwise the later
+  position in the array wins.
+
+Kept orders stay in response order. ``orders_total`` records how many there
+were in all.
+
+Small bodies are parsed in one go (``project``). Larger ones go through
+``StreamingProjector``, fed chunk by chunk as they arrive. It uses ijson
+when installed, and builds only the kept values, so memory stays bounded by
+the projection rather than by the body. Without ijson it buffers the body
+and projects it after a full parse.
+"""
+import heapq
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.jsoncodec import loads
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:  # pragma: no cover - exercised only without ijson
+    ijson = None
+
+HAVE_IJSON = ijson is not None
+
+_OPEN = ("start_map", "start_array")
+_CLOSE = ("end_map", "end_array")
+ORDERS_KEY = "orders"
+
+
+def _csv(value: str) -> Tuple[str, ...]:
+    return tuple(part.strip() for part in value.split(",") if part.strip())
+
+
+@dataclass(frozen=True)
+class OrdersProjection:
+    """What the workflow keeps of an orders response."""
+    fields: Tuple[str, ...] = ("*",)
+    order_fields: Tuple[str, ...] = ("order_id", "status", "items", "total", "created_at")
+    max_orders: int = 20
+    recent_by: Optional[str] = "created_at"
+
+    @classmethod
+    def from_settings(cls) -> "OrdersProjection":
+        return cls(_csv(settings.ORDERS_RESPONSE_FIELDS), _csv(settings.ORDERS_ORDER_FIELDS),
+                   settings.ORDERS_MAX_ORDERS, settings.ORDERS_RECENT_BY or None)
+
+    @property
+    def keep_all_fields(self) -> bool:
+        return "*" in self.fields
+
+    def keeps(self, field: str) -> bool:
+        return field != ORDERS_KEY and (self.keep_all_fields or field in self.fields)
+
+    def project_order(self, order: Any) -> Any:
+        if not isinstance(order, dict):
+            return order
+        return {k: order[k] for k in self.order_fields if k in order}
+
+    def project(self, data: Any) -> Any:
+        """Project an already parsed response."""
+        if not isinstance(data, dict):
+            return data
+        result = {k: v for k, v in data.items() if self.keeps(k)}
+        orders = data.get(ORDERS_KEY)
+        if isinstance(orders, list):
+            recent = _RecentOrders(self)
+            for order in orders:
+                recent.add(self.project_order(order))
+            result[ORDERS_KEY] = recent.orders()
+            result["orders_total"] = recent.seen
+        return result
+
+
+class _RecentOrders:
+    """
+    Bounded min-heap of the ``max_orders`` most recent orders.
+
+    ``recent_by`` values compare natively (numbers as numbers, strings as
+    strings). Once values of different kinds show up, all of them compare as
+    strings; orders without the field count as least recent.
+    """
+
+    def __init__(self, projection: OrdersProjection):
+        self.projection = projection
+        self.seen = 0
+        self._heap: List[Tuple[Tuple[int, Any], int, Any]] = []
+        self._kind: Optional[type] = None
+        self._mixed = False
+
+    def _recency(self, order: Any) -> Any:
+        recent_by = self.projection.recent_by
+        return order.get(recent_by) if recent_by and isinstance(order, dict) else None
+
+    def _key(self, value: Any) -> Tuple[int, Any]:
+        if value is None:
+            return (0, "")
+        if not self._mixed:
+            kind = float if isinstance(value, (int, float)) and not isinstance(value, bool) else type(value)
+            if self._kind is None and kind in (float, str):
+                self._kind = kind
+            elif kind is not self._kind:
+                # No natural order across kinds: rekey what is kept and compare as strings from now on
+                self._mixed = True
+                self._heap = [(self._key(self._recency(order)), seq, order) for _, seq, order in self._heap]
+                heapq.heapify(self._heap)
+        return (1, str(value)) if self._mixed else (1, value)
+
+    def add(self, order: Any) -> None:
+        seq = self.seen
+        self.seen += 1
+        if self.projection.max_orders <= 0:
+            return
+        entry = (self._key(self._recency(order)), seq, order)
+        if len(self._heap) < self.projection.max_orders:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def orders(self) -> List[Any]:
+        return [order for _, _, order in sorted(self._heap, key=lambda entry: entry[1])]
+
+
+class StreamingProjector:
+    """Feed response chunks with ``feed``; ``close`` returns the projected response."""
+
+    def __init__(self, projection: OrdersProjection):
+        self.projection = projection
+        self._buffer: Optional[List[bytes]] = None if HAVE_IJSON else []
+        if HAVE_IJSON:
+            self._events = ijson.sendable_list()
+            self._parser = ijson.parse_coro(self._events, use_float=True)
+            self._result: Dict[str, Any] = {}
+            self._recent = _RecentOrders(projection)
+            self._saw_orders = False
+            self._order: Optional[Dict[str, Any]] = None
+            self._builder: Optional[ObjectBuilder] = None
+            self._depth = 0
+            self._target: Tuple[str, str] = ("", "")
+            self._order_prefixes = {f"{ORDERS_KEY}.item.{k}": k for k in projection.order_fields}
+
+    def feed(self, chunk: bytes) -> None:
+        if self._buffer is not None:
+            self._buffer.append(chunk)
+            return
+        self._parser.send(chunk)
+        self._consume(self._events)
+        del self._events[:]
+
+    def close(self) -> Any:
+        if self._buffer is not None:
+            return self.projection.project(loads(b"".join(self._buffer)))
+        self._parser.close()
+        self._consume(self._events)
+        if self._saw_orders:
+            self._result[ORDERS_KEY] = self._recent.orders()
+            self._result["orders_total"] = self._recent.seen
+        return self._result
+
+    def _assign(self, target: Tuple[str, str], value: Any) -> None:
+        where, key = target
+        if where == "order":
+            self._order[key] = value
+        else:
+            self._result[key] = value
+
+    def _consume(self, events) -> None:
+        for prefix, event, value in events:
+            if self._builder is not None:
+                # Inside a kept container: build it until it closes
+                self._builder.event(event, value)
+                if event in _OPEN:
+                    self._depth += 1
+                elif event in _CLOSE:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._assign(self._target, self._builder.value)
+                        self._builder = None
+                continue
+            if event == "map_key":
+                continue
+            if prefix == f"{ORDERS_KEY}.item":
+                if event == "start_map":
+                    self._order = {}
+                elif event == "end_map":
+                    self._recent.add(self._order)
+                    self._order = None
+                elif event not in _OPEN and event not in _CLOSE:
+                    self._recent.add(value)
+                continue
+            if prefix == ORDERS_KEY:
+                # Only an array counts, as in ``project``: "orders": null (or an object) is left out
+                if event == "start_array":
+                    self._saw_orders = True
+                continue
+            if self._order is not None and prefix in self._order_prefixes:
+                target = ("order", self._order_prefixes[prefix])
+            elif "." not in prefix and prefix and self.projection.keeps(prefix):
+                target = ("top", prefix)
+            else:
+                continue
+            if event in _OPEN:
+                self._builder = ObjectBuilder()
+                self._builder.event(event, value)
+                self._depth = 1
+                self._target = target
+            else:
+                self._assign(target, value)
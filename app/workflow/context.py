@@ -0,0 +1,207 @@
+# app/workflow/context.py
+"""
+Typed execution context and step result types for the workflow step contract.
+
+Steps are ``async def run(ctx: WorkflowContext) -> StepOutcome``. Steps
+written against the older six-argument signature returning a dict are
+wrapped by ``as_step_handler`` so they keep working unchanged.
+"""
+import inspect
+from collections.abc import MutableMapping
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+
+class StepOutcome(NamedTuple):
+    """Result of a single step. ``final_status`` is set by routing steps; ``retryable`` marks transient failures."""
+    success: bool
+    error: Optional[str] = None
+    reason: Optional[str] = None
+    final_status: Optional[str] = None
+    retryable: bool = False
+
+    @classmethod
+    def from_dict(cls, result: Dict[str, Any]) -> "StepOutcome":
+        """Convert a legacy dict result into a ``StepOutcome``."""
+        if result.get("success") and len(result) == 1:
+            return OK
+        return cls(
+            success=bool(result.get("success")),
+            error=result.get("error"),
+            reason=result.get("reason"),
+            final_status=result.get("final_status"),
+            retryable=bool(result.get("retryable")),
+        )
+
+
+# Shared outcome for the common "step succeeded, nothing to report" case
+OK = StepOutcome(True)
+
+
+class CappedLog(list):
+    """
+    Run log with size caps: entries longer than ``entry_limit`` characters
+    are truncated, and once ``total_limit`` characters are logged further
+    entries are dropped (counted in ``dropped``). A limit of 0 disables it.
+    """
+
+    LIMIT_NOTICE = "[log size limit reached; later entries dropped]"
+
+    def __init__(self, entry_limit: int = 0, total_limit: int = 0):
+        super().__init__()
+        self.entry_limit = entry_limit
+        self.total_limit = total_limit
+        self.chars = 0
+        self.dropped = 0
+
+    def append(self, entry: Any) -> None:
+        entry = entry if isinstance(entry, str) else str(entry)
+        if self.entry_limit and len(entry) > self.entry_limit:
+            entry = f"{entry[:self.entry_limit]}... [{len(entry) - self.entry_limit} chars truncated]"
+        if self.total_limit and self.chars + len(entry) > self.total_limit:
+            if not self.dropped:
+                super().append(self.LIMIT_NOTICE)
+            self.dropped += 1
+            return
+        self.chars += len(entry)
+        super().append(entry)
+
+    def extend(self, entries: Any) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def __iadd__(self, entries: Any) -> "CappedLog":
+        self.extend(entries)
+        return self
+
+
+class WorkflowContext:
+    """
+    Per-run workflow state.
+
+    Replaces the free-form ``globals_`` dict: every field a step may read or
+    write is a declared slot, so typos fail immediately with AttributeError
+    and definitions can declare which fields a step requires and provides.
+    """
+
+    # Fields filled in from the incoming request before the first step runs
+    INPUT_FIELDS = ("workflow_id", "customer_id", "customer_phone_number", "event", "logs")
+    # Fields produced by steps; these are what the run reports as "globals"
+    STATE_FIELDS = (
+        "received_event",
+        "api1_response",
+        "intermediate_value",
+        "api2_response",
+        "final_context",
+        "agent_output",
+        "final_status",
+    )
+    FIELDS = INPUT_FIELDS + STATE_FIELDS
+
+    __slots__ = FIELDS + ("extras",)
+
+    def __init__(self, workflow_id: str, customer_id: str, customer_phone_number: str,
+                 event: Dict[str, Any], logs: Optional[List[str]] = None):
+        self.workflow_id: str = workflow_id
+        self.customer_id: str = customer_id
+        self.customer_phone_number: str = customer_phone_number
+        self.event: Dict[str, Any] = event
+        self.logs: List[str] = logs if logs is not None else []
+
+        self.received_event: Optional[Dict[str, Any]] = None
+        self.api1_response: Optional[Dict[str, Any]] = None
+        self.intermediate_value: Optional[Dict[str, Any]] = None
+        self.api2_response: Optional[Dict[str, Any]] = None
+        self.final_context: Optional[Dict[str, Any]] = None
+        self.agent_output: Optional[Dict[str, Any]] = None
+        self.final_status: Optional[str] = None
+
+        # Keys written by legacy steps that have no declared field
+        self.extras: Dict[str, Any] = {}
+
+    def to_globals(self) -> Dict[str, Any]:
+        """Snapshot of the state as the ``globals`` dict reported to callers."""
+        data = {"customer_id": self.customer_id, "customer_phone_number": self.customer_phone_number}
+        for name in self.STATE_FIELDS:
+            value = getattr(self, name)
+            if value is not None and name != "final_status":
+                data[name] = value
+        if isinstance(self.final_context, dict):
+            data["final_context"] = self._dedupe_final_context(data)
+        data.update(self.extras)
+        return data
+
+    def _dedupe_final_context(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # final_context holds the same objects as api1_response/api2_response; report those
+        # once and point at them from final_context, so the orders payload is serialized once
+        reported = {id(value): name for name, value in data.items()
+                    if name != "final_context" and isinstance(value, (dict, list))}
+        return {key: {"$ref": reported[id(value)]} if id(value) in reported else value
+                for key, value in self.final_context.items()}
+
+
+class GlobalsView(MutableMapping):
+    """
+    Dict-like view over a ``WorkflowContext`` for legacy steps.
+
+    Declared fields map to context attributes (unset fields read as missing),
+    anything else goes to ``ctx.extras``.
+    """
+
+    __slots__ = ("_ctx",)
+
+    def __init__(self, ctx: WorkflowContext):
+        self._ctx = ctx
+
+    def __getitem__(self, key: str) -> Any:
+        if key in WorkflowContext.FIELDS:
+            value = getattr(self._ctx, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        return self._ctx.extras[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in WorkflowContext.FIELDS:
+            setattr(self._ctx, key, value)
+        else:
+            self._ctx.extras[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in WorkflowContext.FIELDS:
+            setattr(self._ctx, key, None)
+        else:
+            del self._ctx.extras[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ctx.to_globals())
+
+    def __len__(self) -> int:
+        return len(self._ctx.to_globals())
+
+
+StepHandler = Callable[[WorkflowContext], Awaitable[StepOutcome]]
+
+LEGACY_STEP_ARGS = 6
+
+
+def as_step_handler(handler: Callable) -> StepHandler:
+    """
+    Return ``handler`` in the ``run(ctx)`` form, wrapping legacy steps.
+
+    Legacy steps take ``(workflow_id, customer_id, customer_phone_number,
+    event, globals_, logs)`` and return a dict.
+    """
+    params = inspect.signature(handler).parameters
+    if len(params) == 1:
+        return handler
+    if len(params) != LEGACY_STEP_ARGS:
+        raise TypeError(f"{handler.__qualname__} must take (ctx) or the legacy six-argument signature")
+
+    async def run_legacy(ctx: WorkflowContext) -> StepOutcome:
+        result = await handler(ctx.workflow_id, ctx.customer_id, ctx.customer_phone_number,
+                               ctx.event, GlobalsView(ctx), ctx.logs)
+        return StepOutcome.from_dict(result)
+
+    run_legacy.__wrapped__ = handler
+    run_legacy.__qualname__ = f"legacy({handler.__qualname__})"
+    return run_legacy
@@ -0,0 +1,319 @@
+# app/workflow/plan.py
+"""
+Declarative workflow definitions and their compiled execution plans.
+
+Definitions live in ``app/workflow/definitions`` as YAML or JSON files. Each
+one is compiled once per process into an immutable ``WorkflowPlan``: handlers
+are imported, dependencies are resolved to indices and steps are put in a
+topological order, so the orchestrator only walks a tuple at run time.
+"""
+import heapq
+import importlib
+import importlib.util
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from app.config import settings
+from app.workflow.context import StepHandler, WorkflowContext, as_step_handler
+
+DEFINITIONS_DIR = Path(__file__).parent / "definitions"
+DEFINITION_SUFFIXES = (".yaml", ".yml", ".json")
+
+
+class WorkflowDefinitionError(ValueError):
+    """Raised when a workflow definition cannot be compiled."""
+
+
+@dataclass(frozen=True)
+class Condition:
+    """Conditional edge: a context field must hold one of ``values``."""
+    key: str
+    values: Tuple[Any, ...]
+
+    def matches(self, ctx: WorkflowContext) -> bool:
+        return getattr(ctx, self.key) in self.values
+
+
+@dataclass(frozen=True)
+class StepSpec:
+    """A single compiled step of a workflow plan."""
+    index: int
+    number: int
+    id: str
+    name: str
+    handler: StepHandler
+    depends_on: Tuple[int, ...]
+    when: Tuple[Condition, ...]
+    timeout: Optional[float]
+    requires: Tuple[str, ...] = ()
+    provides: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class WorkflowPlan:
+    """Immutable, topologically ordered execution plan for one workflow."""
+    name: str
+    version: str
+    steps: Tuple[StepSpec, ...]
+
+    def step(self, step_id: str) -> StepSpec:
+        for spec in self.steps:
+            if spec.id == step_id:
+                return spec
+        raise KeyError(step_id)
+
+
+def _resolve_handler(path: str, step_id: str, modules: Optional[Dict[str, ModuleType]] = None) -> StepHandler:
+    """Import a ``module:attribute`` handler reference in ``run(ctx)`` form, preferring ``modules``."""
+    module_name, _, attr = path.partition(":")
+    if not module_name or not attr:
+        raise WorkflowDefinitionError(f"Step '{step_id}': handler must look like 'module:function', got '{path}'")
+    try:
+        module = (modules or {}).get(module_name) or importlib.import_module(module_name)
+        handler = getattr(module, attr)
+    except (ImportError, AttributeError) as e:
+        raise WorkflowDefinitionError(f"Step '{step_id}': cannot resolve handler '{path}': {e}") from e
+    if not callable(handler):
+        raise WorkflowDefinitionError(f"Step '{step_id}': handler '{path}' is not callable")
+    try:
+        return as_step_handler(handler)
+    except TypeError as e:
+        raise WorkflowDefinitionError(f"Step '{step_id}': {e}") from e
+
+
+def _parse_fields(raw: Any, step_id: str, attr: str) -> Tuple[str, ...]:
+    fields = tuple(raw or ())
+    unknown = [f for f in fields if f not in WorkflowContext.FIELDS]
+    if unknown:
+        raise WorkflowDefinitionError(f"Step '{step_id}': unknown context field(s) in '{attr}': {', '.join(unknown)}")
+    return fields
+
+
+def _parse_conditions(raw: Any, step_id: str) -> Tuple[Condition, ...]:
+    if not raw:
+        return ()
+    if not isinstance(raw, dict):
+        raise WorkflowDefinitionError(f"Step '{step_id}': 'when' must be a mapping of output -> value(s)")
+    conditions = []
+    for key, values in raw.items():
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        if key not in WorkflowContext.FIELDS:
+            raise WorkflowDefinitionError(f"Step '{step_id}': condition on unknown context field '{key}'")
+        conditions.append(Condition(key=str(key), values=tuple(values)))
+    return tuple(conditions)
+
+
+def compile_definition(definition: Dict[str, Any], modules: Optional[Dict[str, ModuleType]] = None) -> WorkflowPlan:
+    """
+    Compile a parsed workflow definition into a ``WorkflowPlan``.
+
+    Handlers are looked up in ``modules`` (by module name) before the import
+    system, which is how freshly loaded step modules are compiled in.
+
+    Raises:
+        WorkflowDefinitionError: on unknown handlers, duplicate or unknown
+            step ids, invalid timeouts, dependency cycles, or a step that
+            requires (or branches on) a context field no upstream step provides.
+    """
+    name = definition.get("name")
+    raw_steps = definition.get("steps")
+    if not name or not raw_steps:
+        raise WorkflowDefinitionError("Workflow definition needs a 'name' and a non-empty 'steps' list")
+
+    default_timeout = definition.get("default_timeout")
+    declared: List[Dict[str, Any]] = []
+    positions: Dict[str, int] = {}
+
+    for position, raw in enumerate(raw_steps):
+        step_id = raw.get("id")
+        if not step_id or "handler" not in raw:
+            raise WorkflowDefinitionError(f"Step #{position + 1} of '{name}' needs an 'id' and a 'handler'")
+        if step_id in positions:
+            raise WorkflowDefinitionError(f"Duplicate step id '{step_id}' in '{name}'")
+        positions[step_id] = position
+
+        if "depends_on" in raw:
+            depends_on = list(raw["depends_on"] or [])
+        else:
+            depends_on = [declared[-1]["id"]] if declared else []
+
+        timeout = raw.get("timeout", default_timeout)
+        if timeout is not None and float(timeout) <= 0:
+            raise WorkflowDefinitionError(f"Step '{step_id}': timeout must be positive")
+
+        declared.append({
+            "id": step_id,
+            "name": raw.get("name", step_id),
+            "handler": _resolve_handler(raw["handler"], step_id, modules),
+            "depends_on": depends_on,
+            "when": _parse_conditions(raw.get("when"), step_id),
+            "timeout": float(timeout) if timeout is not None else None,
+            "requires": _parse_fields(raw.get("requires"), step_id, "requires"),
+            "provides": _parse_fields(raw.get("provides"), step_id, "provides"),
+        })
+
+    for step in declared:
+        for dep in step["depends_on"]:
+            if dep not in positions:
+                raise WorkflowDefinitionError(f"Step '{step['id']}' depends on unknown step '{dep}'")
+
+    # Kahn's algorithm, breaking ties by declaration order so linear
+    # definitions keep the order they were written in.
+    remaining = {step["id"]: len(set(step["depends_on"])) for step in declared}
+    dependants: Dict[str, List[str]] = {step["id"]: [] for step in declared}
+    for step in declared:
+        for dep in set(step["depends_on"]):
+            dependants[dep].append(step["id"])
+
+    ready = [positions[step_id] for step_id, count in remaining.items() if count == 0]
+    heapq.heapify(ready)
+    order: List[Dict[str, Any]] = []
+    while ready:
+        step = declared[heapq.heappop(ready)]
+        order.append(step)
+        for child in dependants[step["id"]]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                heapq.heappush(ready, positions[child])
+
+    if len(order) != len(declared):
+        cyclic = sorted(step_id for step_id, count in remaining.items() if count > 0)
+        raise WorkflowDefinitionError(f"Dependency cycle in '{name}' between steps: {', '.join(cyclic)}")
+
+    # Every field a step reads (or branches on) must be produced upstream
+    available: Dict[str, set] = {}
+    for step in order:
+        upstream = set(WorkflowContext.INPUT_FIELDS)
+        for dep in step["depends_on"]:
+            upstream |= available[dep]
+        needed = set(step["requires"]) | {c.key for c in step["when"]}
+        missing = sorted(needed - upstream)
+        if missing:
+            raise WorkflowDefinitionError(
+                f"Step '{step['id']}' in '{name}' requires {', '.join(missing)} "
+                f"but no upstream step provides it"
+            )
+        available[step["id"]] = upstream | set(step["provides"])
+
+    index_of = {step["id"]: index for index, step in enumerate(order)}
+    specs = tuple(
+        StepSpec(
+            index=index,
+            number=index + 1,
+            id=step["id"],
+            name=step["name"],
+            handler=step["handler"],
+            depends_on=tuple(sorted(index_of[dep] for dep in set(step["depends_on"]))),
+            when=step["when"],
+            timeout=step["timeout"],
+            requires=step["requires"],
+            provides=step["provides"],
+        )
+        for index, step in enumerate(order)
+    )
+    return WorkflowPlan(name=name, version=str(definition.get("version", "1")), steps=specs)
+
+
+def _definition_path(name: str) -> Path:
+    for suffix in DEFINITION_SUFFIXES:
+        path = DEFINITIONS_DIR / f"{name}{suffix}"
+        if path.exists():
+            return path
+    raise WorkflowDefinitionError(f"Unknown workflow '{name}'")
+
+
+def load_definition(name: str) -> Dict[str, Any]:
+    """Read and parse the definition file for workflow ``name``."""
+    path = _definition_path(name)
+    with path.open("r", encoding="utf-8") as fh:
+        definition = json.load(fh) if path.suffix == ".json" else yaml.safe_load(fh)
+    if not isinstance(definition, dict):
+        raise WorkflowDefinitionError(f"Workflow definition '{path.name}' must be a mapping")
+    if definition.get("name", name) != name:
+        raise WorkflowDefinitionError(f"Workflow definition '{path.name}' declares name '{definition['name']}'")
+    return definition
+
+
+def available_workflows() -> List[str]:
+    """Names of all workflow definitions shipped with the app."""
+    return sorted({p.stem for p in DEFINITIONS_DIR.iterdir() if p.suffix in DEFINITION_SUFFIXES})
+
+
+# Compiled plans, one per workflow name, shared by every run in this process.
+_PLANS: Dict[str, WorkflowPlan] = {}
+
+
+def get_plan(name: Optional[str] = None) -> WorkflowPlan:
+    """Return the compiled plan for ``name`` (default workflow if omitted)."""
+    name = name or settings.DEFAULT_WORKFLOW
+    plan = _PLANS.get(name)
+    if plan is None:
+        plan = _PLANS[name] = compile_definition(load_definition(name))
+    return plan
+
+
+def register_plan(plan: WorkflowPlan) -> None:
+    """Install ``plan`` under its name, replacing any previously compiled version."""
+    _PLANS[plan.name] = plan
+
+
+def compile_all() -> Dict[str, WorkflowPlan]:
+    """Compile every shipped workflow definition; used at process start."""
+    return {name: get_plan(name) for name in available_workflows()}
+
+
+def _load_fresh(module_name: str) -> ModuleType:
+    """Execute a new copy of ``module_name`` from source without touching ``sys.modules``."""
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or spec.loader is None:
+        raise WorkflowDefinitionError(f"Cannot find module '{module_name}' to reload")
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except Exception as e:
+        raise WorkflowDefinitionError(f"Reloading '{module_name}' failed: {type(e).__name__}: {e}") from e
+    return module
+
+
+def _handler_modules(definition: Dict[str, Any]) -> set:
+    return {str(step.get("handler", "")).partition(":")[0] for step in definition.get("steps") or ()}
+
+
+def reload_plans(modules: Iterable[str] = (), workflows: Iterable[str] = ()) -> Dict[str, WorkflowPlan]:
+    """
+    Reload step ``modules`` from source and recompile the plans that use them
+    (plus any ``workflows`` whose definition changed), then swap them in.
+
+    All or nothing: the new modules are executed and every affected plan is
+    compiled before anything is installed, so a syntax error or a broken
+    definition leaves the running version in place. Runs that already hold
+    a plan keep its handlers; runs started afterwards get the new plan.
+
+    Raises:
+        WorkflowDefinitionError: if a module fails to load or a plan fails to compile.
+    """
+    global _PLANS
+    fresh = {name: _load_fresh(name) for name in modules}
+    compiled = {}
+    for name in available_workflows():
+        if name not in _PLANS and name not in workflows:
+            continue
+        definition = load_definition(name)
+        if name in workflows or _handler_modules(definition) & fresh.keys():
+            compiled[name] = compile_definition(definition, fresh)
+
+    for name, module in fresh.items():
+        sys.modules[name] = module
+        package, _, attr = name.rpartition(".")
+        if package in sys.modules:
+            setattr(sys.modules[package], attr, module)
+    # Rebind rather than update, so concurrent readers see either the old or the new mapping
+    _PLANS = {**_PLANS, **compiled}
+    return compiled
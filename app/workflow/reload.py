@@ -0,0 +1,78 @@
+# app/workflow/reload.py
+"""
+Hot reload of workflow step modules and definitions inside a running process.
+
+With ``WORKFLOW_HOT_RELOAD`` on, ``STEP_RELOADER.maybe_reload()`` runs before
+each workflow. At most every ``WORKFLOW_RELOAD_INTERVAL`` seconds it stats
+``app/workflow/steps/*.py`` and the definition files. Changed ones go
+through ``plan.reload_plans``, which swaps in the recompiled plans
+atomically. Workflows already running finish on the plan they started
+with.
+
+Every process checks for itself, so each prefork pool child picks up the
+change before its next task and the worker never restarts. A failed reload
+is logged and counted. The old plan keeps serving until the file is fixed.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.config import settings
+from app.observability.metrics import WORKFLOW_PLAN_RELOADS
+from app.workflow.plan import DEFINITION_SUFFIXES, DEFINITIONS_DIR, reload_plans
+
+logger = logging.getLogger(__name__)
+
+STEPS_DIR = Path(__file__).parent / "steps"
+STEPS_PACKAGE = "app.workflow.steps"
+
+
+class StepReloader:
+    """Tracks source mtimes and reloads what changed since the last check."""
+
+    def __init__(self, enabled: bool, interval: float):
+        self.enabled = enabled
+        self.interval = interval
+        self._mtimes = self._scan() if enabled else {}
+        self._last_check = time.monotonic()
+
+    @classmethod
+    def from_settings(cls) -> "StepReloader":
+        return cls(settings.WORKFLOW_HOT_RELOAD, settings.WORKFLOW_RELOAD_INTERVAL)
+
+    @staticmethod
+    def _scan() -> Dict[Path, float]:
+        files = [p for p in STEPS_DIR.glob("*.py") if p.name != "__init__.py"]
+        files += [p for p in DEFINITIONS_DIR.iterdir() if p.suffix in DEFINITION_SUFFIXES]
+        return {p: p.stat().st_mtime for p in files}
+
+    def check(self) -> List[str]:
+        """Reload changed step modules and definitions now; returns the recompiled workflow names."""
+        current = self._scan()
+        changed = [p for p, mtime in current.items() if self._mtimes.get(p) != mtime]
+        # Recorded even if the reload fails, so a broken file is retried on its next edit, not every check
+        self._mtimes = current
+        if not changed:
+            return []
+        modules = [f"{STEPS_PACKAGE}.{p.stem}" for p in changed if p.parent == STEPS_DIR]
+        workflows = [p.stem for p in changed if p.parent == DEFINITIONS_DIR]
+        try:
+            plans = reload_plans(modules, workflows)
+        except Exception as e:
+            WORKFLOW_PLAN_RELOADS.labels("failed").inc()
+            logger.error(f"Hot reload failed, keeping the running version: {e}")
+            return []
+        WORKFLOW_PLAN_RELOADS.labels("ok").inc()
+        logger.info(f"Hot reloaded {', '.join(modules + workflows)}; swapped plans: {', '.join(plans) or 'none'}")
+        return list(plans)
+
+    def maybe_reload(self) -> None:
+        """Cheap per-workflow hook: checks at most once per interval."""
+        if not self.enabled or time.monotonic() - self._last_check < self.interval:
+            return
+        self._last_check = time.monotonic()
+        self.check()
+
+
+STEP_RELOADER = StepReloader.from_settings()
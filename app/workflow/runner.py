@@ -0,0 +1,73 @@
+# app/workflow/runner.py
+"""
+Execution of a queued workflow, shared by every queue backend.
+
+Whichever backend delivered the job (Celery or the in-process queue), the
+run gets the same surfaces: queue-wait metric and span, a task span joined
+to the ingest trace, sampled profiling and a completion record in the
+result store. A job whose deadline passed while it was queued is not run;
+it only gets an ``expired`` completion record. With ``CALLBACK_URL`` set,
+the outcome is also queued for callback delivery (app/delivery.py).
+"""
+import time
+from functools import partial
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.delivery import enqueue_callback
+from app.observability.metrics import WORKFLOW_DEADLINE_EXPIRED, WORKFLOW_QUEUE_WAIT
+from app.observability.profiling import should_profile
+from app.observability.tracing import TRACER, SpanContext
+from app.services.priority import DEFAULT_PRIORITY
+from app.services.retry import TransientWorkflowFailure
+from app.services.results import get_result_store, summarize_result
+from app.utils.deadline import deadline_scope
+from app.workflow.workflow_manager import run_workflow_instance
+
+
+async def _record(result: Dict[str, Any], customer_id: str, enqueued_at: Optional[float], started_at: float,
+                  priority: str) -> None:
+    summary = {**summarize_result(result, enqueued_at, started_at), "priority": priority}
+    await get_result_store().save(summary)
+    if settings.CALLBACK_URL:
+        await enqueue_callback(result, summary, customer_id)
+
+
+async def execute_and_record(workflow_id: str, customer_id: str, customer_phone_number: str,
+                             event: Dict[str, Any], workflow: Optional[str] = None,
+                             enqueued_at: Optional[float] = None, traceparent: Optional[str] = None,
+                             source: str = "celery", priority: Optional[str] = None,
+                             deadline: Optional[float] = None, raise_transient: bool = False) -> Dict[str, Any]:
+    """
+    Run the workflow and store its completion record. ``source`` names the
+    queue in span names; ``priority`` is the ingest-time class (app/services/priority.py);
+    ``deadline`` (epoch seconds) bounds the run (app/utils/deadline.py). With
+    ``raise_transient`` (Celery tasks, which can retry), a run that failed on a
+    transient error raises ``TransientWorkflowFailure`` instead of being recorded.
+    """
+    started_at = time.time()
+    parent = SpanContext.from_traceparent(traceparent)
+    priority = priority or DEFAULT_PRIORITY
+    if enqueued_at:
+        WORKFLOW_QUEUE_WAIT.labels(priority).observe(max(0.0, started_at - enqueued_at))
+        TRACER.record_span(f"{source}.queue_wait", int(enqueued_at * 1e9), int(started_at * 1e9), parent=parent,
+                           kind="consumer", attributes={"workflow.id": workflow_id, "workflow.priority": priority})
+    if deadline is not None and started_at >= deadline:
+        # Stale: the reply would be worthless, so skip every step and just close the record
+        WORKFLOW_DEADLINE_EXPIRED.labels(workflow or settings.DEFAULT_WORKFLOW, "queued").inc()
+        result = {"workflow_id": workflow_id, "workflow": workflow, "status": "expired",
+                  "reason": "deadline_exceeded"}
+        await _record(result, customer_id, enqueued_at, started_at, priority)
+        return result
+    with TRACER.span(f"{source}.run_workflow_task", parent=parent, kind="consumer",
+                     attributes={"workflow.id": workflow_id}), deadline_scope(deadline):
+        result = await run_workflow_instance(
+            workflow_id, customer_id, customer_phone_number, event, enable_visualization=True, workflow=workflow,
+            profile=should_profile()
+        )
+        if raise_transient and result.get("status") == "failed" and result.get("retryable"):
+            # No completion record or callback yet: the retry (or its final failure) writes it
+            raise TransientWorkflowFailure(result, partial(_record, result, customer_id, enqueued_at, started_at,
+                                                           priority))
+        await _record(result, customer_id, enqueued_at, started_at, priority)
+    return result
@@ -1,12 +1,10 @@
 # app/workflow/steps/step_1.py
-from typing import Dict, Any, List
+from app.workflow.context import WorkflowContext, StepOutcome, OK
 
-async def execute(workflow_id: str, customer_id: str, customer_phone_number: str, event: Dict[str, Any], 
-                  globals_: Dict[str, Any], logs: List[str]) -> Dict[str, Any]:
+async def run(ctx: WorkflowContext) -> StepOutcome:
     """
     Step 1: Webhook Trigger
     Log that the webhook has been triggered.
     """
-    logs.append("Step 1: webhook triggered")
-    return {"success": True}
-
+    ctx.logs.append("Step 1: webhook triggered")
+    return OK
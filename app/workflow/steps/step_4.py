@@ -1,16 +1,24 @@
 # app/workflow/steps/step_4.py
-from typing import Dict, Any, List
+from app.services.apis import NOT_REGISTERED
+from app.workflow.context import WorkflowContext, StepOutcome, OK
 
-async def execute(workflow_id: str, customer_id: str, customer_phone_number: str,event: Dict[str, Any], 
-                  globals_: Dict[str, Any], logs: List[str]) -> Dict[str, Any]:
+async def run(ctx: WorkflowContext) -> StepOutcome:
     """
     Step 4: Set Globals After API1
     Transform and store intermediate values from API1 response.
     """
-    api1_response = globals_.get("api1_response")
-    globals_["intermediate_value"] = {
-        "from_api1": api1_response.get("value") if api1_response else None
+    # Unregistered customers legitimately have no value; any other response without one is a
+    # contract break by API1: fail visibly instead of carrying None along
+    if ctx.api1_response == NOT_REGISTERED:
+        ctx.intermediate_value = {"from_api1": None}
+        ctx.logs.append("Step 4: set globals after API1 (customer not registered)")
+        return OK
+    if not isinstance(ctx.api1_response, dict) or "value" not in ctx.api1_response:
+        error = "CHECK_CUSTOMER_REGISTRATION_API response has no 'value'"
+        ctx.logs.append(f"Step 4 failed: {error}")
+        return StepOutcome(False, error=error, reason="CHECK_CUSTOMER_REGISTRATION_API_INVALID_RESPONSE")
+    ctx.intermediate_value = {
+        "from_api1": ctx.api1_response["value"]
     }
-    logs.append("Step 4: set globals after API1")
-    return {"success": True}
-
+    ctx.logs.append("Step 4: set globals after API1")
+    return OK
@@ -1,16 +1,14 @@
 # app/workflow/steps/step_6.py
-from typing import Dict, Any, List
+from app.workflow.context import WorkflowContext, StepOutcome, OK
 
-async def execute(workflow_id: str, customer_id: str, customer_phone_number: str, event: Dict[str, Any], 
-                  globals_: Dict[str, Any], logs: List[str]) -> Dict[str, Any]:
+async def run(ctx: WorkflowContext) -> StepOutcome:
     """
     Step 6: Set Final Context
     Combine API responses into final context.
     """
-    globals_["final_context"] = {
-        "api1": globals_.get("api1_response"),
-        "api2": globals_.get("api2_response")
+    ctx.final_context = {
+        "api1": ctx.api1_response,
+        "api2": ctx.api2_response
     }
-    logs.append("Step 6: set final context")
-    return {"success": True}
-
+    ctx.logs.append("Step 6: set final context")
+    return OK
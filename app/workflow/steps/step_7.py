@@ -1,32 +1,26 @@
 # app/workflow/steps/step_7.py
-from typing import Dict, Any, List
 from app.services.agent import hardcoded_agentic_response
 from app.models import StepResult
 from app.utils.beautifier import WorkflowBeautifier
+from app.workflow.context import WorkflowContext, StepOutcome, OK
 
-async def execute(workflow_id: str, customer_id: str, customer_phone_number: str, event: Dict[str, Any], 
-                  globals_: Dict[str, Any], logs: List[str]) -> Dict[str, Any]:
+async def run(ctx: WorkflowContext) -> StepOutcome:
     """
     Step 7: Run Agent
     Execute the hardcoded agentic response logic.
     """
-    customer_msg = event.get("message", "")
-    agent_result: StepResult = hardcoded_agentic_response(customer_msg, globals_)
+    customer_msg = ctx.event.get("message", "")
+    agent_result: StepResult = hardcoded_agentic_response(customer_msg, ctx)
     
     if not agent_result.success:
-        logs.append(f"Step 7 failed: {agent_result.error}")
-        return {
-            "success": False,
-            "error": agent_result.error,
-            "reason": "agent"
-        }
+        ctx.logs.append(f"Step 7 failed: {agent_result.error}")
+        return StepOutcome(False, error=agent_result.error, reason="agent")
     
-    globals_["agent_output"] = agent_result.data
+    ctx.agent_output = agent_result.data
     
     # Enhanced logging with beautified agent output
-    beautifier = WorkflowBeautifier(workflow_id)
+    beautifier = WorkflowBeautifier(ctx.workflow_id)
     agent_output_formatted = beautifier.format_agent_output(agent_result.data)
-    logs.append(f"Step 7: agent executed (hardcoded)\n{agent_output_formatted}")
+    ctx.logs.append(f"Step 7: agent executed (hardcoded)\n{agent_output_formatted}")
     
-    return {"success": True}
-
+    return OK
@@ -1,12 +1,10 @@
 # app/workflow/steps/step_9.py
-from typing import Dict, Any, List
+from app.workflow.context import WorkflowContext, StepOutcome, OK
 
-async def execute(workflow_id: str, customer_id: str, customer_phone_number: str, event: Dict[str, Any], 
-                  globals_: Dict[str, Any], logs: List[str]) -> Dict[str, Any]:
+async def run(ctx: WorkflowContext) -> StepOutcome:
     """
     Step 9: Terminate
     Final step - log termination.
     """
-    logs.append("Step 9: terminate")
-    return {"success": True}
-
+    ctx.logs.append("Step 9: terminate")
+    return OK
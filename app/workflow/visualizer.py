@@ -4,7 +4,7 @@ Workflow visualization module for generating execution trees.
 """
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-import json
+from app.utils.jsoncodec import dumps_pretty
 
 class WorkflowVisualizer:
     """Generates visual representations of workflow execution."""
@@ -123,7 +123,7 @@ class WorkflowVisualizer:
             "successful_steps": sum(1 for s in self.steps if s["status"] == "completed"),
             "failed_steps": sum(1 for s in self.steps if s["status"] == "failed")
         }
-        return json.dumps(data, indent=2)
+        return dumps_pretty(data)
     
     def get_simple_tree(self) -> str:
         """Generate simple indented tree view."""
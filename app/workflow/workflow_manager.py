@@ -1,109 +1,192 @@
 # app/workflow/workflow_manager.py
+import asyncio
 import logging
 import time
-from typing import Dict, Any, Optional
-from app.workflow.steps import step_1, step_2, step_3, step_4, step_5, step_6, step_7, step_8, step_9
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional
+from app.config import settings
+from app.workflow.context import CappedLog, WorkflowContext
+from app.workflow.plan import WorkflowPlan, get_plan
+from app.workflow.reload import STEP_RELOADER
 from app.workflow.visualizer import WorkflowVisualizer
 from app.utils.beautifier import WorkflowBeautifier, StepStatus
+from app.observability.metrics import (
+    WORKFLOW_DEADLINE_EXPIRED, WORKFLOW_DURATION, WORKFLOW_FINAL_STATUS, WORKFLOW_LIMITER_WAIT, WORKFLOW_RUNS,
+    WORKFLOW_STEP_DURATION,
+)
+from app.observability.analytics import ANALYTICS
+from app.observability.profiling import WorkflowProfile
+from app.services.limiter import WORKFLOW_LIMITER
+from app.services.retry import is_retryable
+from app.observability.tracing import TRACER
+from app.utils.deadline import DeadlineExceeded, expired, time_budget
 
 logger = logging.getLogger(__name__)
 
+
+def _attach_outputs(response: Dict[str, Any], visualizer: Optional[WorkflowVisualizer],
+                    beautifier: Optional[WorkflowBeautifier], logs: List[str]) -> Dict[str, Any]:
+    """Add visualization and beautified output to a workflow response."""
+    if visualizer:
+        response["visualization"] = {
+            "text_tree": visualizer.get_text_tree(),
+            "mermaid": visualizer.get_mermaid_diagram(),
+            "json": visualizer.get_json_tree(),
+            "simple_tree": visualizer.get_simple_tree()
+        }
+
+    if beautifier:
+        response["beautified_output"] = {
+            "tree": beautifier.get_beautified_tree(),
+            "logs": beautifier.get_enhanced_logs(logs)
+        }
+
+    return response
+
+
+def _record_run(workflow: str, status: str, reason: str, final_status: Optional[str], run_start: float) -> None:
+    """Record run-level metrics and analytics for a finished workflow."""
+    elapsed = time.perf_counter() - run_start
+    WORKFLOW_DURATION.labels(workflow, status).observe(elapsed)
+    ANALYTICS.record_run(workflow, status, elapsed, final_status)
+    WORKFLOW_RUNS.labels(workflow, status, reason).inc()
+    if final_status is not None:
+        WORKFLOW_FINAL_STATUS.labels(workflow, final_status).inc()
+
+
 async def run_workflow_instance(
-    workflow_id: str, 
-    customer_id: str, 
-    customer_phone_number: str, 
+    workflow_id: str,
+    customer_id: str,
+    customer_phone_number: str,
     event: Dict[str, Any],
-    enable_visualization: bool = True
+    enable_visualization: bool = True,
+    workflow: Optional[str] = None,
+    profile: bool = False
 ) -> Dict[str, Any]:
     """
-    Main workflow orchestrator that executes all steps in sequence.
-    
+    Main workflow orchestrator that executes the steps of a compiled plan.
+
     Args:
         workflow_id: Unique identifier for this workflow instance
         customer_id: Customer ID for the workflow
         customer_phone_number: Customer phone number for the workflow
         event: Event data to process
         enable_visualization: Whether to generate execution tree visualizations
+        workflow: Name of the workflow definition to run (defaults to settings.DEFAULT_WORKFLOW)
+        profile: Stack-sample this run and save a folded profile keyed by workflow_id
     """
-    logs = []
-    globals_: Dict[str, Any] = {}
-    final_status = None
-    
+    # Between workflows is the only safe point to swap in edited steps (WORKFLOW_HOT_RELOAD)
+    STEP_RELOADER.maybe_reload()
+    plan: WorkflowPlan = get_plan(workflow)
+    # Wait for a slot under the adaptive in-flight limit (app/services/limiter.py)
+    wait_start = time.perf_counter()
+    async with WORKFLOW_LIMITER:
+        WORKFLOW_LIMITER_WAIT.observe(time.perf_counter() - wait_start)
+        profiler = WorkflowProfile(workflow_id, plan.name) if profile else nullcontext()
+        with profiler, TRACER.span("workflow.run", attributes={"workflow.id": workflow_id,
+                                                               "workflow.name": plan.name}) as span:
+            response = await _execute_plan(plan, workflow_id, customer_id, customer_phone_number, event,
+                                           enable_visualization)
+            span.set_attribute("workflow.status", response["status"])
+            if response.get("final_status"):
+                span.set_attribute("workflow.final_status", response["final_status"])
+            elif response["status"] != "completed":
+                span.record_error(response.get("reason"))
+    if profile:
+        response["profile"] = profiler.summary()
+    return response
+
+
+async def _execute_plan(
+    plan: WorkflowPlan,
+    workflow_id: str,
+    customer_id: str,
+    customer_phone_number: str,
+    event: Dict[str, Any],
+    enable_visualization: bool
+) -> Dict[str, Any]:
+    """Walk the plan's steps for one workflow instance."""
+    run_start = time.perf_counter()
+    ctx = WorkflowContext(workflow_id, customer_id, customer_phone_number, event,
+                          logs=CappedLog(settings.LOG_ENTRY_MAX_CHARS, settings.WORKFLOW_LOG_MAX_CHARS))
+    logs = ctx.logs
+
+    # Per-step flag: True once executed, False when skipped by a condition
+    executed: List[bool] = [False] * len(plan.steps)
+
     # Initialize visualizer and beautifier
     visualizer = WorkflowVisualizer(workflow_id) if enable_visualization else None
     beautifier = WorkflowBeautifier(workflow_id) if enable_visualization else None
-    
-    # Define all steps in order
-    steps = [
-        ("Webhook Triggered", step_1.execute),
-        ("Initialize Globals", step_2.execute),
-        ("Call CHECK_CUSTOMER_REGISTRATION_API", step_3.execute),
-        ("Set Globals After API1", step_4.execute),
-        ("Call FETCH_CUSTOMER_ORDERS_API", step_5.execute),
-        ("Set Final Context", step_6.execute),
-        ("Run Agent", step_7.execute),
-        ("Conditional Routing", step_8.execute),
-        ("Terminate", step_9.execute),
-    ]
-    
-    # Execute steps sequentially
-    for step_num, (step_name, step_func) in enumerate(steps, start=1):
+
+    # Execute steps in plan order, skipping branches that were not taken
+    for spec in plan.steps:
+        if not all(executed[dep] for dep in spec.depends_on) or \
+                not all(condition.matches(ctx) for condition in spec.when):
+            continue
+
+        step_name = spec.name
+        step_num = spec.number
         step_start_time = time.time()
-        
+
         try:
-            result = await step_func(workflow_id, customer_id, customer_phone_number, event, globals_, logs)
+            with TRACER.span(f"step {spec.id}", attributes={"step.number": step_num, "step.name": step_name}) as step_span:
+                # The step's own timeout, cut down to what is left of the workflow deadline
+                timeout = time_budget(spec.timeout)
+                if timeout is not None:
+                    outcome = await asyncio.wait_for(spec.handler(ctx), timeout)
+                else:
+                    outcome = await spec.handler(ctx)
+                if not outcome.success:
+                    step_span.record_error(outcome.error or outcome.reason)
+                elif outcome.final_status is not None:
+                    step_span.set_attribute("workflow.branch", outcome.final_status)
             step_duration = (time.time() - step_start_time) * 1000  # Convert to ms
-            
+
             # Check if step failed
-            if not result.get("success"):
+            if not outcome.success:
+                WORKFLOW_STEP_DURATION.labels(plan.name, spec.id, "failed").observe(step_duration / 1000)
+                ANALYTICS.record_step(plan.name, spec.id, step_duration / 1000, outcome.reason or "unknown")
+                _record_run(plan.name, "failed", outcome.reason or "unknown", None, run_start)
                 if visualizer:
                     visualizer.add_step(
                         step_name=step_name,
                         step_number=step_num,
                         status="failed",
-                        details={"error": result.get("error", "Unknown error")},
+                        details={"error": outcome.error or "Unknown error"},
                         duration_ms=step_duration
                     )
                     visualizer.mark_complete()
-                
+
                 if beautifier:
                     beautifier.add_step(
                         step_number=step_num,
                         step_name=step_name,
                         status=StepStatus.FAILED,
                         duration_ms=step_duration,
-                        details={"error": result.get("error", "Unknown error")}
+                        details={"error": outcome.error or "Unknown error"}
                     )
-                
+
                 response = {
                     "workflow_id": workflow_id,
+                    "workflow": plan.name,
                     "status": "failed",
-                    "reason": result.get("reason", "unknown"),
+                    "reason": outcome.reason or "unknown",
+                    "error": outcome.error,
+                    "retryable": outcome.retryable,
                     "logs": logs
                 }
-                
-                if visualizer:
-                    response["visualization"] = {
-                        "text_tree": visualizer.get_text_tree(),
-                        "mermaid": visualizer.get_mermaid_diagram(),
-                        "json": visualizer.get_json_tree(),
-                        "simple_tree": visualizer.get_simple_tree()
-                    }
-                
-                if beautifier:
-                    response["beautified_output"] = {
-                        "tree": beautifier.get_beautified_tree(),
-                        "logs": beautifier.get_enhanced_logs(logs)
-                    }
-                
-                return response
-            
+                return _attach_outputs(response, visualizer, beautifier, logs)
+
+            executed[spec.index] = True
+            WORKFLOW_STEP_DURATION.labels(plan.name, spec.id, "completed").observe(step_duration / 1000)
+            ANALYTICS.record_step(plan.name, spec.id, step_duration / 1000)
+
             # Track successful step
             step_details = {}
-            if "final_status" in result:
-                final_status = result["final_status"]
-                step_details["branch"] = final_status
-            
+            if outcome.final_status is not None:
+                ctx.final_status = outcome.final_status
+                step_details["branch"] = outcome.final_status
+
             if visualizer:
                 visualizer.add_step(
                     step_name=step_name,
@@ -112,7 +195,7 @@ async def run_workflow_instance(
                     details=step_details,
                     duration_ms=step_duration
                 )
-            
+
             if beautifier:
                 beautifier.add_step(
                     step_number=step_num,
@@ -121,83 +204,69 @@ async def run_workflow_instance(
                     duration_ms=step_duration,
                     details=step_details
                 )
-                
+
         except Exception as e:
             step_duration = (time.time() - step_start_time) * 1000
-            logger.error(f"Error in {step_name}: {str(e)}")
-            logs.append(f"{step_name} error: {str(e)}")
-            
+            if isinstance(e, DeadlineExceeded) or (isinstance(e, asyncio.TimeoutError) and expired()):
+                reason = "deadline_exceeded"
+                error = "workflow deadline exceeded"
+                WORKFLOW_DEADLINE_EXPIRED.labels(plan.name, spec.id).inc()
+            elif isinstance(e, asyncio.TimeoutError):
+                reason = "timeout"
+                error = f"timed out after {spec.timeout:g}s"
+            else:
+                reason = "exception"
+                error = str(e)
+            logger.error(f"Error in {step_name}: {error}")
+            WORKFLOW_STEP_DURATION.labels(plan.name, spec.id, reason).observe(step_duration / 1000)
+            ANALYTICS.record_step(plan.name, spec.id, step_duration / 1000, reason)
+            _record_run(plan.name, "failed", reason, None, run_start)
+            logs.append(f"{step_name} error: {error}")
+
             if visualizer:
                 visualizer.add_step(
                     step_name=step_name,
                     step_number=step_num,
                     status="failed",
-                    details={"exception": str(e)},
+                    details={reason: error},
                     duration_ms=step_duration
                 )
                 visualizer.mark_complete()
-            
+
             if beautifier:
                 beautifier.add_step(
                     step_number=step_num,
                     step_name=step_name,
                     status=StepStatus.FAILED,
                     duration_ms=step_duration,
-                    details={"exception": str(e)}
+                    details={reason: error}
                 )
-            
+
             response = {
                 "workflow_id": workflow_id,
+                "workflow": plan.name,
                 "status": "failed",
-                "reason": "exception",
-                "error": str(e),
+                "reason": reason,
+                "error": error,
+                # A step timeout or connection error may pass on a retry; the deadline will not
+                "retryable": reason != "deadline_exceeded" and is_retryable(e),
                 "logs": logs
             }
-            
-            if visualizer:
-                response["visualization"] = {
-                    "text_tree": visualizer.get_text_tree(),
-                    "mermaid": visualizer.get_mermaid_diagram(),
-                    "json": visualizer.get_json_tree(),
-                    "simple_tree": visualizer.get_simple_tree()
-                }
-            
-            if beautifier:
-                response["beautified_output"] = {
-                    "tree": beautifier.get_beautified_tree(),
-                    "logs": beautifier.get_enhanced_logs(logs)
-                }
-            
-            return response
-    
+            return _attach_outputs(response, visualizer, beautifier, logs)
+
+    _record_run(plan.name, "completed", "", ctx.final_status, run_start)
+
     # Mark workflow complete
     if visualizer:
         visualizer.mark_complete()
-    
+
     # Return successful completion
     response = {
         "workflow_id": workflow_id,
+        "workflow": plan.name,
         "status": "completed",
-        "final_status": final_status,
-        "globals": globals_,
+        "final_status": ctx.final_status,
+        "globals": ctx.to_globals(),
         "logs": logs
     }
-    
-    # Add visualization data
-    if visualizer:
-        response["visualization"] = {
-            "text_tree": visualizer.get_text_tree(),
-            "mermaid": visualizer.get_mermaid_diagram(),
-            "json": visualizer.get_json_tree(),
-            "simple_tree": visualizer.get_simple_tree()
-        }
-    
-    # Add beautified output
-    if beautifier:
-        response["beautified_output"] = {
-            "tree": beautifier.get_beautified_tree(),
-            "logs": beautifier.get_enhanced_logs(logs)
-        }
-    
-    return response
-
+    return _attach_outputs(response, visualizer, beautifier, logs)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+/webhook latency while the broker slows down: inline vs threaded publishing.
+
+Drives the FastAPI app in-process (httpx ASGI transport) at a fixed open-loop
+rate and measures /webhook latency from each request's intended send time.
+The Celery publish is either:
+
+  inline    apply_async() on the event loop (the old behaviour)
+  thread    the publisher threads of app/services/publisher.py (current)
+
+By default the broker is simulated: apply_async sleeps for the configured
+latency on a blocking call, as a socket write to a slow Redis would. With
+--redis-url, tasks go to a real Redis through a local TCP proxy that delays
+each client->server chunk by the configured latency.
+
+Usage:
+    python -m benchmarks.enqueue_bench --latencies 0,2,10,25 --rate 200 --duration 5
+    python -m benchmarks.enqueue_bench --redis-url redis://localhost:6379/0 --latencies 0,10
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+os.environ.setdefault("CHECK_CUSTOMER_REGISTRATION_API_URL", "http://mock-api-1/endpoint")
+os.environ.setdefault("FETCH_CUSTOMER_ORDERS_API_URL", "http://mock-api-2/endpoint")
+os.environ.setdefault("EXECUTION_MODE", "celery")
+
+import httpx
+
+from app import main as web
+from app.services.publisher import TaskPublisher
+from app.tasks import celery, run_workflow_task
+from benchmarks.histogram import LatencyHistogram
+
+PAYLOAD = {"customer_id": "customer-1", "customer_phone_number": "+923001234567",
+           "event": {"message": "where is my order?"}}
+
+
+class InlinePublisher:
+    """The pre-publisher behaviour: apply_async straight on the event loop."""
+
+    def submit(self, task: Any, **options: Any) -> Future:
+        task.apply_async(**options)
+        future: Future = Future()
+        future.set_result(None)
+        return future
+
+    def stop(self, timeout: float = 10.0) -> None:
+        pass
+
+
+class SimulatedBroker:
+    """Stands in for apply_async: a blocking call that takes ``latency`` seconds."""
+
+    def __init__(self):
+        self.latency = 0.0
+        self.published = 0
+        self._lock = threading.Lock()
+
+    def apply_async(self, *args: Any, **kwargs: Any) -> None:
+        time.sleep(self.latency)
+        with self._lock:
+            self.published += 1
+
+
+class DelayProxy:
+    """TCP proxy adding a fixed delay to every client->server chunk (runs on its own loop)."""
+
+    def __init__(self, upstream_host: str, upstream_port: int):
+        self.upstream = (upstream_host, upstream_port)
+        self.latency = 0.0
+        self.port: Optional[int] = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+        self._ready.wait()
+
+    def _serve(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delayed: bool) -> None:
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if delayed and self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        server_reader, server_writer = await asyncio.open_connection(*self.upstream)
+        await asyncio.gather(self._pipe(client_reader, server_writer, True),
+                             self._pipe(server_reader, client_writer, False), return_exceptions=True)
+
+
+async def drive(rate: float, duration: float, timeout: float) -> Dict[str, Any]:
+    """Open-loop /webhook load against the in-process app."""
+    hist = LatencyHistogram("webhook")
+    counts = {"accepted": 0, "rejected": 0, "errors": 0}
+    transport = httpx.ASGITransport(app=web.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+
+        async def send(offset: float) -> None:
+            try:
+                resp = await client.post("/webhook", json=PAYLOAD, timeout=timeout)
+            except httpx.HTTPError:
+                counts["errors"] += 1
+                return
+            hist.record_ms((time.perf_counter() - start - offset) * 1000)
+            key = "accepted" if resp.status_code < 400 else "rejected" if resp.status_code == 503 else "errors"
+            counts[key] += 1
+
+        tasks = []
+        for i in range(int(rate * duration)):
+            offset = i / rate
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(offset)))
+        await asyncio.gather(*tasks)
+    return {"p50_ms": hist.value_at_percentile(50), "p99_ms": hist.value_at_percentile(99),
+            "max_ms": hist.value_at_percentile(100), **counts}
+
+
+def run_case(mode: str, latency_ms: float, args: argparse.Namespace, broker: Any) -> Dict[str, Any]:
+    broker.latency = latency_ms / 1000
+    publisher = InlinePublisher() if mode == "inline" else TaskPublisher(args.threads, args.queue_size)
+    web.PUBLISHER = publisher
+    try:
+        result = asyncio.run(drive(args.rate, args.duration, args.timeout))
+    finally:
+        publisher.stop()
+    return {"mode": mode, "broker_latency_ms": latency_ms, **result}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencies", default="0,2,10,25", help="comma-separated broker latencies (ms)")
+    parser.add_argument("--modes", default="inline,thread")
+    parser.add_argument("--rate", type=float, default=200.0, help="/webhook requests per second")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per case")
+    parser.add_argument("--threads", type=int, default=4, help="publisher threads (thread mode)")
+    parser.add_argument("--queue-size", type=int, default=10000, help="publisher handoff queue size")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--redis-url", help="publish to this Redis through a latency proxy instead of simulating")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.redis_url:
+        url = urlsplit(args.redis_url)
+        broker = DelayProxy(url.hostname or "localhost", url.port or 6379)
+        celery.conf.broker_url = urlunsplit(url._replace(netloc=f"127.0.0.1:{broker.port}"))
+    else:
+        broker = SimulatedBroker()
+        run_workflow_task.apply_async = broker.apply_async
+
+    results = [run_case(mode, float(latency), args, broker)
+               for latency in args.latencies.split(",") for mode in args.modes.split(",")]
+
+    print(f"rate={args.rate:g}/s duration={args.duration:g}s broker={'redis via proxy' if args.redis_url else 'simulated'}")
+    print(f"{'mode':<8}{'broker ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'accepted':>10}{'rejected':>10}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['broker_latency_ms']:>10g}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms']:>10.2f}"
+              f"{r['accepted']:>10}{r['rejected']:>10}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Log-linear latency histogram in the style of HdrHistogram.
+
+Values are recorded as integer microseconds into buckets whose width grows
+with magnitude, keeping roughly two significant digits (< 1% relative error)
+across the whole range with a small, sparse, mergeable set of counters.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+DEFAULT_PERCENTILES = (50.0, 75.0, 90.0, 95.0, 99.0, 99.9, 99.99, 100.0)
+
+
+def _bucket_index(value: int) -> int:
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + ((value >> shift) - SUB_BUCKET_HALF)
+
+
+def _bucket_bounds(index: int) -> Tuple[int, int]:
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    shift, sub = divmod(index - SUB_BUCKET_COUNT, SUB_BUCKET_HALF)
+    shift += 1
+    sub += SUB_BUCKET_HALF
+    return sub << shift, ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Sparse log-linear histogram of latencies recorded in milliseconds."""
+
+    def __init__(self, name: str = "latency"):
+        self.name = name
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def record_ms(self, value_ms: float) -> None:
+        value = max(0, int(round(value_ms * 1000)))
+        index = _bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.max_us = max(self.max_us, value)
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.max_us = max(self.max_us, other.max_us)
+        if other.min_us is not None:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+
+    def value_at_percentile(self, percentile: float) -> float:
+        """Latency (ms) at ``percentile``; the bucket's upper bound, like HdrHistogram."""
+        if not self.total:
+            return 0.0
+        if percentile >= 100.0:
+            return self.max_us / 1000.0
+        target = max(1, int(math.ceil(percentile / 100.0 * self.total)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(_bucket_bounds(index)[1], self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def mean_ms(self) -> float:
+        if not self.total:
+            return 0.0
+        weighted = sum(((low + high) / 2.0) * count for index, count in self.counts.items()
+                       for low, high in (_bucket_bounds(index),))
+        return weighted / self.total / 1000.0
+
+    def summary(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        data = {"count": self.total, "mean_ms": self.mean_ms(),
+                "min_ms": (self.min_us or 0) / 1000.0, "max_ms": self.max_us / 1000.0}
+        for pct in percentiles:
+            data[f"p{pct:g}_ms"] = self.value_at_percentile(pct)
+        return data
+
+    def percentile_distribution(self, ticks_per_half: int = 5) -> List[Tuple[float, float, int]]:
+        """(value_ms, percentile, cumulative_count) rows, denser towards the tail."""
+        if not self.total:
+            return []
+        percentiles = []
+        remaining = 100.0
+        # Each "half" covers the lower half of what is left to 100%, split into
+        # ticks_per_half steps, until a step would cover less than one sample
+        while remaining * self.total / 100.0 >= 1.0:
+            base = 100.0 - remaining
+            percentiles.extend(base + remaining / 2.0 * tick / ticks_per_half for tick in range(ticks_per_half))
+            remaining /= 2.0
+        percentiles.append(100.0)
+
+        ordered = sorted(self.counts.items())
+        rows = []
+        for percentile in percentiles:
+            value = self.value_at_percentile(percentile)
+            count = sum(c for i, c in ordered if _bucket_bounds(i)[0] <= value * 1000)
+            rows.append((value, percentile, count))
+        return rows
+
+    def to_hgrm(self) -> str:
+        """Percentile distribution in HdrHistogram's .hgrm text layout."""
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+        for value, percentile, count in self.percentile_distribution():
+            fraction = percentile / 100.0
+            inverse = f"{1.0 / (1.0 - fraction):14.2f}" if fraction < 1.0 else f"{'inf':>14}"
+            lines.append(f"{value:12.3f} {fraction:14.12f} {count:10d} {inverse}")
+        lines.append(f"#[Mean    = {self.mean_ms():12.3f}, Max     = {self.max_us / 1000.0:12.3f}]")
+        lines.append(f"#[Total count    = {self.total:12d}]")
+        return "\n".join(lines)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the JSON hot paths: stdlib json vs app.utils.jsoncodec.
+
+Each case runs the same work the app does per message, once with the stdlib
+(what FastAPI, kombu's "json" serializer and httpx use by default) and once
+with the shared codec (orjson when installed):
+
+  webhook_ingest   decode a /webhook body and validate it as WebhookRequest
+  celery_message   kombu encode + decode of the run_workflow_task arguments
+  orders_decode    decode a fetch-orders API response body
+  result_render    render a full workflow result as an HTTP response body
+  pretty_dump      indent=2 dump of an orders response, as the beautifier does
+
+Usage:
+    python -m benchmarks.json_bench --orders 500 --history 100
+    python -m benchmarks.json_bench --orders 5000 --output json_bench.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+os.environ.setdefault("CHECK_CUSTOMER_REGISTRATION_API_URL", "http://mock-api-1/endpoint")
+os.environ.setdefault("FETCH_CUSTOMER_ORDERS_API_URL", "http://mock-api-2/endpoint")
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from kombu.serialization import dumps as kombu_dumps, loads as kombu_loads
+
+from app.models import WebhookRequest
+from app.utils import jsoncodec
+from app.utils.jsoncodec import CELERY_SERIALIZER, register_celery_serializer
+
+WORDS = "order refund status shipping delayed package tracking invoice payment address".split()
+
+
+def make_event(history: int, rng: random.Random) -> Dict[str, Any]:
+    """A webhook event with a conversation history, like a chat platform would send."""
+    return {
+        "message": "where is my order? it has been a week — ¿dónde está?",
+        "channel": "whatsapp",
+        "metadata": {"locale": "en-PK", "client": {"app": "android", "version": "5.12.3"}},
+        "history": [
+            {
+                "id": f"msg-{i}",
+                "from": rng.choice(["customer", "agent"]),
+                "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))),
+                "timestamp": 1_700_000_000 + i * 37,
+                "attachments": [{"type": "image", "url": f"https://cdn.example.com/{i}.jpg"}] if i % 7 == 0 else [],
+            }
+            for i in range(history)
+        ],
+    }
+
+
+def make_orders(count: int, rng: random.Random) -> Dict[str, Any]:
+    """A fetch-orders API response with ``count`` orders."""
+    return {
+        "customer_id": "customer-1",
+        "orders": [
+            {
+                "order_id": f"ORD-{100000 + i}",
+                "status": rng.choice(["delivered", "shipped", "processing", "cancelled"]),
+                "total": round(rng.uniform(5, 500), 2),
+                "currency": "PKR",
+                "created_at": "2024-05-%02dT10:%02d:00Z" % (i % 28 + 1, i % 60),
+                "items": [
+                    {"sku": f"SKU-{rng.randint(1, 9999)}", "name": " ".join(rng.choice(WORDS) for _ in range(3)),
+                     "qty": rng.randint(1, 4), "price": round(rng.uniform(1, 200), 2)}
+                    for _ in range(rng.randint(1, 6))
+                ],
+                "shipping": {"carrier": "TCS", "tracking": f"TCS{rng.randint(10**8, 10**9)}", "eta_days": rng.randint(1, 9)},
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def make_result(event: Dict[str, Any], orders: Dict[str, Any]) -> Dict[str, Any]:
+    """The shape of a completed /workflow/run response carrying both payloads."""
+    return {
+        "workflow_id": "wf-bench",
+        "workflow": "customer_care",
+        "status": "completed",
+        "final_status": "order_status_returned",
+        "globals": {"received_event": event, "api2_response": orders, "api1_response": {"registered": True}},
+        "logs": [f"Step {i}: done" for i in range(1, 10)],
+        "visualization": {"text_tree": "x" * 2000, "json": jsoncodec.dumps_pretty({"steps": list(range(9))})},
+    }
+
+
+def time_op(fn: Callable[[], Any], min_time: float) -> float:
+    """Best per-call time in seconds over several batches lasting ~``min_time`` in total."""
+    fn()
+    start = time.perf_counter()
+    fn()
+    single = max(time.perf_counter() - start, 1e-7)
+    batch = max(1, int(min_time / 5 / single))
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(batch):
+            fn()
+        best = min(best, (time.perf_counter() - start) / batch)
+    return best
+
+
+def build_cases(event: Dict[str, Any], orders: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    register_celery_serializer()
+    body = json.dumps({"customer_id": "customer-1", "customer_phone_number": "+923001234567",
+                       "event": event}).encode("utf-8")
+    orders_body = json.dumps(orders).encode("utf-8")
+    orders_response = httpx.Response(200, content=orders_body, headers={"content-type": "application/json"})
+    task_args = ((("customer-1", "+923001234567", event),
+                  {"workflow": "customer_care", "workflow_id": "wf-bench", "enqueued_at": time.time()}, {}))
+    result = make_result(event, orders)
+
+    def celery_round_trip(serializer: str) -> Callable[[], Any]:
+        def run():
+            content_type, encoding, data = kombu_dumps(task_args, serializer=serializer)
+            return kombu_loads(data, content_type, encoding)
+        return run
+
+    return {
+        "webhook_ingest": {
+            "bytes": len(body),
+            "stdlib": lambda: WebhookRequest.model_validate(json.loads(body)),
+            "codec": lambda: WebhookRequest.model_validate(jsoncodec.loads(body)),
+        },
+        "celery_message": {
+            "bytes": len(kombu_dumps(task_args, serializer="json")[2]),
+            "stdlib": celery_round_trip("json"),
+            "codec": celery_round_trip(CELERY_SERIALIZER),
+        },
+        "orders_decode": {
+            "bytes": len(orders_body),
+            "stdlib": lambda: orders_response.json(),
+            "codec": lambda: jsoncodec.loads(orders_response.content),
+        },
+        "result_render": {
+            "bytes": len(jsoncodec.dumps(result)),
+            "stdlib": lambda: JSONResponse(jsonable_encoder(result)).body,
+            "codec": lambda: jsoncodec.dumps(result),
+        },
+        "pretty_dump": {
+            "bytes": len(orders_body),
+            "stdlib": lambda: json.dumps(orders, indent=2, default=str, ensure_ascii=False),
+            "codec": lambda: jsoncodec.dumps_pretty(orders),
+        },
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    event = make_event(args.history, rng)
+    orders = make_orders(args.orders, rng)
+    cases = {}
+    for name, case in build_cases(event, orders).items():
+        stdlib = time_op(case["stdlib"], args.min_time)
+        codec = time_op(case["codec"], args.min_time)
+        cases[name] = {
+            "bytes": case["bytes"],
+            "stdlib_us": stdlib * 1e6,
+            "codec_us": codec * 1e6,
+            "speedup": stdlib / codec,
+            "codec_mb_s": case["bytes"] / codec / 1e6,
+        }
+    return {"backend": jsoncodec.BACKEND, "orders": args.orders, "history": args.history,
+            "python": sys.version.split()[0], "cases": cases}
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"codec backend: {result['backend']}   orders={result['orders']}   history={result['history']}")
+    print(f"{'case':<16}{'payload':>11}{'stdlib us':>13}{'codec us':>12}{'speedup':>10}{'codec MB/s':>12}")
+    for name, case in result["cases"].items():
+        print(f"{name:<16}{case['bytes'] / 1024:>9.1f}KB{case['stdlib_us']:>13.1f}{case['codec_us']:>12.1f}"
+              f"{case['speedup']:>9.2f}x{case['codec_mb_s']:>12.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500, help="orders in the fetch-orders response")
+    parser.add_argument("--history", type=int, default=100, help="messages in the webhook event history")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent timing each variant")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the /webhook ingest path.
+
+Requests are sent on a fixed schedule (constant or Poisson arrivals, with
+optional ramps) regardless of how fast the server answers, and every latency
+is measured from the *intended* send time, so a stalled server shows up as
+latency instead of silently lowering the offered load. Each submission is
+correlated with its workflow's completion record through the workflow_id
+returned by /webhook and the batched POST /workflow/results lookup.
+
+Targets the local docker-compose stack by default (http://localhost:8000).
+
+Usage:
+    # 50 req/s Poisson arrivals for 60s
+    python -m benchmarks.loadgen --rate 50 --duration 60 --arrival poisson
+
+    # Ramp profile: 10 req/s for 30s, ramp 10 -> 200 over 60s, hold 200 for 30s
+    python -m benchmarks.loadgen --profile 10x30,10-200x60,200x30
+
+    # Search for the highest rate that keeps end-to-end p99 under 2s
+    python -m benchmarks.loadgen --search --slo-p99-ms 2000 --start-rate 20 --stage-seconds 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.histogram import LatencyHistogram
+
+MESSAGES = [
+    "where is my order? I need the status",
+    "I want a refund for my last purchase",
+    "hello, do you ship internationally?",
+    "please return my item, it arrived broken",
+]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Arrival rate going linearly from ``start_rate`` to ``end_rate`` over ``seconds``."""
+    start_rate: float
+    end_rate: float
+    seconds: float
+
+    def rate_at(self, t: float) -> float:
+        if self.seconds <= 0:
+            return self.end_rate
+        return self.start_rate + (self.end_rate - self.start_rate) * min(1.0, t / self.seconds)
+
+
+def parse_profile(spec: str) -> List[Stage]:
+    """Parse ``RATE[-RATE]xSECONDS`` stages separated by commas, e.g. ``10x30,10-200x60``."""
+    stages = []
+    for part in spec.split(","):
+        rates, _, seconds = part.strip().partition("x")
+        start, _, end = rates.partition("-")
+        stages.append(Stage(float(start), float(end or start), float(seconds)))
+    return stages
+
+
+def schedule(stages: List[Stage], arrival: str, rng: random.Random) -> List[float]:
+    """Intended send offsets (seconds from start) for the whole profile."""
+    offsets = []
+    stage_start = 0.0
+    for stage in stages:
+        t = 0.0
+        while True:
+            rate = max(stage.rate_at(t), 1e-9)
+            t += rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+            if t >= stage.seconds:
+                break
+            offsets.append(stage_start + t)
+        stage_start += stage.seconds
+    return offsets
+
+
+@dataclass
+class RunResult:
+    offered: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    errors: int = 0
+    completed: int = 0
+    failed_workflows: int = 0
+    incomplete: int = 0
+    duration_s: float = 0.0
+    send_lag_max_ms: float = 0.0
+    ingest: LatencyHistogram = field(default_factory=lambda: LatencyHistogram("ingest"))
+    queue_wait: LatencyHistogram = field(default_factory=lambda: LatencyHistogram("queue_wait"))
+    execution: LatencyHistogram = field(default_factory=lambda: LatencyHistogram("execution"))
+    end_to_end: LatencyHistogram = field(default_factory=lambda: LatencyHistogram("end_to_end"))
+    # End-to-end latency per ingest priority class (completion records carry "priority")
+    by_priority: Dict[str, LatencyHistogram] = field(default_factory=dict)
+
+    def histograms(self) -> List[LatencyHistogram]:
+        return [self.ingest, self.queue_wait, self.execution, self.end_to_end,
+                *(self.by_priority[name] for name in sorted(self.by_priority))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "offered": self.offered,
+            "offered_rps": self.offered / self.duration_s if self.duration_s else 0.0,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "completed": self.completed,
+            "completed_rps": self.completed / self.duration_s if self.duration_s else 0.0,
+            "failed_workflows": self.failed_workflows,
+            "incomplete": self.incomplete,
+            "send_lag_max_ms": self.send_lag_max_ms,
+            "latency": {h.name: h.summary() for h in self.histograms()},
+        }
+
+
+def _payload(rng: random.Random) -> Dict[str, Any]:
+    n = rng.randrange(10 ** 7)
+    return {
+        "customer_id": f"load-{n}",
+        "customer_phone_number": f"+92300{n:07d}",
+        "event": {"message": rng.choice(MESSAGES)},
+    }
+
+
+async def run_load(client: httpx.AsyncClient, stages: List[Stage], args: argparse.Namespace) -> RunResult:
+    """Drive one load profile and wait for the submitted workflows to complete."""
+    rng = random.Random(args.seed)
+    offsets = schedule(stages, args.arrival, rng)
+    result = RunResult(offered=len(offsets), duration_s=sum(s.seconds for s in stages))
+
+    # workflow_id -> intended send time (wall clock), for end-to-end latency
+    pending: Dict[str, float] = {}
+    sending_done = asyncio.Event()
+
+    wall0 = time.time()
+    mono0 = time.perf_counter()
+
+    async def submit(offset: float) -> None:
+        try:
+            resp = await client.post("/webhook", json=_payload(rng), timeout=args.request_timeout)
+        except httpx.HTTPError:
+            result.errors += 1
+            return
+        result.ingest.record_ms((time.perf_counter() - mono0 - offset) * 1000)
+        if resp.status_code in (429, 503):
+            result.rejected += 1
+        elif resp.status_code >= 400:
+            result.errors += 1
+        else:
+            result.accepted += 1
+            workflow_id = resp.json().get("workflow_id")
+            if workflow_id:
+                pending[workflow_id] = wall0 + offset
+
+    async def poll_completions() -> None:
+        drain_deadline = None
+        while True:
+            if sending_done.is_set() and drain_deadline is None:
+                drain_deadline = time.perf_counter() + args.drain_timeout
+            if pending:
+                ids = list(pending)[:args.poll_batch]
+                try:
+                    resp = await client.post("/workflow/results", json={"workflow_ids": ids},
+                                             timeout=args.request_timeout)
+                    records = resp.json().get("results", {}) if resp.status_code == 200 else {}
+                except httpx.HTTPError:
+                    records = {}
+                for workflow_id, record in records.items():
+                    if not record:
+                        continue
+                    intended = pending.pop(workflow_id, None)
+                    if intended is None:
+                        continue
+                    result.completed += 1
+                    if record.get("status") != "completed":
+                        result.failed_workflows += 1
+                    result.end_to_end.record_ms((record["completed_at"] - intended) * 1000)
+                    if record.get("priority"):
+                        name = f"e2e[{record['priority']}]"
+                        result.by_priority.setdefault(name, LatencyHistogram(name)).record_ms(
+                            (record["completed_at"] - intended) * 1000)
+                    if record.get("queue_wait_ms") is not None:
+                        result.queue_wait.record_ms(record["queue_wait_ms"])
+                    if record.get("duration_ms") is not None:
+                        result.execution.record_ms(record["duration_ms"])
+            if drain_deadline is not None and (not pending or time.perf_counter() > drain_deadline):
+                result.incomplete = len(pending)
+                return
+            await asyncio.sleep(args.poll_interval)
+
+    poller = asyncio.create_task(poll_completions())
+    in_flight = set()
+    for offset in offsets:
+        delay = offset - (time.perf_counter() - mono0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            result.send_lag_max_ms = max(result.send_lag_max_ms, -delay * 1000)
+        task = asyncio.create_task(submit(offset))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    sending_done.set()
+    await poller
+    return result
+
+
+def sustainable(result: RunResult, slo_p99_ms: float, max_error_ratio: float) -> Tuple[bool, str]:
+    """Whether a stage kept up: few errors, everything completed, e2e p99 within SLO."""
+    if not result.offered:
+        return False, "nothing offered"
+    error_ratio = (result.errors + result.rejected) / result.offered
+    if error_ratio > max_error_ratio:
+        return False, f"error ratio {error_ratio:.2%}"
+    if result.incomplete:
+        return False, f"{result.incomplete} workflows did not complete"
+    p99 = result.end_to_end.value_at_percentile(99.0)
+    if p99 > slo_p99_ms:
+        return False, f"e2e p99 {p99:.0f}ms > {slo_p99_ms:.0f}ms"
+    return True, f"e2e p99 {p99:.0f}ms"
+
+
+async def search_max_rate(client: httpx.AsyncClient, args: argparse.Namespace) -> Dict[str, Any]:
+    """Double the rate until the SLO breaks, then bisect between the last good and first bad rate."""
+    history = []
+
+    async def probe(rate: float) -> bool:
+        result = await run_load(client, [Stage(rate, rate, args.stage_seconds)], args)
+        ok, why = sustainable(result, args.slo_p99_ms, args.max_error_ratio)
+        print(f"  {rate:8.1f} req/s -> {'OK  ' if ok else 'FAIL'} ({why})")
+        history.append({"rate": rate, "sustainable": ok, "reason": why, **result.to_dict()})
+        await asyncio.sleep(args.cooldown)
+        return ok
+
+    good, bad = 0.0, None
+    rate = args.start_rate
+    while rate <= args.max_rate:
+        if await probe(rate):
+            good, rate = rate, rate * 2
+        else:
+            bad = rate
+            break
+    if bad is not None:
+        for _ in range(args.search_steps):
+            mid = (good + bad) / 2.0
+            if bad - good < max(1.0, good * 0.05):
+                break
+            if await probe(mid):
+                good = mid
+            else:
+                bad = mid
+    return {"max_sustainable_rps": good, "first_failing_rps": bad, "stages": history}
+
+
+def print_result(result: RunResult) -> None:
+    data = result.to_dict()
+    print(f"offered {data['offered']} ({data['offered_rps']:.1f} req/s)  accepted {data['accepted']}  "
+          f"rejected {data['rejected']}  errors {data['errors']}")
+    print(f"completed {data['completed']} ({data['completed_rps']:.1f} req/s)  "
+          f"failed workflows {data['failed_workflows']}  incomplete {data['incomplete']}  "
+          f"max send lag {data['send_lag_max_ms']:.1f}ms")
+    print(f"{'latency (ms)':<14}{'p50':>10}{'p90':>10}{'p99':>10}{'p99.9':>10}{'max':>10}")
+    for hist in result.histograms():
+        print(f"{hist.name:<14}" + "".join(f"{hist.value_at_percentile(p):>10.1f}" for p in (50, 90, 99, 99.9))
+              + f"{hist.max_us / 1000.0:>10.1f}")
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        if args.search:
+            print(f"Searching max sustainable rate (SLO e2e p99 <= {args.slo_p99_ms:.0f}ms)")
+            report = await search_max_rate(client, args)
+            print(f"\nmax sustainable throughput: {report['max_sustainable_rps']:.1f} req/s")
+            return report
+
+        stages = parse_profile(args.profile) if args.profile else [Stage(args.rate, args.rate, args.duration)]
+        result = await run_load(client, stages, args)
+        print_result(result)
+        if args.hgrm_prefix:
+            for hist in result.histograms():
+                with open(f"{args.hgrm_prefix}{hist.name}.hgrm", "w", encoding="utf-8") as fh:
+                    fh.write(hist.to_hgrm() + "\n")
+        return {"profile": [s.__dict__ for s in stages], "arrival": args.arrival, **result.to_dict()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=float, default=20.0, help="constant arrival rate (req/s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds at --rate")
+    parser.add_argument("--profile", help="ramp profile, e.g. 10x30,10-200x60,200x30 (overrides --rate/--duration)")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="poisson")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--connections", type=int, default=512)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="seconds between completion lookups")
+    parser.add_argument("--poll-batch", type=int, default=500, help="workflow ids per completion lookup")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="seconds to wait for completions after the last send")
+    parser.add_argument("--search", action="store_true", help="search for the max sustainable rate")
+    parser.add_argument("--slo-p99-ms", type=float, default=2000.0)
+    parser.add_argument("--max-error-ratio", type=float, default=0.01)
+    parser.add_argument("--start-rate", type=float, default=10.0)
+    parser.add_argument("--max-rate", type=float, default=5000.0)
+    parser.add_argument("--stage-seconds", type=float, default=20.0)
+    parser.add_argument("--search-steps", type=int, default=5)
+    parser.add_argument("--cooldown", type=float, default=5.0, help="seconds between search stages")
+    parser.add_argument("--hgrm-prefix", help="write <prefix><histogram>.hgrm percentile files")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Worker start-up cost: cold vs warm first tasks.
+
+Starts tests/mock_api1.py and tests/mock_api2.py under uvicorn on local
+ports (real sockets, so connection setup is part of the numbers), then
+launches fresh Python processes that behave like a Celery pool child:
+
+  cold   import app.tasks, then run the first workflows straight away
+  warm   import app.tasks, run app.services.warmup.warm_up(), then run them
+
+Each process reports its import time, warm-up time and the latency of each
+of its first ``--tasks`` workflows, run one after another on the loop
+``run_workflow_task`` uses. Results are medians over ``--repeat`` processes.
+
+Usage:
+    python -m benchmarks.startup_bench --repeat 5 --tasks 5
+    python -m benchmarks.startup_bench --repeat 10 --output startup.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+CHILD_FLAG = "--child"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def child(mode: str, tasks: int) -> None:
+    """Runs in the measured process: import, optionally warm, then time the first workflows."""
+    started = time.perf_counter()
+    import app.tasks  # noqa: F401  (what a Celery worker imports before forking)
+    from app.services.warmup import warm_up
+    from app.workflow.workflow_manager import run_workflow_instance
+    import_s = time.perf_counter() - started
+
+    loop = asyncio.get_event_loop()
+    warm = {}
+    if mode == "warm":
+        warm = loop.run_until_complete(warm_up())
+
+    latencies = []
+    for i in range(tasks):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            loop.run_until_complete(run_workflow_instance(
+                str(uuid.uuid4()), f"customer-{i}", "+923001234567",
+                {"message": "where is my order? I need the status"}, enable_visualization=False,
+            ))
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(json.dumps({"import_ms": import_s * 1000, "warm_ms": {k: v * 1000 for k, v in warm.items()},
+                      "task_ms": latencies}))
+
+
+def _wait_for(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return
+        time.sleep(0.05)
+    raise RuntimeError(f"mock API on :{port} did not start")
+
+
+def start_mocks() -> Dict[str, Any]:
+    ports = {"tests.mock_api1:app": _free_port(), "tests.mock_api2:app": _free_port()}
+    procs = [subprocess.Popen([sys.executable, "-m", "uvicorn", target, "--port", str(port), "--log-level", "warning"],
+                              stdout=subprocess.DEVNULL)
+             for target, port in ports.items()]
+    for port in ports.values():
+        _wait_for(port)
+    api1, api2 = ports.values()
+    return {"procs": procs, "env": {
+        "CHECK_CUSTOMER_REGISTRATION_API_URL": f"http://127.0.0.1:{api1}/endpoint",
+        "FETCH_CUSTOMER_ORDERS_API_URL": f"http://127.0.0.1:{api2}/endpoint",
+    }}
+
+
+def run_process(mode: str, args: argparse.Namespace, env: Dict[str, str]) -> Dict[str, Any]:
+    out = subprocess.run([sys.executable, "-m", "benchmarks.startup_bench", CHILD_FLAG, mode, str(args.tasks)],
+                         env={**os.environ, **env}, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(mode: str, runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    median = statistics.median
+    return {
+        "mode": mode,
+        "import_ms": median(r["import_ms"] for r in runs),
+        "warm_ms": median(sum(r["warm_ms"].values()) for r in runs),
+        "first_task_ms": median(r["task_ms"][0] for r in runs),
+        "later_task_ms": median(median(r["task_ms"][1:]) for r in runs) if len(runs[0]["task_ms"]) > 1 else None,
+        "ready_to_first_result_ms": median(r["import_ms"] + sum(r["warm_ms"].values()) + r["task_ms"][0]
+                                           for r in runs),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == [CHILD_FLAG]:
+        child(argv[1], int(argv[2]))
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per mode")
+    parser.add_argument("--tasks", type=int, default=5, help="workflows timed per process")
+    parser.add_argument("--modes", default="cold,warm")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    mocks = start_mocks()
+    try:
+        results = [summarize(mode, [run_process(mode, args, mocks["env"]) for _ in range(args.repeat)])
+                   for mode in args.modes.split(",")]
+    finally:
+        for proc in mocks["procs"]:
+            proc.terminate()
+            proc.wait()
+
+    print(f"repeat={args.repeat} tasks/process={args.tasks} (medians, ms)")
+    print(f"{'mode':<6}{'import':>10}{'warm-up':>10}{'1st task':>10}{'later':>10}{'to 1st result':>15}")
+    for r in results:
+        later = f"{r['later_task_ms']:.2f}" if r["later_task_ms"] is not None else "-"
+        print(f"{r['mode']:<6}{r['import_ms']:>10.1f}{r['warm_ms']:>10.1f}{r['first_task_ms']:>10.2f}{later:>10}"
+              f"{r['ready_to_first_result_ms']:>15.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
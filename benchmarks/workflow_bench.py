@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+In-process benchmark for run_workflow_instance.
+
+The mock internal APIs (tests/mock_api1.py, tests/mock_api2.py) are mounted
+through an ASGI transport on the shared httpx client, so no sockets, Redis or
+Celery are involved: the numbers cover the orchestrator, the steps, the API
+client layer and (unless --no-visualization) the renderers.
+
+``--api-profile`` makes both mocks misbehave (tests/mock_faults.py): a preset
+name or a JSON profile, e.g. ``slow`` or ``{"preset": "flaky", "seed": 1}``.
+``--orders-profile`` overrides it for the orders API only.
+
+Usage:
+    python -m benchmarks.workflow_bench --requests 2000 --concurrency 50 --output bench.json
+    python -m benchmarks.workflow_bench --compare bench.json --max-regression 0.15
+    python -m benchmarks.workflow_bench --api-profile realistic --orders-profile '{"orders": 5000}'
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+# The mocks are routed by host name, so these only need to be distinct
+os.environ.setdefault("CHECK_CUSTOMER_REGISTRATION_API_URL", "http://mock-api-1/endpoint")
+os.environ.setdefault("FETCH_CUSTOMER_ORDERS_API_URL", "http://mock-api-2/endpoint")
+
+import httpx
+
+from app.config import settings
+from app.services.apis import close_http_client, set_http_client
+from app.workflow.plan import WorkflowPlan, get_plan, register_plan
+from app.workflow.workflow_manager import run_workflow_instance
+from tests import mock_api1, mock_api2
+from tests.mock_faults import build_profile
+
+MESSAGES = [
+    "where is my order? I need the status",
+    "I want a refund for my last purchase",
+    "hello, do you ship internationally?",
+]
+
+# Relative changes smaller than these absolute amounts are treated as noise
+NOISE_FLOOR_MS = 0.05
+NOISE_FLOOR_KB = 1.0
+
+
+class RoutingASGITransport(httpx.AsyncBaseTransport):
+    """Dispatch requests to in-process ASGI apps by ``host[:port]``."""
+
+    def __init__(self, apps: Dict[str, Any]):
+        self._transports = {netloc: httpx.ASGITransport(app=app) for netloc, app in apps.items()}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        netloc = request.url.netloc.decode("ascii")
+        transport = self._transports.get(netloc)
+        if transport is None:
+            raise httpx.ConnectError(f"No in-process app mounted for {netloc}", request=request)
+        try:
+            return await transport.handle_async_request(request)
+        except ConnectionResetError as e:
+            # An injected reset (tests/mock_faults.py) reaches the client as it would over a socket
+            raise httpx.RemoteProtocolError(str(e), request=request)
+
+
+def build_mock_client() -> httpx.AsyncClient:
+    """httpx client that serves both internal APIs from the mock ASGI apps."""
+    apps = {
+        urlsplit(str(settings.CHECK_CUSTOMER_REGISTRATION_API_URL)).netloc: mock_api1.app,
+        urlsplit(str(settings.FETCH_CUSTOMER_ORDERS_API_URL)).netloc: mock_api2.app,
+    }
+    return httpx.AsyncClient(transport=RoutingASGITransport(apps))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "mean": statistics.fmean(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def instrument_plan(plan: WorkflowPlan, step_times: Dict[str, List[float]],
+                    step_allocs: Optional[Dict[str, List[float]]] = None) -> WorkflowPlan:
+    """Copy of ``plan`` whose handlers record wall time (and allocations, if tracing)."""
+
+    def wrap(spec):
+        handler = spec.handler
+        times = step_times.setdefault(spec.id, [])
+        allocs = step_allocs.setdefault(spec.id, []) if step_allocs is not None else None
+
+        async def timed(ctx):
+            if allocs is not None:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            try:
+                return await handler(ctx)
+            finally:
+                times.append((time.perf_counter() - start) * 1000)
+                if allocs is not None:
+                    allocs.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+
+        return replace(spec, handler=timed)
+
+    return WorkflowPlan(name=plan.name, version=plan.version, steps=tuple(wrap(s) for s in plan.steps))
+
+
+async def _run_one(index: int, workflow: str, visualization: bool) -> Dict[str, Any]:
+    return await run_workflow_instance(
+        workflow_id=str(uuid.uuid4()),
+        customer_id=f"bench-{index}",
+        customer_phone_number=f"+92300{index:07d}",
+        event={"message": MESSAGES[index % len(MESSAGES)]},
+        enable_visualization=visualization,
+        workflow=workflow,
+    )
+
+
+async def measure_latency(args: argparse.Namespace, plan: WorkflowPlan) -> Dict[str, Any]:
+    """Run ``args.requests`` workflows at ``args.concurrency`` and time them."""
+    step_times: Dict[str, List[float]] = {}
+    register_plan(instrument_plan(plan, step_times))
+
+    for i in range(args.warmup):
+        await _run_one(i, plan.name, args.visualization)
+    for times in step_times.values():
+        times.clear()
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def worker(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await _run_one(i, plan.name, args.visualization)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.requests)))
+    wall = time.perf_counter() - started
+
+    return {
+        "throughput_rps": args.requests / wall if wall else 0.0,
+        "wall_s": wall,
+        "latency_ms": summarize(latencies),
+        "statuses": statuses,
+        "steps": {step_id: {f"{k}_ms": v for k, v in summarize(times).items()}
+                  for step_id, times in step_times.items() if times},
+    }
+
+
+async def measure_allocations(args: argparse.Namespace, plan: WorkflowPlan) -> Dict[str, Any]:
+    """Sequential pass under tracemalloc: peak KiB allocated per step and per workflow."""
+    step_times: Dict[str, List[float]] = {}
+    step_allocs: Dict[str, List[float]] = {}
+    register_plan(instrument_plan(plan, step_times, step_allocs))
+
+    workflow_peaks: List[float] = []
+    tracemalloc.start()
+    try:
+        for i in range(args.alloc_runs):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await _run_one(i, plan.name, args.visualization)
+            workflow_peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "workflow_alloc_peak_kb": statistics.fmean(workflow_peaks) if workflow_peaks else 0.0,
+        "steps": {step_id: statistics.fmean(values) for step_id, values in step_allocs.items() if values},
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    plan = get_plan(args.workflow)
+    api_profile = build_profile(args.api_profile)
+    mock_api1.FAULTS.set_profile(api_profile)
+    mock_api2.FAULTS.set_profile(build_profile(args.orders_profile) if args.orders_profile else api_profile)
+    set_http_client(build_mock_client())
+    try:
+        # The mocks print every request they receive; keep that out of the timings
+        with contextlib.redirect_stdout(io.StringIO()):
+            latency = await measure_latency(args, plan)
+            allocations = await measure_allocations(args, plan) if args.alloc_runs else None
+    finally:
+        register_plan(plan)
+        await close_http_client()
+
+    if allocations:
+        for step_id, kb in allocations["steps"].items():
+            latency["steps"].setdefault(step_id, {})["alloc_peak_kb"] = kb
+        latency["workflow_alloc_peak_kb"] = allocations["workflow_alloc_peak_kb"]
+
+    return {
+        "meta": {
+            "workflow": plan.name,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "visualization": args.visualization,
+            "api_profile": args.api_profile,
+            "orders_profile": args.orders_profile,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        **latency,
+    }
+
+
+def _worse(new: float, old: float, higher_is_worse: bool, limit: float, floor: float) -> bool:
+    delta = (new - old) if higher_is_worse else (old - new)
+    return delta > floor and old > 0 and delta / old > limit
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], limit: float) -> List[str]:
+    """Return human-readable regressions of ``current`` against ``baseline``."""
+    problems = []
+    if _worse(current["throughput_rps"], baseline["throughput_rps"], False, limit, 0.0):
+        problems.append(f"throughput {baseline['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+    for pct in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"][pct], current["latency_ms"][pct]
+        if _worse(new, old, True, limit, NOISE_FLOOR_MS):
+            problems.append(f"latency {pct} {old:.3f} -> {new:.3f} ms")
+    for step_id, old_step in baseline.get("steps", {}).items():
+        new_step = current.get("steps", {}).get(step_id)
+        if not new_step or "mean_ms" not in old_step or "mean_ms" not in new_step:
+            continue
+        if _worse(new_step["mean_ms"], old_step["mean_ms"], True, limit, NOISE_FLOOR_MS):
+            problems.append(f"step {step_id} mean {old_step['mean_ms']:.3f} -> {new_step['mean_ms']:.3f} ms")
+        if "alloc_peak_kb" in old_step and "alloc_peak_kb" in new_step and \
+                _worse(new_step["alloc_peak_kb"], old_step["alloc_peak_kb"], True, limit, NOISE_FLOOR_KB):
+            problems.append(f"step {step_id} alloc {old_step['alloc_peak_kb']:.1f} -> {new_step['alloc_peak_kb']:.1f} KiB")
+    if "workflow_alloc_peak_kb" in baseline and "workflow_alloc_peak_kb" in current and \
+            _worse(current["workflow_alloc_peak_kb"], baseline["workflow_alloc_peak_kb"], True, limit, NOISE_FLOOR_KB):
+        problems.append(f"workflow alloc {baseline['workflow_alloc_peak_kb']:.1f} -> "
+                        f"{current['workflow_alloc_peak_kb']:.1f} KiB")
+    return problems
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    meta = result["meta"]
+    lat = result["latency_ms"]
+    print(f"workflow={meta['workflow']} requests={meta['requests']} concurrency={meta['concurrency']} "
+          f"visualization={meta['visualization']} api_profile={meta['api_profile']}"
+          + (f" orders_profile={meta['orders_profile']}" if meta["orders_profile"] else ""))
+    print(f"throughput: {result['throughput_rps']:.1f} req/s  statuses: {result['statuses']}")
+    print(f"latency ms: p50={lat['p50']:.3f} p95={lat['p95']:.3f} p99={lat['p99']:.3f} max={lat['max']:.3f}")
+    if "workflow_alloc_peak_kb" in result:
+        print(f"allocations: {result['workflow_alloc_peak_kb']:.1f} KiB peak per workflow")
+    print(f"{'step':<32}{'mean ms':>10}{'p95 ms':>10}{'alloc KiB':>12}")
+    for step_id, step in result["steps"].items():
+        alloc = f"{step['alloc_peak_kb']:.1f}" if "alloc_peak_kb" in step else "-"
+        print(f"{step_id:<32}{step.get('mean_ms', 0):>10.3f}{step.get('p95_ms', 0):>10.3f}{alloc:>12}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflow", default=None, help="workflow definition to run (default: settings.DEFAULT_WORKFLOW)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--alloc-runs", type=int, default=100, help="sequential runs under tracemalloc (0 to skip)")
+    parser.add_argument("--no-visualization", dest="visualization", action="store_false",
+                        help="skip the visualizer/beautifier renderers")
+    parser.add_argument("--api-profile", default="healthy",
+                        help="fault/latency profile for both mock APIs: preset name or JSON (tests/mock_faults.py)")
+    parser.add_argument("--orders-profile", help="profile for the orders mock only (default: --api-profile)")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="allowed relative regression before --compare fails (default 0.10)")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_benchmark(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        problems = compare(result, baseline, args.max_regression)
+        if problems:
+            print(f"\nREGRESSIONS vs {args.compare} (> {args.max_regression:.0%}):")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print(f"\nNo regressions vs {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -157,6 +157,24 @@ monitor_queue_status() {
     docker-compose exec redis redis-cli lrange celery 0 9
 }
 
+# Show key Prometheus metrics from the web and worker processes
+monitor_metrics() {
+    print_status "Workflow Metrics:"
+    echo "=================="
+
+    echo "Web (/metrics):"
+    curl -s http://localhost:8000/metrics | grep -E "^(webhook_requests_total|workflow_runs_total|workflow_final_status_total)" || print_warning "Web metrics not available"
+
+    echo ""
+    echo "Worker exporters (:9100+):"
+    for port in $(seq 9100 9115); do
+        if output=$(curl -s -f "http://localhost:${port}/metrics" 2>/dev/null); then
+            echo "-- worker process on :${port}"
+            echo "$output" | grep -E "^(workflow_runs_total|workflow_final_status_total|workflow_task_retries_total|api_request_errors_total|workflow_queue_wait_seconds_(sum|count))"
+        fi
+    done
+}
+
 # Monitor workflow execution
 monitor_workflow_execution() {
     print_status "Workflow Execution Monitor:"
@@ -248,6 +266,7 @@ show_dashboard() {
     echo "  ./monitor.sh resources - Monitor system resources"
     echo "  ./monitor.sh realtime  - Real-time monitoring"
     echo "  ./monitor.sh test      - Test workflow execution"
+    echo "  ./monitor.sh metrics   - Show workflow metrics"
     echo ""
 }
 
@@ -272,11 +291,14 @@ main() {
         "test")
             monitor_workflow_execution
             ;;
+        "metrics")
+            monitor_metrics
+            ;;
         "dashboard"|"")
             show_dashboard
             ;;
         *)
-            echo "Usage: $0 [health|workers|redis|resources|realtime|test|dashboard]"
+            echo "Usage: $0 [health|workers|redis|resources|realtime|test|metrics|dashboard]"
             exit 1
             ;;
     esac
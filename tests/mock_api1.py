@@ -1,7 +1,10 @@
 # tests/mock_api1.py
 from fastapi import FastAPI
+from tests.mock_faults import install
 
 app = FastAPI(title="Mock Internal API 1")
+# Latency, errors and resets per the current profile (PUT /_control/profile)
+FAULTS = install(app)
 
 @app.get("/endpoint/{phone_number}")
 async def get_customer_registration(phone_number: str):
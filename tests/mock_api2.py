@@ -1,25 +1,50 @@
 # tests/mock_api2.py
-from fastapi import FastAPI
+import json
+from functools import lru_cache
+from fastapi import FastAPI, Response
+from tests.mock_faults import install
 
 app = FastAPI(title="Mock Internal API 2")
+# Latency, errors, resets and the number of orders per the current profile (PUT /_control/profile)
+FAULTS = install(app)
+
+def _orders(count: int):
+    """The fixed order, followed by ``count - 1`` generated ones."""
+    orders = [
+        {
+            "order_id": "order_123",
+            "status": "shipped",
+            "items": ["item1", "item2"],
+            "total": 100.50
+        }
+    ]
+    for i in range(1, count):
+        orders.append({
+            "order_id": f"order_{123 + i}",
+            "status": "delivered",
+            "items": [f"item{i}", f"item{i + 1}"],
+            "total": round(10 + (i % 97) * 1.25, 2),
+            "created_at": f"2023-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:00Z",
+            "shipping_address": {"line1": f"{i} Main Street", "city": "Karachi", "country": "PK"}
+        })
+    return orders
+
+@lru_cache(maxsize=4)
+def _orders_json(count: int) -> bytes:
+    # Encoded once per size: a large profile should load the client, not the mock's JSON encoder
+    return json.dumps(_orders(count)).encode()
 
 @app.post("/endpoint")
 async def api2_endpoint(payload: dict):
     print(f"Mock API 2 received: {payload}")
-    return {
+    rest = json.dumps({
         "result": "processed_by_api2",
         "status": "success",
-        "orders": [
-            {
-                "order_id": "order_123",
-                "status": "shipped",
-                "items": ["item1", "item2"],
-                "total": 100.50
-            }
-        ],
         "context": payload.get("context"),
         "recommendation": "continue_workflow"
-    }
+    })
+    body = b'{"orders": ' + _orders_json(FAULTS.profile.orders) + b", " + rest[1:].encode()
+    return Response(body, media_type="application/json")
 
 @app.get("/health")
 async def health():
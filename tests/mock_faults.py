@@ -0,0 +1,185 @@
+# tests/mock_faults.py
+"""
+Fault and latency injection for the mock internal APIs.
+
+``install(app)`` wraps a mock app with ``FaultInjectionMiddleware`` and adds a
+control endpoint. Each request to the mock's API routes then follows the
+current ``FaultProfile``:
+
+* latency: ``fixed`` (``latency_ms``), ``lognormal`` (median ``latency_ms``,
+  shape ``latency_sigma``) or ``bimodal`` (``latency_ms``, except a
+  ``slow_ratio`` share that takes ``slow_ms``);
+* errors: an ``error_rate`` share answers with a status drawn from
+  ``error_statuses``;
+* connection resets: a ``reset_rate`` share starts the response and drops
+  the connection mid-body. Under uvicorn the socket is closed. Through the
+  benchmarks' ASGI transport, ``ConnectionResetError`` is raised;
+* ``orders``: how many orders mock API 2 returns, to scale the response size.
+
+/health and the control endpoint are never delayed or failed.
+
+Profiles start from a preset (``PRESETS``) with field overrides. The
+starting profile comes from the ``MOCK_API_PROFILE`` environment variable,
+given as a preset name or a JSON object. It can be switched at runtime:
+
+    curl localhost:8002/_control/profile
+    curl -X PUT localhost:8002/_control/profile -d '{"preset": "flaky", "orders": 2000}'
+"""
+import asyncio
+import json
+import math
+import os
+import random
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Body, FastAPI, HTTPException
+
+CONTROL_PATH = "/_control/profile"
+UNAFFECTED_PATHS = ("/health", CONTROL_PATH)
+LATENCY_MODELS = ("fixed", "lognormal", "bimodal")
+
+
+@dataclass(frozen=True)
+class FaultProfile:
+    """How a mock API misbehaves; the defaults answer at once and never fail."""
+    latency: str = "fixed"
+    latency_ms: float = 0.0
+    latency_sigma: float = 0.5
+    slow_ms: float = 1000.0
+    slow_ratio: float = 0.0
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (503,)
+    reset_rate: float = 0.0
+    orders: int = 1
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.latency not in LATENCY_MODELS:
+            raise ValueError(f"latency must be one of {LATENCY_MODELS}, got {self.latency!r}")
+        for name in ("slow_ratio", "error_rate", "reset_rate"):
+            if not 0.0 <= getattr(self, name) <= 1.0:
+                raise ValueError(f"{name} must be between 0 and 1")
+        if not self.error_statuses:
+            raise ValueError("error_statuses must not be empty")
+
+    def delay(self, rng: random.Random) -> float:
+        """One latency sample, in seconds."""
+        if self.latency == "lognormal" and self.latency_ms > 0:
+            ms = rng.lognormvariate(math.log(self.latency_ms), self.latency_sigma)
+        elif self.latency == "bimodal" and rng.random() < self.slow_ratio:
+            ms = self.slow_ms
+        else:
+            ms = self.latency_ms
+        return ms / 1000.0
+
+
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "healthy": {},
+    # Typical remote dependency: ~20ms median with a long right tail
+    "realistic": {"latency": "lognormal", "latency_ms": 20.0, "latency_sigma": 0.6},
+    "slow": {"latency": "lognormal", "latency_ms": 250.0, "latency_sigma": 0.8},
+    # Mostly fast, 2% of calls stuck for 3s (GC pauses, lock waits)
+    "tail": {"latency": "bimodal", "latency_ms": 10.0, "slow_ms": 3000.0, "slow_ratio": 0.02},
+    "flaky": {"latency": "lognormal", "latency_ms": 20.0, "error_rate": 0.1,
+              "error_statuses": (500, 502, 503), "reset_rate": 0.02},
+    "outage": {"error_rate": 1.0, "error_statuses": (503,)},
+    "large_orders": {"orders": 20000},
+}
+
+
+def build_profile(spec: Any) -> FaultProfile:
+    """Profile from a preset name, or a dict of fields with an optional ``preset`` to start from."""
+    if isinstance(spec, str):
+        spec = json.loads(spec) if spec.lstrip().startswith("{") else {"preset": spec}
+    spec = dict(spec or {})
+    preset = spec.pop("preset", "healthy")
+    if preset not in PRESETS:
+        raise ValueError(f"unknown preset {preset!r}; available: {', '.join(PRESETS)}")
+    known = {f.name for f in fields(FaultProfile)}
+    unknown = set(spec) - known
+    if unknown:
+        raise ValueError(f"unknown profile fields: {', '.join(sorted(unknown))}")
+    values = {**PRESETS[preset], **spec}
+    if "error_statuses" in values:
+        values["error_statuses"] = tuple(int(s) for s in values["error_statuses"])
+    return FaultProfile(**values)
+
+
+class FaultInjector:
+    """Current profile, its random source and what has been injected so far."""
+
+    def __init__(self, profile: Optional[FaultProfile] = None):
+        self.stats: Dict[str, int] = {}
+        self.set_profile(profile or FaultProfile())
+
+    def set_profile(self, profile: FaultProfile) -> None:
+        self.profile = profile
+        self.rng = random.Random(profile.seed)
+        self.stats = {"requests": 0, "errors": 0, "resets": 0}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"profile": asdict(self.profile), "stats": dict(self.stats)}
+
+
+async def _send_error(send, status: int) -> None:
+    body = json.dumps({"detail": f"injected {status}"}).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _reset(send) -> None:
+    # Promise a body, send part of it, then fail: uvicorn closes the socket mid-response
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", b"1024")]})
+    await send({"type": "http.response.body", "body": b'{"status": "succ', "more_body": True})
+    raise ConnectionResetError("injected connection reset")
+
+
+class FaultInjectionMiddleware:
+    """ASGI middleware applying the injector's profile to every API request."""
+
+    def __init__(self, app, injector: FaultInjector):
+        self.app = app
+        self.injector = injector
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNAFFECTED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        injector = self.injector
+        profile, rng = injector.profile, injector.rng
+        injector.stats["requests"] += 1
+        delay = profile.delay(rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if profile.reset_rate and rng.random() < profile.reset_rate:
+            injector.stats["resets"] += 1
+            await _reset(send)
+            return
+        if profile.error_rate and rng.random() < profile.error_rate:
+            injector.stats["errors"] += 1
+            await _send_error(send, rng.choice(profile.error_statuses))
+            return
+        await self.app(scope, receive, send)
+
+
+def install(app: FastAPI) -> FaultInjector:
+    """Add fault injection and the control endpoint to a mock app; returns its injector."""
+    injector = FaultInjector(build_profile(os.environ.get("MOCK_API_PROFILE", "healthy")))
+
+    @app.get(CONTROL_PATH)
+    async def get_profile():
+        return {**injector.snapshot(), "presets": list(PRESETS)}
+
+    @app.put(CONTROL_PATH)
+    async def put_profile(spec: Dict[str, Any] = Body(default_factory=dict)):
+        try:
+            injector.set_profile(build_profile(spec))
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return injector.snapshot()
+
+    app.add_middleware(FaultInjectionMiddleware, injector=injector)
+    return injector
@@ -0,0 +1,103 @@
+import random
+import time
+
+import pytest
+
+from app.observability.analytics import MAX_BINS, DDSketch, StatsBucket, WorkflowAnalytics
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-3, 1.0) for _ in range(20000)]
+    sketch = DDSketch(0.01)
+    for value in values:
+        sketch.add(value)
+
+    values.sort()
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.011 * exact
+    assert sketch.quantile(1.0) == values[-1]
+
+
+def test_sketch_merge_matches_single_sketch_and_round_trips():
+    rng = random.Random(3)
+    whole, left, right = DDSketch(), DDSketch(), DDSketch()
+    for i in range(5000):
+        value = rng.expovariate(20)
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+
+    left.merge(DDSketch.from_dict(right.to_dict()))
+    assert left.bins == whole.bins
+    assert left.count == whole.count
+    assert left.quantile(0.99) == whole.quantile(0.99)
+
+
+def test_sketch_memory_is_bounded():
+    sketch = DDSketch(0.01)
+    for exponent in range(-300, 300):
+        sketch.add(10.0 ** (exponent / 10))
+    assert len(sketch.bins) <= MAX_BINS
+    # Only the lowest values lose accuracy
+    assert abs(sketch.quantile(0.99) - 10.0 ** 29.3) <= 0.011 * 10.0 ** 29.3
+
+
+@pytest.mark.asyncio
+async def test_snapshot_reports_steps_branches_failures_and_api_errors(monkeypatch):
+    monkeypatch.setattr("app.observability.analytics.redis_enabled", lambda: False)
+    analytics = WorkflowAnalytics(bucket_seconds=60, window_buckets=5, flush_seconds=5, accuracy=0.01)
+    for i in range(10):
+        analytics.record_step("triage", "routing", 0.02)
+        analytics.record_run("triage", "completed", 0.1, "vip" if i < 3 else "standard")
+    analytics.record_step("triage", "fetch_orders", 1.5, "timeout")
+    analytics.record_run("triage", "failed", 1.6)
+    for i in range(4):
+        analytics.record_api("fetch_customer_orders", error=i == 0)
+
+    stats = await analytics.snapshot(300)
+    triage = stats["workflows"]["triage"]
+    assert triage["runs"] == {"completed": 10, "failed": 1}
+    assert triage["branches"] == {"vip": 3, "standard": 7}
+    assert triage["latency_ms"]["count"] == 11
+    assert triage["steps"]["routing"]["latency_ms"]["p50"] == pytest.approx(20, rel=0.01)
+    assert triage["steps"]["fetch_orders"]["failures"] == {"timeout": 1}
+    assert stats["api"]["fetch_customer_orders"] == {"calls": 4, "errors": 1, "error_rate": 0.25}
+
+
+def test_buckets_merge_across_processes():
+    first, second = StatsBucket(0.01), StatsBucket(0.01)
+    first.api["registration"] = [10, 1]
+    second.api["registration"] = [5, 4]
+    second.branches["triage"] = {"vip": 2}
+    first.merge(StatsBucket.from_dict(second.to_dict()))
+    assert first.api["registration"] == [15, 5]
+    assert first.render()["workflows"]["triage"]["branches"] == {"vip": 2}
+
+
+@pytest.mark.asyncio
+async def test_flusher_publishes_buffered_stats_without_further_runs(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr("app.observability.analytics.redis_enabled", lambda: True)
+    monkeypatch.setattr("app.observability.analytics.get_redis", lambda: fakeredis.aioredis.FakeRedis(server=server))
+    worker = WorkflowAnalytics(bucket_seconds=60, window_buckets=5, flush_seconds=0.05, accuracy=0.01)
+    worker._client = fakeredis.FakeRedis(server=server)
+    worker.start()
+    try:
+        worker.record_run("triage", "completed", 0.2, "vip")
+        worker.record_api("fetch_customer_orders", error=True)
+        # The worker goes quiet: no further runs, yet its flusher publishes what it buffered
+        time.sleep(0.3)
+        web = WorkflowAnalytics(bucket_seconds=60, window_buckets=5, flush_seconds=5, accuracy=0.01)
+        stats = await web.snapshot(60)
+        assert stats["processes"] == 1
+        assert stats["workflows"]["triage"]["branches"] == {"vip": 1}
+        assert stats["api"]["fetch_customer_orders"]["errors"] == 1
+
+        # Recorded after the last tick: stop() writes it on shutdown
+        worker.record_run("triage", "failed", 0.4)
+    finally:
+        worker.stop()
+    stats = await web.snapshot(60)
+    assert stats["workflows"]["triage"]["runs"] == {"completed": 1, "failed": 1}
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.bulkhead import Bulkhead, BulkheadFull
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_caps_concurrency_and_rejects_overflow():
+    bulkhead = Bulkhead("test", max_concurrent=2, max_waiting=1, max_wait=0.05)
+    release = asyncio.Event()
+    peak = 0
+
+    async def run():
+        nonlocal peak
+        async with bulkhead:
+            peak = max(peak, bulkhead.active)
+            await release.wait()
+
+    tasks = [asyncio.create_task(run()) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert (bulkhead.active, bulkhead.waiting) == (2, 1)
+    with pytest.raises(BulkheadFull):
+        await bulkhead.acquire()  # queue full: rejected without waiting
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert peak == 2 and bulkhead.active == 0 and bulkhead.waiting == 0
+
+    async with bulkhead, bulkhead:
+        with pytest.raises(BulkheadFull):
+            await bulkhead.acquire()  # waits max_wait for a slot that never frees
+    assert bulkhead.waiting == 0 and bulkhead.rejected == 2
+
+
+def test_saturated_sync_bulkhead_answers_503(monkeypatch):
+    bulkhead = main.BULKHEADS["sync"]
+    monkeypatch.setattr(bulkhead, "max_concurrent", 0)
+    monkeypatch.setattr(bulkhead, "max_waiting", 0)
+    item = {"customer_id": "c1", "customer_phone_number": "+923001234567", "event": {"message": "hi"}}
+
+    response = TestClient(main.app).post("/workflow/run", json=item)
+
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    assert "sync bulkhead" in response.json()["detail"]
@@ -0,0 +1,43 @@
+# tests/test_deadline.py
+import asyncio
+import time
+
+import pytest
+
+from app.models import StepResult
+from app.observability.metrics import WORKFLOW_DEADLINE_EXPIRED
+from app.workflow import runner
+
+
+@pytest.mark.asyncio
+async def test_expired_job_is_dropped_without_running(monkeypatch):
+    async def must_not_run(*args, **kwargs):
+        raise AssertionError("expired workflow was executed")
+
+    monkeypatch.setattr(runner, "run_workflow_instance", must_not_run)
+    before = WORKFLOW_DEADLINE_EXPIRED.labels("customer_care", "queued").value
+
+    result = await runner.execute_and_record("wf-late", "c1", "+923001234567", {"message": "hi"},
+                                             workflow="customer_care", enqueued_at=time.time() - 600,
+                                             deadline=time.time() - 1)
+
+    assert result["status"] == "expired"
+    assert WORKFLOW_DEADLINE_EXPIRED.labels("customer_care", "queued").value == before + 1
+
+
+@pytest.mark.asyncio
+async def test_remaining_budget_bounds_a_slow_step(monkeypatch):
+    async def slow_api1(phone):
+        await asyncio.sleep(5)
+        return StepResult(success=True, data={})
+
+    monkeypatch.setattr("app.workflow.steps.step_3.check_customer_registration_api", slow_api1)
+    before = WORKFLOW_DEADLINE_EXPIRED.labels("customer_care", "check_customer_registration").value
+
+    started = time.perf_counter()
+    result = await runner.execute_and_record("wf-budget", "c1", "+923001234567", {"message": "hi"},
+                                             workflow="customer_care", deadline=time.time() + 0.2)
+
+    assert time.perf_counter() - started < 1.0
+    assert (result["status"], result["reason"]) == ("failed", "deadline_exceeded")
+    assert WORKFLOW_DEADLINE_EXPIRED.labels("customer_care", "check_customer_registration").value == before + 1
@@ -0,0 +1,57 @@
+import httpx
+import pytest
+
+from app import delivery
+from app.delivery import CallbackDeliverer, MemoryOutbox
+
+
+async def _drain(deliverer):
+    while await deliverer.deliver_due():
+        for task in list(deliverer._inflight):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_outcomes_are_batched_per_url_retried_and_dead_lettered(monkeypatch):
+    monkeypatch.setattr(delivery.settings, "CALLBACK_RETRY_BASE_SECONDS", 0.0)
+    answers = {"http://a/cb": [503, 200], "http://b/cb": [400]}
+    bodies = []
+
+    def handler(request):
+        bodies.append((str(request.url), delivery.loads(request.content)))
+        return httpx.Response(answers[str(request.url)].pop(0))
+
+    outbox = MemoryOutbox()
+    for i in range(3):
+        await outbox.add(f"wf-{i}", "http://a/cb", {"workflow_id": f"wf-{i}"})
+    await outbox.add("wf-b", "http://b/cb", {"workflow_id": "wf-b"})
+    deliverer = CallbackDeliverer(outbox, batch_size=10, concurrency=4, max_attempts=3)
+    deliverer._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    await _drain(deliverer)
+
+    a_posts = [body for url, body in bodies if url == "http://a/cb"]
+    assert len(a_posts) == 2  # one batch, retried once after the 503
+    assert [r["workflow_id"] for r in a_posts[1]["results"]] == ["wf-0", "wf-1", "wf-2"]
+    # 400 is permanent: no retry
+    assert [entry["id"] for entry in outbox.dead] == ["wf-b"] and outbox.dead[0]["attempts"] == 1
+    assert await outbox.pending() == 0
+    await deliverer._client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_claimed_entries_return_after_their_lease():
+    outbox = MemoryOutbox()
+    await outbox.add("wf-1", "http://a/cb", {})
+    assert len(await outbox.claim(10, lease=0.0)) == 1
+    assert [e["id"] for e in await outbox.claim(10, lease=60.0)] == ["wf-1"]  # lease expired: claimable again
+    assert await outbox.claim(10, lease=60.0) == []
+
+
+def test_outbox_missing_an_override_fails_at_instantiation():
+    class PartialOutbox(delivery.Outbox):
+        async def add(self, entry_id, url, payload):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        PartialOutbox()
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+from app import inprocess
+from app.inprocess import InProcessExecutor, QueueRejected
+
+
+@pytest.mark.asyncio
+async def test_executor_rejects_when_full_and_drains_on_shutdown(monkeypatch):
+    done = []
+    release = asyncio.Event()
+
+    async def fake_execute(workflow_id, source, **kwargs):
+        await release.wait()
+        done.append(workflow_id)
+
+    monkeypatch.setattr(inprocess, "execute_and_record", fake_execute)
+    executor = InProcessExecutor(max_queue=2, workers=1, drain_timeout=5)
+    await executor.start()
+
+    executor.submit({"workflow_id": "a"})
+    await asyncio.sleep(0)  # worker picks up "a"
+    executor.submit({"workflow_id": "b"})
+    executor.submit({"workflow_id": "c"})
+    with pytest.raises(QueueRejected):
+        executor.submit({"workflow_id": "d"})
+
+    release.set()
+    await executor.drain()
+    assert done == ["a", "b", "c"]
+    with pytest.raises(QueueRejected):
+        executor.submit({"workflow_id": "e"})
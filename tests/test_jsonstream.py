@@ -0,0 +1,62 @@
+# tests/test_jsonstream.py
+import orjson
+
+from app.utils.jsonstream import OrdersProjection, StreamingProjector
+from app.workflow.context import CappedLog
+
+
+def _response(n):
+    orders = [{"order_id": f"o{i}", "status": "shipped", "items": ["a", {"sku": i}], "total": i + 0.5,
+               "created_at": f"2024-01-01T00:{i % 60:02d}:{i // 60:02d}Z", "address": {"line1": "x" * 50}}
+              for i in range(n)]
+    return {"result": "ok", "status": "success", "orders": orders, "context": {"nested": [1, 2]}}
+
+
+def test_streaming_projection_matches_full_parse():
+    projection = OrdersProjection(fields=("*",), order_fields=("order_id", "items", "total", "created_at"),
+                                  max_orders=5, recent_by="created_at")
+    data = _response(300)
+    body = orjson.dumps(data)
+
+    projector = StreamingProjector(projection)
+    for start in range(0, len(body), 97):
+        projector.feed(body[start:start + 97])
+    streamed = projector.close()
+
+    assert streamed == projection.project(data)
+    assert streamed["orders_total"] == 300
+    # Most recent by created_at, kept in response order
+    assert [o["order_id"] for o in streamed["orders"]] == ["o59", "o119", "o179", "o239", "o299"]
+    assert "address" not in streamed["orders"][0] and streamed["context"] == {"nested": [1, 2]}
+
+
+def test_streaming_projection_matches_full_parse_for_missing_or_odd_orders():
+    projection = OrdersProjection()
+    for data in ({"result": "ok", "orders": None}, {"result": "ok"}, {"result": "ok", "orders": {"o1": {}}},
+                 {"result": "ok", "orders": []}):
+        projector = StreamingProjector(projection)
+        projector.feed(orjson.dumps(data))
+        assert projector.close() == projection.project(data)
+
+
+def test_recency_compares_numbers_as_numbers():
+    projection = OrdersProjection(order_fields=("order_id", "created_at"), max_orders=2, recent_by="created_at")
+    # Lexicographically "9" > "10" and "999" > "1000"
+    data = {"orders": [{"order_id": "a", "created_at": 9}, {"order_id": "b", "created_at": 1000},
+                       {"order_id": "c", "created_at": 10}, {"order_id": "d", "created_at": 999.5}]}
+    projector = StreamingProjector(projection)
+    projector.feed(orjson.dumps(data))
+    assert [o["order_id"] for o in projector.close()["orders"]] == ["b", "d"]
+    assert [o["order_id"] for o in projection.project(data)["orders"]] == ["b", "d"]
+
+    # Mixed kinds fall back to comparing as strings
+    data["orders"].append({"order_id": "e", "created_at": "99"})
+    assert [o["order_id"] for o in projection.project(data)["orders"]] == ["d", "e"]
+
+
+def test_capped_log_truncates_entries_and_total():
+    logs = CappedLog(entry_limit=10, total_limit=50)
+    logs.append("x" * 100)
+    logs += ["y" * 10] * 10
+    assert logs[0].startswith("x" * 10 + "...")
+    assert logs[-1] == CappedLog.LIMIT_NOTICE and logs.dropped > 0
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+from app.services.limiter import AdaptiveLimiter
+
+
+def test_limit_grows_when_saturated_and_backs_off_on_congestion():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=2, max_limit=10, window_samples=5, window_seconds=60)
+    limiter.inflight = 4
+    limiter._reset_window()
+    for _ in range(5):
+        limiter.on_sample(0.010)
+    assert int(limiter.limit) == 5
+
+    for _ in range(5):
+        limiter.on_sample(0.050)  # 5x baseline
+    assert int(limiter.limit) == 3
+
+    for _ in range(4):
+        limiter.on_sample(0.010)
+    limiter.on_sample(0.010, "timeout")
+    assert int(limiter.limit) == 2  # never below min_limit
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_in_order_on_release():
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    order = []
+
+    async def run(name):
+        async with limiter:
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(run(i) for i in range(5)))
+    assert order == [0, 1, 2, 3, 4]
+    assert limiter.inflight == 0 and limiter.waiting == 0
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+from app.observability.loopmon import LoopMonitor
+
+
+def blocking_call():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_stall_is_recorded_with_the_blocking_stack():
+    monitor = LoopMonitor(interval=0.01, stall_threshold=0.05)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        blocking_call()
+        await asyncio.sleep(0.1)
+    finally:
+        monitor.stop()
+
+    snapshot = monitor.snapshot()
+    assert snapshot["stalls_total"] == 1
+    stall = snapshot["recent_stalls"][0]
+    assert any("blocking_call" in line for line in stall["stack"])
+    assert 150 <= stall["blocked_ms"] <= 1000
+    assert snapshot["lag_ms"]["max"] >= 150
+
+
+def test_idle_time_between_loop_runs_is_not_lag():
+    loop = asyncio.new_event_loop()
+    monitor = LoopMonitor(interval=0.01, stall_threshold=0.05)
+    try:
+        async def start():
+            monitor.start()
+        loop.run_until_complete(start())
+        loop.run_until_complete(asyncio.sleep(0.05))
+        time.sleep(0.5)  # the loop is stopped, as between two Celery tasks
+        loop.run_until_complete(asyncio.sleep(0.05))
+        monitor.resume()
+        time.sleep(0.3)
+        loop.run_until_complete(asyncio.sleep(0.05))
+    finally:
+        monitor.stop()
+        loop.run_until_complete(asyncio.sleep(0))  # let the sampler task finish cancelling
+        loop.close()
+
+    snapshot = monitor.snapshot()
+    assert snapshot["lag_ms"]["samples"] >= 4
+    assert snapshot["lag_ms"]["max"] < 100
+    assert snapshot["stalls_total"] == 0
@@ -0,0 +1,20 @@
+from app.observability.metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = Counter("demo_requests_total", "Demo requests", ("status",), registry=registry)
+    latency = Histogram("demo_latency_seconds", "Demo latency", buckets=(0.1, 1.0), registry=registry)
+
+    requests.labels("ok").inc()
+    requests.labels("ok").inc(2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = registry.render()
+    assert '# TYPE demo_requests_total counter' in text
+    assert 'demo_requests_total{status="ok"} 3' in text
+    assert 'demo_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_latency_seconds_bucket{le="1"} 2' in text
+    assert 'demo_latency_seconds_bucket{le="+Inf"} 2' in text
+    assert 'demo_latency_seconds_count 2' in text
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests import mock_api2
+from tests.mock_faults import FaultProfile, build_profile
+
+
+def test_profiles_build_from_presets_and_sample_latency():
+    profile = build_profile('{"preset": "tail", "slow_ratio": 0.5, "seed": 3}')
+    assert profile.latency == "bimodal" and profile.slow_ms == 3000.0
+    delays = {profile.delay(random.Random(seed)) for seed in range(20)}
+    assert delays == {0.01, 3.0}
+    lognormal = FaultProfile(latency="lognormal", latency_ms=20.0)
+    assert 0.0 < lognormal.delay(random.Random(1)) < 1.0
+    with pytest.raises(ValueError):
+        build_profile({"error_rate": 2})
+    with pytest.raises(ValueError):
+        build_profile("no_such_preset")
+
+
+def test_control_endpoint_switches_profile():
+    client = TestClient(mock_api2.app)
+    try:
+        assert client.put("/_control/profile", json={"orders": 50}).status_code == 200
+        assert len(client.post("/endpoint", json={}).json()["orders"]) == 50
+
+        client.put("/_control/profile", json={"preset": "outage"})
+        assert client.post("/endpoint", json={}).status_code == 503
+        assert client.get("/health").status_code == 200
+        assert client.get("/_control/profile").json()["stats"] == {"requests": 1, "errors": 1, "resets": 0}
+
+        client.put("/_control/profile", json={"reset_rate": 1.0})
+        with pytest.raises(ConnectionResetError):
+            client.post("/endpoint", json={})
+        assert client.put("/_control/profile", json={"latency": "gamma"}).status_code == 422
+    finally:
+        client.put("/_control/profile", json={})
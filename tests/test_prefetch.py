@@ -0,0 +1,45 @@
+# tests/test_prefetch.py
+import asyncio
+
+import pytest
+
+from app.models import StepResult
+from app.observability.metrics import PREFETCH_LOOKUPS
+from app.services import apis, prefetch
+
+
+@pytest.mark.asyncio
+async def test_prefetched_lookups_are_served_from_cache(monkeypatch):
+    calls = []
+
+    async def fake_get(phone):
+        calls.append(("registration", phone))
+        await asyncio.sleep(0.01)
+        return StepResult(success=True, data={"value": "v1"})
+
+    async def fake_post(payload):
+        calls.append(("orders", payload["store_number"]))
+        return StepResult(success=False, error="boom")
+
+    monkeypatch.setattr(apis.settings, "PREFETCH_ENABLED", True)
+    monkeypatch.setattr(apis, "_get_registration", fake_get)
+    monkeypatch.setattr(apis, "_post_orders", fake_post)
+    monkeypatch.setattr(prefetch, "PREFETCH_CACHE", prefetch.PrefetchCache(ttl=30))
+    monkeypatch.setattr(apis, "PREFETCH_CACHE", prefetch.PREFETCH_CACHE)
+    prefetcher = prefetch.Prefetcher(concurrency=1, ttl=30)
+
+    assert prefetcher.schedule("+923001234567")
+    assert not prefetcher.schedule("+923001234567")  # deduplicated while in flight
+    assert not prefetcher.schedule("+923009999999")  # over the concurrency cap
+    await asyncio.gather(*prefetcher._tasks)
+    assert not prefetcher.schedule("+923001234567")  # recently prefetched
+
+    hits = PREFETCH_LOOKUPS.labels("registration", "hit").value
+    registration = await apis.check_customer_registration_api("03001234567")
+    orders = await apis.fetch_customer_orders_api({"store_number": "+923001234567"})
+
+    assert registration.data == {"value": "v1"}
+    assert PREFETCH_LOOKUPS.labels("registration", "hit").value == hits + 1
+    # The failed orders prefetch was not cached, so the step made the call itself
+    assert orders.success is False
+    assert calls == [("registration", "03001234567"), ("orders", "+923001234567"), ("orders", "+923001234567")]
@@ -0,0 +1,33 @@
+# tests/test_priority.py
+from collections import Counter
+
+from app.services.priority import WeightedQueueCycle, classify, queue_name
+
+
+def test_classify_uses_intent_rules_and_tier_boost():
+    assert classify({"message": "I want a refund"}) == "high"
+    assert classify({"message": "where is my order?"}) == "normal"
+    assert classify({"message": "hello there"}) == "low"
+    assert classify({"message": "hello there", "customer_tier": "VIP"}) == "normal"
+    assert classify({"message": "refund please", "customer_tier": "gold"}) == "high"
+
+
+def test_weighted_cycle_shares_backlogged_queues_by_weight():
+    queues = [queue_name(p) for p in ("high", "normal", "low")]
+    cycle = WeightedQueueCycle(list(queues))
+    served = Counter()
+    for _ in range(1000):
+        # Every queue has work, so BRPOP pops from the first one offered
+        picked = cycle.consume(len(queues))[0]
+        served[picked] += 1
+        cycle.rotate(picked)
+    assert served == {"workflow.high": 600, "workflow.normal": 300, "workflow.low": 100}
+
+
+def test_weighted_cycle_serves_low_queue_when_alone():
+    cycle = WeightedQueueCycle([queue_name("high"), queue_name("low")])
+    for _ in range(50):
+        cycle.rotate("workflow.low")
+    # High work arriving later goes first, without an unbounded burst owed to it
+    assert cycle.consume(2)[0] == "workflow.high"
+    assert max(abs(c) for c in cycle.credit.values()) <= 7
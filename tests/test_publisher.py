@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services import publisher
+from app.services.publisher import PublishRejected, TaskPublisher
+
+
+class StubTask:
+    name = "stub_task"
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.published = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def apply_async(self, **options):
+        self.entered.set()
+        self.release.wait(5)
+        if self.fail:
+            raise ConnectionError("broker unreachable")
+        self.published.append(options["kwargs"]["workflow_id"])
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_and_stop_drains_pending_publishes():
+    task = StubTask()
+    pub = TaskPublisher(threads=1, max_pending=2)
+    first = pub.submit(task, kwargs={"workflow_id": "a"})
+    assert task.entered.wait(5)  # "a" is being published; the queue holds two more
+    pub.submit(task, kwargs={"workflow_id": "b"})
+    pub.submit(task, kwargs={"workflow_id": "c"})
+    with pytest.raises(PublishRejected):
+        pub.submit(task, kwargs={"workflow_id": "d"})
+    assert pub.depth == 2
+
+    task.release.set()
+    await asyncio.to_thread(pub.stop)
+    assert task.published == ["a", "b", "c"]
+    assert first.done() and pub.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_fails_the_future_and_records_the_workflow(monkeypatch):
+    saved = []
+
+    class FakeStore:
+        async def save(self, summary):
+            saved.append(summary)
+
+    monkeypatch.setattr(publisher, "get_result_store", lambda: FakeStore())
+    task = StubTask(fail=True)
+    task.release.set()
+    pub = TaskPublisher(threads=1, max_pending=4)
+    future = pub.submit(task, kwargs={"workflow_id": "wf-1", "workflow": "customer_care", "enqueued_at": 1.0})
+
+    with pytest.raises(ConnectionError):
+        await asyncio.wrap_future(future)
+    for _ in range(100):
+        if saved:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.to_thread(pub.stop)
+    assert saved[0]["workflow_id"] == "wf-1"
+    assert saved[0]["status"] == "failed" and saved[0]["reason"] == "enqueue_failed"
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_publish_records_every_job(monkeypatch):
+    saved = []
+
+    class FakeStore:
+        async def save(self, summary):
+            saved.append(summary)
+
+    monkeypatch.setattr(publisher, "get_result_store", lambda: FakeStore())
+    task = StubTask(fail=True)
+    task.release.set()
+    pub = TaskPublisher(threads=1, max_pending=4)
+    jobs = [{"workflow_id": "wf-1", "workflow": "customer_care", "enqueued_at": 1.0},
+            {"workflow_id": "wf-2", "workflow": "customer_care", "enqueued_at": 1.0}]
+    future = pub.submit(task, args=(jobs,))
+
+    with pytest.raises(ConnectionError):
+        await asyncio.wrap_future(future)
+    for _ in range(100):
+        if len(saved) == 2:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.to_thread(pub.stop)
+    assert sorted(summary["workflow_id"] for summary in saved) == ["wf-1", "wf-2"]
+    assert all(summary["reason"] == "enqueue_failed" for summary in saved)
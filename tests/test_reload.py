@@ -0,0 +1,29 @@
+# tests/test_reload.py
+import sys
+
+import pytest
+
+from app.workflow import plan as plans
+from app.workflow.plan import WorkflowDefinitionError, compile_all, get_plan, reload_plans
+
+
+def test_reload_swaps_plans_and_keeps_old_ones_usable():
+    compile_all()
+    old_plan = get_plan("customer_care")
+    old_module = sys.modules["app.workflow.steps.step_1"]
+
+    swapped = reload_plans(["app.workflow.steps.step_1"])
+
+    assert set(swapped) == {"customer_care", "customer_care_triage"}
+    assert get_plan("customer_care") is swapped["customer_care"] is not old_plan
+    assert sys.modules["app.workflow.steps.step_1"] is not old_module
+    # A run holding the old plan still has a complete, working plan
+    assert old_plan.step("webhook_triggered").handler is not None
+
+
+def test_failed_reload_leaves_running_version():
+    compile_all()
+    before = dict(plans._PLANS)
+    with pytest.raises(WorkflowDefinitionError):
+        reload_plans(["app.workflow.steps.step_1", "app.workflow.steps.no_such_step"])
+    assert plans._PLANS == before
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.retry import RetryBudget, backoff_delay, is_retryable
+from app.workflow.plan import WorkflowDefinitionError
+
+
+def test_transient_errors_are_retryable_and_others_permanent():
+    request = httpx.Request("POST", "http://api/endpoint")
+    assert is_retryable(ConnectionError("reset"))
+    assert is_retryable(httpx.ConnectTimeout("slow", request=request))
+    assert is_retryable(httpx.HTTPStatusError("503", request=request, response=httpx.Response(503)))
+    assert not is_retryable(httpx.HTTPStatusError("404", request=request, response=httpx.Response(404)))
+    assert not is_retryable(WorkflowDefinitionError("unknown workflow"))
+    assert not is_retryable(KeyError("bug"))
+    assert is_retryable(TimeoutError("slow"))
+    assert not is_retryable(FileNotFoundError("missing.yaml"))
+    assert not is_retryable(PermissionError("denied"))
+
+
+def test_backoff_is_jittered_under_an_exponential_cap():
+    delays = [backoff_delay(4, base=1.0, cap=5.0) for _ in range(200)]
+    assert all(0 <= d <= 5.0 for d in delays) and len(set(delays)) > 100
+    assert max(backoff_delay(1, base=1.0, cap=60.0) for _ in range(200)) <= 1.0
+
+
+@pytest.mark.asyncio
+async def test_budget_caps_retries_at_a_fraction_of_first_attempts():
+    budget = RetryBudget(ratio=0.2, min_retries=2, window_seconds=60)
+    assert await budget.acquire(5) == 2  # idle: only the floor
+    await budget.record_attempts(50)
+    assert await budget.acquire(20) == 8  # 20% of 50, minus the 2 already spent
+    assert await budget.acquire() == 0
+
+
+class RetryRequested(Exception):
+    def __init__(self, countdown):
+        self.countdown = countdown
+
+
+def test_api_503_leads_to_a_budgeted_jittered_retry(monkeypatch):
+    from app import tasks
+    from app.services import apis
+    from app.services.results import get_result_store
+    from tests import mock_api2
+    from tests.mock_faults import build_profile
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def install_client():
+        apis.set_http_client(httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_api2.app)))
+
+    loop.run_until_complete(install_client())
+    mock_api2.FAULTS.set_profile(build_profile("outage"))
+    monkeypatch.setattr(tasks, "RETRY_BUDGET", RetryBudget(ratio=0.0, min_retries=1, window_seconds=60))
+    countdowns = []
+
+    def fake_retry(exc=None, countdown=None, **kwargs):
+        countdowns.append(countdown)
+        return RetryRequested(countdown)
+
+    monkeypatch.setattr(tasks.run_workflow_task, "retry", fake_retry)
+    args = ("customer-1", "+923001234567", {"message": "where is my order?"})
+    try:
+        # First failure: 503 is transient and the budget has one retry, so the task asks for one
+        with pytest.raises(RetryRequested):
+            tasks.run_workflow_task(*args, workflow_id="wf-503", deadline=time.time() + 300)
+        assert 0 <= countdowns[0] <= tasks.settings.RETRY_BACKOFF_BASE_SECONDS
+        assert loop.run_until_complete(get_result_store().get("wf-503")) is None  # not recorded yet
+
+        # Budget spent: the failed run becomes the outcome instead of another retry
+        result = tasks.run_workflow_task(*args, workflow_id="wf-503", deadline=time.time() + 300)
+        assert result["status"] == "failed" and result["retryable"]
+        assert "503" in result["error"]
+        assert len(countdowns) == 1
+        assert loop.run_until_complete(get_result_store().get("wf-503"))["status"] == "failed"
+    finally:
+        mock_api2.FAULTS.set_profile(build_profile("healthy"))
+        loop.run_until_complete(apis.close_http_client())
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+def test_batch_task_counts_outcomes_and_drops_expired_jobs(monkeypatch):
+    from app import tasks
+    from app.services.retry import TransientWorkflowFailure
+
+    recorded = []
+
+    async def fake_execute(workflow_id, kind, raise_transient=False, **job):
+        if kind == "ok":
+            return {"workflow_id": workflow_id, "status": "completed"}
+        if kind == "bug":
+            raise KeyError("bug")
+
+        async def record():
+            recorded.append(workflow_id)
+        raise TransientWorkflowFailure({"workflow_id": workflow_id, "status": "failed", "retryable": True}, record)
+
+    retried = []
+
+    def fake_retry(args=None, countdown=None, **kwargs):
+        retried.append([job["workflow_id"] for job in args[0]])
+        return RetryRequested(countdown)
+
+    monkeypatch.setattr(tasks, "execute_and_record", fake_execute)
+    monkeypatch.setattr(tasks.run_workflow_batch_task, "retry", fake_retry)
+    monkeypatch.setattr(tasks, "RETRY_BUDGET", RetryBudget(ratio=0.0, min_retries=1, window_seconds=60))
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    now = time.time()
+    jobs = [{"workflow_id": "a", "kind": "ok"}, {"workflow_id": "b", "kind": "bug"},
+            {"workflow_id": "c", "kind": "blip", "deadline": now - 1},
+            {"workflow_id": "d", "kind": "blip", "deadline": now + 300},
+            {"workflow_id": "e", "kind": "blip", "deadline": now + 300}]
+    try:
+        with pytest.raises(RetryRequested):
+            tasks.run_workflow_batch_task(jobs)
+        # "c" expired, "e" found the one-retry budget spent: both recorded as failed, only "d" retried
+        assert retried == [["d"]]
+        assert sorted(recorded) == ["c", "e"]
+
+        monkeypatch.setattr(tasks, "RETRY_BUDGET", RetryBudget(ratio=0.0, min_retries=0, window_seconds=60))
+        assert tasks.run_workflow_batch_task(jobs) == {"completed": 1, "failed": 1, "dropped": 3}
+    finally:
+        asyncio.get_event_loop().close()
+        asyncio.set_event_loop(None)
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from app import streams
+from app.streams import JOB_FIELD, StreamConsumer, dead_letter_key, publish, publish_many
+from app.utils.jsoncodec import loads
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = fakeredis.aioredis.FakeRedis()
+    read = fake.xreadgroup
+
+    async def blocking_read(*args, block=None, **kwargs):
+        # fakeredis returns at once instead of blocking, which would spin the consumer loop
+        reply = await read(*args, **kwargs)
+        if not reply and block:
+            await asyncio.sleep(block / 1000)
+        return reply
+
+    fake.xreadgroup = blocking_read
+    monkeypatch.setattr(streams, "get_redis", lambda: fake)
+    return fake
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    jobs = []
+
+    async def fake_execute(source, **job):
+        if job.get("fail"):
+            raise RuntimeError("step blew up")
+        jobs.append(job["workflow_id"])
+
+    monkeypatch.setattr(streams, "execute_and_record", fake_execute)
+    return jobs
+
+
+def consumer(name="c1", **overrides) -> StreamConsumer:
+    c = StreamConsumer(name)
+    c.block_ms = 10
+    for key, value in overrides.items():
+        setattr(c, key, value)
+    return c
+
+
+async def consume_until(c: StreamConsumer, done) -> None:
+    task = asyncio.create_task(c.run())
+    for _ in range(200):
+        await asyncio.sleep(0.01)
+        if done():
+            break
+    c.stop()
+    await asyncio.wait_for(task, 2)
+
+
+async def pending(redis, c: StreamConsumer) -> int:
+    return (await redis.xpending(c.key, c.group))["pending"]
+
+
+@pytest.mark.asyncio
+async def test_publish_and_publish_many_append_jobs(redis):
+    first = await publish({"workflow_id": "a"})
+    ids = await publish_many([{"workflow_id": "b"}, {"workflow_id": "c"}])
+
+    entries = await redis.xrange(streams.settings.STREAMS_KEY)
+    assert [entry_id.decode() for entry_id, _ in entries] == [first, *ids]
+    assert [loads(fields[JOB_FIELD.encode()])["workflow_id"] for _, fields in entries] == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_consumer_runs_and_acknowledges_entries(redis, executed):
+    c = consumer()
+    await c.ensure_group()
+    await publish_many([{"workflow_id": f"wf-{i}"} for i in range(5)])
+
+    await consume_until(c, lambda: len(executed) == 5)
+    assert sorted(executed) == [f"wf-{i}" for i in range(5)]
+    assert await pending(redis, c) == 0
+
+
+@pytest.mark.asyncio
+async def test_malformed_entries_are_dead_lettered_without_stopping_the_consumer(redis, executed):
+    c = consumer()
+    await c.ensure_group()
+    await redis.xadd(c.key, {JOB_FIELD: b"{not json"})
+    await redis.xadd(c.key, {"something": b"else"})
+    await redis.xadd(c.key, {JOB_FIELD: b"[1, 2]"})
+    await publish({"workflow_id": "good"})
+
+    await consume_until(c, lambda: executed == ["good"])
+    assert executed == ["good"]
+    dead = await redis.xrange(dead_letter_key())
+    assert len(dead) == 3
+    assert all(fields[b"reason"].startswith(b"malformed") for _, fields in dead)
+    assert await pending(redis, c) == 0
+
+
+@pytest.mark.asyncio
+async def test_reclaim_takes_over_stale_entries_and_dead_letters_repeat_offenders(redis, executed):
+    crashed = consumer("crashed")
+    await crashed.ensure_group()
+    await publish_many([{"workflow_id": "orphan"}, {"workflow_id": "poison", "fail": True}])
+    # Read but never acknowledged, as if the consumer died mid-run
+    await redis.xreadgroup(crashed.group, crashed.name, {crashed.key: ">"}, count=10)
+
+    rescuer = consumer("rescuer", claim_idle_ms=0, max_deliveries=2)
+    await rescuer.reclaim()
+    await asyncio.gather(*rescuer._inflight)
+    await rescuer.flush_acks()
+    assert executed == ["orphan"]
+    assert await pending(redis, rescuer) == 1  # "poison" failed and stays pending
+
+    await rescuer.reclaim()  # third delivery of "poison": over the limit
+    await rescuer.flush_acks()
+    dead = await redis.xrange(dead_letter_key())
+    assert [loads(fields[JOB_FIELD.encode()])["workflow_id"] for _, fields in dead] == ["poison"]
+    assert dead[0][1][b"reason"] == b"delivered 3 times"
+    assert await pending(redis, rescuer) == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_gives_entries_a_fresh_deadline(redis, monkeypatch):
+    monkeypatch.setattr(streams.settings, "WORKFLOW_DEADLINE_SECONDS", 300.0)
+    first = await publish({"workflow_id": "old", "enqueued_at": 1.0, "deadline": 301.0})
+
+    await streams._replay(first, 1)
+    entries = await redis.xrange(streams.settings.STREAMS_KEY)
+    job = loads(entries[-1][1][JOB_FIELD.encode()])
+    assert job["workflow_id"] != "old"
+    assert job["deadline"] - job["enqueued_at"] == 300.0
+
+    monkeypatch.setattr(streams.settings, "WORKFLOW_DEADLINE_SECONDS", 0)
+    await streams._replay(first, 1)
+    entries = await redis.xrange(streams.settings.STREAMS_KEY)
+    assert loads(entries[-1][1][JOB_FIELD.encode()])["deadline"] is None
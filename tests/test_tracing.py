@@ -0,0 +1,63 @@
+import os
+import pytest
+from app.models import StepResult
+import json
+from app.observability.tracing import TRACER, BatchSpanProcessor, FileSpanExporter, Span, SpanContext, SpanExporter
+from app.workflow.workflow_manager import run_workflow_instance
+
+
+class ListExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans, service_name):
+        self.spans.extend(spans)
+
+
+def test_traceparent_round_trip():
+    header = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    ctx = SpanContext.from_traceparent(header)
+    assert ctx.sampled and ctx.to_traceparent() == header
+    assert SpanContext.from_traceparent("garbage") is None
+
+
+def test_file_exporter_writes_one_otlp_request_per_line(tmp_path):
+    exporter = FileSpanExporter(str(tmp_path / "spans.jsonl"))
+    span = Span(SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True), None, "step ü", "internal",
+                1_000, {"workflow.id": "wf-1"})
+    span.end_ns = 2_000
+    exporter.export([span], "svc")
+    exporter.export([span], "svc")
+
+    lines = (tmp_path / "spans.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    exported = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert exported["name"] == "step ü" and exported["endTimeUnixNano"] == "2000"
+
+
+@pytest.mark.asyncio
+async def test_workflow_spans_join_incoming_trace(monkeypatch):
+    async def fake_api1(payload):
+        return StepResult(success=True, data={"value": "v1"})
+    async def fake_api2(payload):
+        return StepResult(success=True, data={"result": "ok"})
+
+    monkeypatch.setattr("app.workflow.steps.step_3.check_customer_registration_api", fake_api1)
+    monkeypatch.setattr("app.workflow.steps.step_5.fetch_customer_orders_api", fake_api2)
+    exporter = ListExporter()
+    processor = BatchSpanProcessor(exporter)
+    processor._pid = os.getpid()  # no background thread: flush() exports synchronously
+    monkeypatch.setattr(TRACER, "processor", processor)
+
+    parent = SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)
+    with TRACER.span("celery.run_workflow_task", parent=parent):
+        await run_workflow_instance("wf-t", "customer-1", "+923001234567", {"message": "hi"},
+                                    enable_visualization=False)
+    TRACER.processor.flush()
+
+    spans = {span.name: span for span in exporter.spans}
+    assert {span.context.trace_id for span in exporter.spans} == {parent.trace_id}
+    assert spans["celery.run_workflow_task"].parent_id == parent.span_id
+    run_span = spans["workflow.run"]
+    assert run_span.parent_id == spans["celery.run_workflow_task"].context.span_id
+    assert spans["step webhook_triggered"].parent_id == run_span.context.span_id
@@ -0,0 +1,86 @@
+from fastapi.testclient import TestClient
+
+from app import main
+from app.inprocess import QueueRejected
+
+
+def test_webhook_batch_reports_each_item(monkeypatch):
+    submitted = []
+
+    def submit(job):
+        if len(submitted) == 2:
+            raise QueueRejected("queue full")
+        submitted.append(job)
+
+    monkeypatch.setattr(main.settings, "EXECUTION_MODE", "inprocess")
+    monkeypatch.setattr(main.EXECUTOR, "submit", submit)
+    item = {"customer_id": "c1", "customer_phone_number": "+923001234567", "event": {"message": "hi"}}
+
+    response = TestClient(main.app).post("/webhook/batch", json=[
+        item,
+        {"customer_id": "c2"},
+        {**item, "workflow": "no_such_workflow"},
+        item,
+        item,
+    ])
+    body = response.json()
+
+    assert response.status_code == 200
+    assert [r["status"] for r in body["results"]] == ["accepted", "invalid", "invalid", "accepted", "rejected"]
+    assert (body["accepted"], body["invalid"], body["rejected"]) == (2, 2, 1)
+    assert [job["workflow_id"] for job in submitted] == [body["results"][0]["workflow_id"],
+                                                         body["results"][3]["workflow_id"]]
+    assert "customer_phone_number" in body["results"][1]["error"]
+
+
+def test_webhook_backends_receive_the_same_job(monkeypatch):
+    submitted, published = [], []
+    monkeypatch.setattr(main.EXECUTOR, "submit", submitted.append)
+    monkeypatch.setattr(main.PUBLISHER, "submit", lambda task, **options: published.append(options))
+    monkeypatch.setattr(main.settings, "PUBLISHER_CONFIRM", False)
+    client = TestClient(main.app)
+    item = {"customer_id": "c1", "customer_phone_number": "+923001234567", "event": {"message": "refund please"}}
+
+    monkeypatch.setattr(main.settings, "EXECUTION_MODE", "inprocess")
+    client.post("/webhook", json=item, headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"})
+    monkeypatch.setattr(main.settings, "EXECUTION_MODE", "celery")
+    client.post("/webhook", json=item, headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"})
+
+    job, options = submitted[0], published[0]
+    assert options["args"] == (job["customer_id"], job["customer_phone_number"], job["event"])
+    assert set(options["kwargs"]) == set(main.TASK_KWARGS)
+    assert options["kwargs"]["priority"] == job["priority"]
+    assert options["kwargs"]["deadline"] - options["kwargs"]["enqueued_at"] == main.settings.WORKFLOW_DEADLINE_SECONDS
+    assert job["deadline"] - job["enqueued_at"] == main.settings.WORKFLOW_DEADLINE_SECONDS
+    assert options["headers"].get("traceparent") == job["traceparent"] or \
+        options["headers"]["traceparent"][:36] == job["traceparent"][:36]  # same trace, per-request ingest span
+
+
+def test_webhook_batch_rejects_only_the_chunk_that_failed_to_publish(monkeypatch):
+    from concurrent.futures import Future
+
+    published = []
+
+    def submit(task, **options):
+        future = Future()
+        if published:
+            future.set_exception(ConnectionError("broker unreachable"))
+        else:
+            future.set_result(None)
+        published.append(options["args"][0])
+        return future
+
+    monkeypatch.setattr(main.settings, "EXECUTION_MODE", "celery")
+    monkeypatch.setattr(main.settings, "PUBLISHER_CONFIRM", True)
+    monkeypatch.setattr(main.settings, "PRIORITY_ROUTING", False)
+    monkeypatch.setattr(main.settings, "WEBHOOK_BATCH_CHUNK_SIZE", 2)
+    monkeypatch.setattr(main.PUBLISHER, "submit", submit)
+    item = {"customer_id": "c1", "customer_phone_number": "+923001234567", "event": {"message": "hi"}}
+
+    response = TestClient(main.app).post("/webhook/batch", json=[item] * 4)
+    body = response.json()
+
+    assert response.status_code == 200
+    assert [len(chunk) for chunk in published] == [2, 2]
+    assert [r["status"] for r in body["results"]] == ["accepted", "accepted", "rejected", "rejected"]
+    assert "broker unreachable" in body["results"][2]["error"]
@@ -19,4 +19,124 @@ async def test_workflow_happy_path(monkeypatch):
 
     result = await run_workflow_instance("wf-1", "customer-1", "+923001234567", {"message":"what's my order status?"})
     assert result["status"] == "completed"
-    assert result["final_status"] in ("order_status_returned", "auto_responded", "routed_to_refunds")
\ No newline at end of file
+    assert result["final_status"] in ("order_status_returned", "auto_responded", "routed_to_refunds")
+    # The orders payload is reported once; final_context points at it
+    assert result["globals"]["api2_response"] == {"result": "ok"}
+    assert result["globals"]["final_context"] == {"api1": {"$ref": "api1_response"},
+                                                  "api2": {"$ref": "api2_response"}}
+
+@pytest.mark.asyncio
+async def test_triage_workflow_skips_untaken_branch(monkeypatch):
+    calls = []
+    async def fake_api1(payload):
+        calls.append("api1")
+        return StepResult(success=True, data={"value":"v1"})
+    async def fake_api2(payload):
+        calls.append("api2")
+        return StepResult(success=True, data={"result":"ok"})
+
+    monkeypatch.setattr("app.workflow.steps.step_3.check_customer_registration_api", fake_api1)
+    monkeypatch.setattr("app.workflow.steps.step_5.fetch_customer_orders_api", fake_api2)
+
+    result = await run_workflow_instance("wf-2", "customer-1", "+923001234567", {"message":"hello"},
+                                         workflow="customer_care_triage")
+    assert result["status"] == "completed"
+    assert result["final_status"] == "auto_responded"
+    assert calls == []
+    assert "CHECK_CUSTOMER_REGISTRATION_API" not in result["visualization"]["text_tree"]
+
+    result = await run_workflow_instance("wf-3", "customer-1", "+923001234567", {"message":"I want a refund"},
+                                         workflow="customer_care_triage")
+    assert result["final_status"] == "routed_to_refunds"
+    assert calls == ["api1", "api2"]
+
+
+@pytest.mark.asyncio
+async def test_api1_response_without_value_fails_step_4(monkeypatch):
+    async def fake_api1(payload):
+        return StepResult(success=True, data={"status": "success"})
+    async def fake_api2(payload):
+        return StepResult(success=True, data={"result":"ok"})
+
+    monkeypatch.setattr("app.workflow.steps.step_3.check_customer_registration_api", fake_api1)
+    monkeypatch.setattr("app.workflow.steps.step_5.fetch_customer_orders_api", fake_api2)
+
+    result = await run_workflow_instance("wf-4", "customer-1", "+923001234567", {"message":"what's my order status?"})
+    assert result["status"] == "failed"
+    assert result["reason"] == "CHECK_CUSTOMER_REGISTRATION_API_INVALID_RESPONSE"
+
+
+@pytest.mark.asyncio
+async def test_unregistered_customer_passes_step_4(monkeypatch):
+    async def fake_get_registration(number):
+        return StepResult(success=False, error="404 Not Found")
+    async def fake_api2(payload):
+        return StepResult(success=True, data={"result":"ok"})
+
+    monkeypatch.setattr("app.services.apis._get_registration", fake_get_registration)
+    monkeypatch.setattr("app.workflow.steps.step_5.fetch_customer_orders_api", fake_api2)
+
+    result = await run_workflow_instance("wf-5", "customer-1", "+923001234567", {"message":"what's my order status?"})
+    assert result["status"] == "completed"
+    assert result["globals"]["intermediate_value"] == {"from_api1": None}
+
+
+def test_compile_definition_rejects_cycles():
+    from app.workflow.plan import WorkflowDefinitionError, compile_definition
+
+    definition = {
+        "name": "cyclic",
+        "steps": [
+            {"id": "a", "handler": "app.workflow.steps.step_1:run", "depends_on": ["b"]},
+            {"id": "b", "handler": "app.workflow.steps.step_9:run", "depends_on": ["a"]},
+        ],
+    }
+    with pytest.raises(WorkflowDefinitionError):
+        compile_definition(definition)
+
+
+def test_compile_definition_rejects_unprovided_fields():
+    from app.workflow.plan import WorkflowDefinitionError, compile_definition
+
+    definition = {
+        "name": "missing_api1",
+        "steps": [
+            {"id": "trigger", "handler": "app.workflow.steps.step_1:run"},
+            {"id": "transform", "handler": "app.workflow.steps.step_4:run", "requires": ["api1_response"]},
+        ],
+    }
+    with pytest.raises(WorkflowDefinitionError, match="api1_response"):
+        compile_definition(definition)
+
+
+@pytest.mark.asyncio
+async def test_legacy_step_signature_still_supported():
+    from app.workflow.context import WorkflowContext, as_step_handler
+
+    async def legacy_step(workflow_id, customer_id, customer_phone_number, event, globals_, logs):
+        globals_["agent_output"] = {"action": "fetch_status"}
+        globals_["custom_key"] = globals_.get("api1_response", "missing")
+        logs.append("legacy step ran")
+        return {"success": True, "final_status": "order_status_returned"}
+
+    ctx = WorkflowContext("wf-4", "customer-1", "+923001234567", {})
+    outcome = await as_step_handler(legacy_step)(ctx)
+    assert outcome.success and outcome.final_status == "order_status_returned"
+    assert ctx.agent_output == {"action": "fetch_status"}
+    assert ctx.to_globals()["custom_key"] == "missing"
+    assert ctx.logs == ["legacy step ran"]
+
+
+@pytest.mark.asyncio
+async def test_final_context_holds_the_api_responses():
+    from app.workflow.context import WorkflowContext
+    from app.workflow.steps import step_6
+
+    ctx = WorkflowContext("wf-5", "customer-1", "+923001234567", {})
+    ctx.api1_response = {"value": "v1"}
+    ctx.api2_response = {"orders": [{"id": 1}]}
+    await step_6.run(ctx)
+    assert ctx.final_context == {"api1": {"value": "v1"}, "api2": {"orders": [{"id": 1}]}}
+    # Reported globals carry each payload once
+    assert ctx.to_globals()["final_context"] == {"api1": {"$ref": "api1_response"},
+                                                 "api2": {"$ref": "api2_response"}}
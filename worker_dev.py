@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Development worker script with hot reload.
-This script monitors file changes and restarts the Celery worker automatically.
+Step modules (app/workflow/steps) and workflow definitions are reloaded inside the
+running worker between workflows (WORKFLOW_HOT_RELOAD, see app/workflow/reload.py).
+Any other Python change restarts the Celery worker.
 """
 import subprocess
 import sys
@@ -10,6 +12,10 @@ import os
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from app.services.priority import worker_queues
+
+# Changes under these paths are picked up in-process, without a restart
+HOT_RELOAD_PATHS = (Path('app/workflow/steps').resolve(), Path('app/workflow/definitions').resolve())
 
 class WorkerRestartHandler(FileSystemEventHandler):
     def __init__(self):
@@ -25,12 +31,17 @@ class WorkerRestartHandler(FileSystemEventHandler):
         print("Starting Celery worker...")
         self.worker_process = subprocess.Popen([
             "celery", "-A", "app.tasks.celery", "worker", 
-            "--loglevel=info", "-Q", "celery"
-        ])
+            "--loglevel=info", "-Q", ",".join(worker_queues())
+        ], env={**os.environ, "WORKFLOW_HOT_RELOAD": "true"})
     
     def on_modified(self, event):
         if event.is_directory:
             return
+
+        path = Path(event.src_path).resolve()
+        if any(root in path.parents for root in HOT_RELOAD_PATHS):
+            print(f"File changed: {event.src_path} (reloaded by the worker before its next workflow)")
+            return
         
         # Only restart for Python files
         if event.src_path.endswith('.py'):